@@ -1,26 +1,36 @@
 import json
 import os
-import requests
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import math
-import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 
-from flask import Flask
-
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.chrome.options import Options as ChromeOptions
+# startup phases are timed from here. selenium and google cloud storage are imported when first used
+startup_started = time.monotonic()
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from google.cloud import storage
-from google.cloud.exceptions import NotFound
+from flask import Flask
 
 import logging
 from logging.config import fileConfig
 
+import am4help
+import page_parser
+from browser_pool import BrowserPool
+from catalog import get_airport_catalog, get_plane_catalog
+from fleet import FleetSnapshot, RouteInventory
+from fuel_log import FuelLog
+from game_client import GameClient, USER_AGENT
+from jobs import JobQueue
+from maintenance import MaintenancePlanner, lounges_to_maintain, run_actions
+from metrics import metrics, url_template
+from page_cache import BANK_PAGE, CO2_PAGE, FUEL_PAGE, MARKETING_PAGE, PageCache
+from route_store import RouteStore
+from task_graph import TaskGraph
+from ticket_pipeline import TicketPricePipeline
+
 
 fileConfig('logger.cfg')
 LOGGER = logging.getLogger()
@@ -36,6 +46,19 @@ if 'LOG_LEVEL' in os.environ:
 else:
     LOGGER.warning(f'LOG_LEVEL not set. current log level is {LOGGER.level}')
 
+# seconds each startup phase took, logged and exposed on /metrics
+startup_phases = {'imports': time.monotonic() - startup_started}
+
+
+@contextmanager
+def startup_phase(name):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        startup_phases[name] = time.monotonic() - start
+        LOGGER.info(f'startup phase {name} took {startup_phases[name]:.3f}s')
+
 
 app_name = 'Airline Manager Automation'
 
@@ -51,8 +74,54 @@ low_co2_level = os.environ.get('LOW_CO2_LEVEL', 40000000)
 low_co2_price_threshold = os.environ.get('MAX_BUY_LOW_CO2_PRICE', 140)
 pax_plane_to_buy = os.environ.get('PAX_PLANE_SHORT_NAME_TO_BUY', 'a388')
 cargo_plane_to_buy = os.environ.get('CARGO_PLANE_SHORT_NAME_TO_BUY', 'a388f')
+# comma separated models the purchase optimiser may choose from
+pax_planes_to_buy = [shortname.strip() for shortname in os.environ.get('PAX_PLANES_TO_BUY', pax_plane_to_buy).split(',')
+                     if shortname.strip()]
+cargo_planes_to_buy = [shortname.strip() for shortname in
+                       os.environ.get('CARGO_PLANES_TO_BUY', cargo_plane_to_buy).split(',') if shortname.strip()]
+buy_candidates_per_hub = int(os.environ.get('BUY_CANDIDATES_PER_HUB', 50))
 bucket_name = os.environ.get('BUCKET_NAME', 'cloud-run-am4')
-lounge_maintanance_threshold = os.environ.get('LOUNGE_MAINTANANCE_THRESHOLD', 10)
+lounge_maintanance_threshold = int(os.environ.get('LOUNGE_MAINTANANCE_THRESHOLD', 10))
+lounge_concurrency = int(os.environ.get('LOUNGE_CONCURRENCY', 4))
+browser_pool_size = int(os.environ.get('BROWSER_POOL_SIZE', 1))
+browser_max_uses = int(os.environ.get('BROWSER_MAX_USES', 20))
+browser_max_memory_mb = int(os.environ.get('BROWSER_MAX_MEMORY_MB', 512))
+session_check_interval = int(os.environ.get('SESSION_CHECK_INTERVAL', 300))
+http_actions = os.environ.get('HTTP_ACTIONS', 'true').lower() == 'true'
+am4help_concurrency = int(os.environ.get('AM4HELP_CONCURRENCY', 8))
+am4help_hub_concurrency = int(os.environ.get('AM4HELP_HUB_CONCURRENCY', 4))
+am4help_requests_per_second = float(os.environ.get('AM4HELP_REQUESTS_PER_SECOND', 10))
+am4help_cache_file = os.environ.get('AM4HELP_CACHE_FILE', 'am4help_cache.sqlite3')
+am4help_cache_ttl = int(os.environ.get('AM4HELP_CACHE_TTL', 6 * 60 * 60))
+am4help_cache_size = int(os.environ.get('AM4HELP_CACHE_SIZE', 20000))
+am4help_cache_bypass = os.environ.get('AM4HELP_CACHE_BYPASS', 'false').lower() == 'true'
+ticket_resolver_concurrency = int(os.environ.get('TICKET_RESOLVER_CONCURRENCY', 8))
+ticket_setter_concurrency = int(os.environ.get('TICKET_SETTER_CONCURRENCY', 4))
+ticket_price_state_file = os.environ.get('TICKET_PRICE_STATE_FILE', 'ticket_prices.json')
+route_store_file = os.environ.get('ROUTE_STORE_FILE', 'routes.sqlite3')
+fuel_log_wal_file = os.environ.get('FUEL_LOG_WAL_FILE', 'fuel_log.wal')
+routine_workers = int(os.environ.get('ROUTINE_WORKERS', 4))
+job_queue_file = os.environ.get('JOB_QUEUE_FILE', 'jobs.sqlite3')
+job_workers = int(os.environ.get('JOB_WORKERS', 1))
+# 'threshold' buys below the static MAX_BUY_* prices, 'forecast' learns the buy prices from the fuel log
+fuel_strategy = os.environ.get('FUEL_STRATEGY', 'threshold').lower()
+fuel_history_days = int(os.environ.get('FUEL_HISTORY_DAYS', 60))
+fuel_min_history_days = int(os.environ.get('FUEL_MIN_HISTORY_DAYS', 7))
+fuel_buy_percentile = float(os.environ.get('FUEL_BUY_PERCENTILE', 20))
+fuel_advisor_ttl = int(os.environ.get('FUEL_ADVISOR_TTL', 6 * 60 * 60))
+reach_matrix_file = os.environ.get('REACH_MATRIX_FILE', 'reach.bin')
+# planes with fewer hours to their A-Check are checked, except the excluded models (shortnames or image path parts)
+a_check_hours = int(os.environ.get('A_CHECK_HOURS', 20))
+a_check_excluded = os.environ.get('A_CHECK_EXCLUDED', 'a330').split(',')
+# share of the balance A-Checks may spend in one run
+a_check_budget_share = float(os.environ.get('A_CHECK_BUDGET_SHARE', 1))
+a_check_concurrency = int(os.environ.get('A_CHECK_CONCURRENCY', 4))
+# route_depart.php calls per departure, each departs up to 20 planes
+depart_max_rounds = int(os.environ.get('DEPART_MAX_ROUNDS', 50))
+# 'lazy' loads the catalogs in the background once the server is listening, 'eager' while importing
+startup_mode = os.environ.get('STARTUP_MODE', 'lazy').lower()
+# starts and logs in a pooled browser in the background once the server is listening
+prewarm_browser = os.environ.get('PREWARM_BROWSER', 'false').lower() == 'true'
 
 LOGGER.info(
     f'fuel tank will be filled if the price is less than ${fuel_price_threshold}')
@@ -64,6 +133,59 @@ LOGGER.info(f'if the co2 quota is less than {low_co2_level} lbs, difference will
             f'is below ${low_co2_price_threshold}')
 
 w_driver = None
+storage_client = None
+# driver bound to the current request thread by browser_session()
+session_local = threading.local()
+# http clients sharing the cookies of each live driver
+game_clients = weakref.WeakKeyDictionary()
+
+
+def prewarm_catalogs():
+    # airports, planes and the reach matrix are loaded once per process, shared by every route search.
+    # numpy comes in with the reach matrix, so it is imported here rather than with the module
+    from reach import get_reach_matrix
+
+    with startup_phase('airport_catalog'):
+        LOGGER.info(f'loaded {len(get_airport_catalog())} airports')
+    with startup_phase('plane_catalog'):
+        LOGGER.info(f'loaded {len(get_plane_catalog())} plane models')
+    # hub to airport distances and per plane reachability, rebuilt when hubs, airports or planes change
+    with startup_phase('reach_matrix'):
+        get_reach_matrix(reach_matrix_file)
+
+
+if startup_mode == 'eager':
+    prewarm_catalogs()
+
+# pooled connections to am4help, shared by every route search and ticket lookup
+route_search = am4help.RouteSearch(concurrency=am4help_concurrency, hub_concurrency=am4help_hub_concurrency,
+                                   requests_per_second=am4help_requests_per_second)
+metrics.instrument_session(route_search.session, 'am4help')
+ticket_cache = am4help.TicketCache(am4help_cache_file, ttl=am4help_cache_ttl, max_entries=am4help_cache_size,
+                                   bypass=am4help_cache_bypass)
+
+# local route-demand table built with route_store.py. when present, route searches don't need am4help
+route_store = RouteStore(route_store_file) if os.path.exists(route_store_file) else None
+if route_store is not None:
+    LOGGER.info(f'using local route store {route_store_file} with {len(route_store)} routes')
+
+
+def route_finder():
+    return route_search if route_store is None else route_store
+
+
+def get_bucket():
+    # one storage client per process, instead of one per upload
+    global storage_client
+    if storage_client is None:
+        from google.cloud import storage
+        storage_client = storage.Client()
+    return storage_client.bucket(bucket_name)
+
+
+fuel_log = FuelLog(get_bucket, wal_file=fuel_log_wal_file)
+# (loaded at, advisor), rebuilt from the fuel log every fuel_advisor_ttl seconds
+price_advisor = (None, None)
 
 
 def save_screenshot_to_bucket(file_name):
@@ -71,41 +193,92 @@ def save_screenshot_to_bucket(file_name):
     date_string = datetime.now().strftime('%Y-%m-%d')
     timestamp = datetime.now().strftime('%H:%M:%S')
     try:
-        client = storage.Client()
-        bucket = client.get_bucket(bucket_name)
+        bucket = get_bucket()
         new_blob = bucket.blob(f"{screenshot_folder}/{date_string}/{file_name.replace('.png', f'{timestamp}.png')}")
         LOGGER.info(f'uploading {file_name} to the bucket')
-        new_blob.upload_from_filename(filename=file_name)
+        with metrics.timer('gcs_seconds', operation='upload_screenshot'):
+            new_blob.upload_from_filename(filename=file_name)
     except Exception as e:
         LOGGER.exception(f'error uploading {file_name} to the bucket', e)
 
 
+NavigationTimer = None
+
+
+def navigation_timer():
+    # the listener class is defined on first use, so selenium is only imported once a browser is started
+    global NavigationTimer
+    if NavigationTimer is None:
+        from selenium.webdriver.support.events import AbstractEventListener
+
+        class Timer(AbstractEventListener):
+            # records how long each driver.get takes, per url template
+
+            def __init__(self):
+                self._started = threading.local()
+
+            def before_navigate_to(self, url, driver):
+                self._started.at = time.monotonic()
+
+            def after_navigate_to(self, url, driver):
+                metrics.observe('browser_navigation_seconds', time.monotonic() - self._started.at,
+                                url=url_template(url))
+        NavigationTimer = Timer
+    return NavigationTimer()
+
+
+@metrics.timed('browser_start_seconds')
+def new_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+    from selenium.webdriver.support.events import EventFiringWebDriver
+    options = ChromeOptions()
+    options.headless = True
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument(f'user-agent={USER_AGENT}')
+    driver = EventFiringWebDriver(webdriver.Chrome(options=options), navigation_timer())
+    driver.maximize_window()
+    return driver
+
+
 def get_driver():
     global w_driver
+    driver = getattr(session_local, 'driver', None)
+    if driver is not None:
+        return driver
     if w_driver is None:
-        options = ChromeOptions()
-        options.headless = True
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument(
-            'user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/104.0.0.0 Safari/537.36')
-        w_driver = webdriver.Chrome(options=options)
-        w_driver.maximize_window()
-        return w_driver
+        w_driver = new_driver()
     return w_driver
 
 
+def is_logged_in(driver):
+    from selenium.webdriver.common.by import By
+    try:
+        driver.get('https://www.airlinemanager.com/banking_account.php?id=0')
+        driver.find_element(By.ID, 'bankDetailAction')
+        return True
+    except Exception:
+        return False
+
+
 def login(u_name, p_word):
     driver = get_driver()
     # check if the user is already logged in
-    try:
-        driver.get('https://www.airlinemanager.com/banking_account.php?id=0')
-        driver.find_element(By.ID, 'bankDetailAction').text
+    if is_logged_in(driver):
         LOGGER.debug('already logged in, logging out')
         logout()
-    except Exception as e:
+    else:
         LOGGER.debug('user not logged in')
-    driver = get_driver()
+    login_driver(get_driver(), u_name, p_word)
+
+
+@metrics.timed('login_seconds')
+def login_driver(driver, u_name, p_word):
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
     driver.get('https://www.airlinemanager.com/')
     # /html/body/div[4]/div/div[2]/div[1]/div/button[2]
     m_login_btn = None
@@ -151,41 +324,197 @@ def logout():
         w_driver = None
 
 
-def get_fuel_stats():
+browser_pool = BrowserPool(new_driver, lambda driver: login_driver(driver, username, password), is_logged_in,
+                           size=browser_pool_size, max_uses=browser_max_uses,
+                           max_memory_mb=browser_max_memory_mb, check_interval=session_check_interval)
+
+
+def get_game_client():
+    client = getattr(session_local, 'client', None)
+    if client is not None:
+        return client
     driver = get_driver()
-    driver.get('https://www.airlinemanager.com/fuel.php')
-    price = driver.find_element(
-        By.XPATH, '/html/body/div/div/div[1]/span[2]/b').text
-    capacity = driver.find_element(By.ID, 'remCapacity').text
-    holding = driver.find_element(By.ID, 'holding').text
+    client = game_clients.get(driver)
+    if client is None:
+        client = GameClient()
+        metrics.instrument_session(client.session, 'game')
+        client.load_cookies(driver)
+        game_clients[driver] = client
+    return client
+
+
+def fetch_html(path):
+    # pages are parsed in one pass from their html, rather than through webdriver calls per element
+    if http_actions:
+        return get_game_client().get(path).text
+    driver = get_driver()
+    driver.get(f'https://www.airlinemanager.com/{path}')
+    return driver.page_source
+
+
+def game_action(path):
+    # actions are plain GET urls, so they don't need a full page render in the browser
+    if http_actions:
+        return get_game_client().get(path)
+    get_driver().get(f'https://www.airlinemanager.com/{path}')
+
+
+@contextmanager
+def game_session(driver=None, client=None):
+    session_local.driver = driver
+    session_local.client = client
+    # fleet pages are fetched at most once per session, until our own actions change them
+    session_local.fleet = FleetSnapshot(fetch_pax_fleet, fetch_cargo_fleet, route_pairs)
+    # same for the fuel, co2, bank and marketing pages, until our own purchases change them
+    session_local.pages = PageCache(fetch_html)
+    try:
+        yield
+    finally:
+        LOGGER.info(f'fleet pages fetched in this session: {session_local.fleet.fetches}')
+        LOGGER.info(f'game pages in this session: {session_local.pages.stats()}')
+        metrics.inc('cache_requests_total', session_local.pages.hits, cache='page', result='hit')
+        metrics.inc('cache_requests_total', session_local.pages.fetches, cache='page', result='miss')
+        session_local.driver = None
+        session_local.client = None
+        session_local.fleet = None
+        session_local.pages = None
+
+
+@contextmanager
+def browser_session():
+    # binds a warm, logged-in driver from the pool to this thread, so get_driver() returns it
+    with browser_pool.session() as driver:
+        if driver in game_clients:
+            # the pool may have logged in again since the client was created
+            game_clients[driver].load_cookies(driver)
+        with game_session(driver=driver):
+            yield driver
+
+
+@contextmanager
+def http_session(client):
+    # a session without a browser, every page and action goes through the client. needs HTTP_ACTIONS.
+    # clients made elsewhere are instrumented here, once
+    metrics.instrument_session(client.session, 'game')
+    with game_session(client=client):
+        yield client
+
+
+def session_state():
+    return (getattr(session_local, 'driver', None), getattr(session_local, 'client', None), current_fleet(),
+            getattr(session_local, 'pages', None))
+
+
+def worker_client(client):
+    # the worker thread's own copy of a client, with its own connections and cookie jar. kept for the
+    # thread's life, so a pool thread reuses its connections between tasks
+    forks = getattr(session_local, 'forks', None)
+    if forks is None:
+        forks = session_local.forks = weakref.WeakKeyDictionary()
+    fork = forks.get(client)
+    if fork is None:
+        fork = forks[client] = client.fork()
+        metrics.instrument_session(fork.session, 'game')
+    return fork
+
+
+@contextmanager
+def bound_session(state):
+    # lets a worker thread use the session of the request thread that started it. the fleet and page caches
+    # are shared (they are locked, and each page should be fetched once per run), http goes through the
+    # worker's own client
+    driver, client, session_local.fleet, session_local.pages = state
+    session_local.driver = driver
+    session_local.client = None if client is None else worker_client(client)
+    try:
+        yield
+    finally:
+        session_local.driver = None
+        session_local.client = None
+        session_local.fleet = None
+        session_local.pages = None
+
+
+def spending():
+    # a balance read and the purchases made with it. in a routine run these sections of the steps take
+    # turns, outside of one they just run
+    budget = getattr(session_local, 'budget', None)
+    return nullcontext() if budget is None else budget()
+
+
+@contextmanager
+def routine_step(state, graph):
+    # the worker thread of a routine step, with the run's session and budget
+    with bound_session(state):
+        session_local.budget = graph.spending
+        try:
+            yield
+        finally:
+            session_local.budget = None
+
+
+def current_fleet():
+    return getattr(session_local, 'fleet', None)
+
+
+def route_inventory(plane_details=()):
+    # routes already flown, from the route list once per session plus the given fleet pages
+    fleet = current_fleet()
+    inventory = RouteInventory(route_pairs()) if fleet is None else fleet.routes()
+    inventory.add_planes(plane_details)
+    return inventory
+
+
+def route_added(route_name):
+    fleet = current_fleet()
+    if fleet is not None:
+        departure, _, arrival = route_name.partition('-')
+        fleet.route_added(departure, arrival)
+
+
+def fleet_changed(aircraft_type_id=None, aircraft_id=None):
+    fleet = current_fleet()
+    if fleet is None:
+        return
+    if aircraft_type_id is not None:
+        fleet.invalidate_type(aircraft_type_id)
+    if aircraft_id is not None:
+        fleet.invalidate_aircraft(aircraft_id)
+
+
+def get_page(path):
+    pages = getattr(session_local, 'pages', None)
+    return fetch_html(path) if pages is None else pages.get(path)
+
+
+def pages_changed(*paths):
+    pages = getattr(session_local, 'pages', None)
+    if pages is not None:
+        pages.invalidate(*paths)
+
+
+def get_fuel_stats():
+    fuel = page_parser.parse_fuel(get_page(FUEL_PAGE))
     LOGGER.info(
-        f'Holding {holding} and capacity Remaining is {capacity} and current fuel price is {price}')
-    return price, capacity, holding
+        f'Holding {fuel.holding} and capacity Remaining is {fuel.capacity} and current fuel price is ${fuel.price}')
+    return fuel.price, fuel.capacity, fuel.holding
 
 
 def get_airline_status():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/co2.php')
-    classes = driver.find_element(By.ID, 'eco-state-1').get_attribute('class').split(' ')
-    if 'hidden' in classes:
-        return 'Eco-unfriendly'
-    else:
+    if page_parser.parse_eco_friendly(get_page(CO2_PAGE)):
         return 'Eco-friendly'
+    else:
+        return 'Eco-unfriendly'
 
 
 def get_co2_stats():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/co2.php')
-    price = driver.find_element(
-        By.XPATH, '/html/body/div/div/div[2]/span[2]/b').text
-    capacity = driver.find_element(By.ID, 'remCapacity').text
-    holding = driver.find_element(By.ID, 'holding').text
+    co2 = page_parser.parse_co2(get_page(CO2_PAGE))
     LOGGER.info(
-        f'Holding {holding} and capacity Remaining is {capacity} and current co2 price is {price}')
-    return price, capacity, holding
+        f'Holding {co2.holding} and capacity Remaining is {co2.capacity} and current co2 price is ${co2.price}')
+    return co2.price, co2.capacity, co2.holding
 
 
-def depart_planes():
+def can_depart():
     pax_rep, cargo_rep = get_reputation()
     if get_airline_status() == 'Eco-unfriendly':
         LOGGER.warning('Airline status is "Eco-unfriendly". Not departing planes')
@@ -193,340 +522,427 @@ def depart_planes():
     if pax_rep < 80:
         LOGGER.warning(f'Airline Reputation (PAX) is {pax_rep}. Not departing planes.')
         return False
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/route_depart.php?mode=all&ids=x')
-    LOGGER.info('all planes departed')
     return True
 
 
+def refill(get_stats, perform_ops):
+    # buys fuel or co2 at the prices perform_ops accepts, True if the holding went up
+    _, _, holding = get_stats()
+    perform_ops()
+    _, _, refilled = get_stats()
+    return refilled > holding
+
+
+def planes_waiting_to_depart():
+    # the depart counter of the main page, None when it can't be read
+    try:
+        return page_parser.parse_departure(fetch_html('')).remaining
+    except Exception:
+        LOGGER.exception('error reading the depart counter')
+        return None
+
+
+def depart_all_planes():
+    # the game departs up to 20 planes a call, so calls are repeated until nothing is left to depart.
+    # reputation and eco status are checked once, fuel and co2 are topped up between calls when they run low.
+    # returns the planes departed, None when the game didn't say
+    if not can_depart():
+        return 0
+    started = time.monotonic()
+    departed = 0
+    counted = False
+    rounds = 0
+    _, _, fuel_holding = get_fuel_stats()
+    while rounds < depart_max_rounds:
+        rounds += 1
+        departure = page_parser.parse_departure(fetch_html('route_depart.php?mode=all&ids=x'))
+        # departures burn fuel and co2 quota and earn money
+        pages_changed(FUEL_PAGE, CO2_PAGE, BANK_PAGE)
+        _, _, holding = get_fuel_stats()
+        remaining = departure.remaining
+        if remaining is None and departure.departed is None:
+            # the response said nothing about the planes, so the counter is read again
+            remaining = planes_waiting_to_depart()
+        # when nothing says how many planes left, burned fuel tells whether any did
+        moved = departure.departed if departure.departed is not None else int(holding < fuel_holding)
+        departed += departure.departed or 0
+        counted = counted or departure.departed is not None
+        fuel_holding = holding
+        if departure.out_of_fuel or departure.out_of_co2:
+            kind = 'fuel' if departure.out_of_fuel else 'co2'
+            LOGGER.warning(f'not enough {kind} to depart the remaining planes')
+            if not refill(*((get_fuel_stats, perform_fuel_ops) if departure.out_of_fuel else
+                            (get_co2_stats, perform_co2_ops))):
+                LOGGER.warning(f'could not buy {kind}, stopping departures')
+                break
+            _, _, fuel_holding = get_fuel_stats()
+            continue
+        if remaining == 0 or moved == 0:
+            break
+        if fuel_holding < int(low_fuel_level):
+            refill(get_fuel_stats, perform_fuel_ops)
+            _, _, fuel_holding = get_fuel_stats()
+        _, _, co2_holding = get_co2_stats()
+        if co2_holding < int(low_co2_level):
+            refill(get_co2_stats, perform_co2_ops)
+    else:
+        LOGGER.warning(f'stopped departing after {depart_max_rounds} calls')
+    elapsed = time.monotonic() - started
+    if counted:
+        metrics.inc('planes_departed_total', departed)
+        LOGGER.info(f'departed {departed} planes in {rounds} calls and {elapsed:.1f}s '
+                    f'({departed / elapsed if elapsed > 0 else 0:.1f} planes/s)')
+    else:
+        LOGGER.info(f'departed planes in {rounds} calls and {elapsed:.1f}s')
+        return None
+    return departed
+
+
 def get_balance():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/banking_account.php?id=0')
-    balance = driver.find_element(By.XPATH, '/html/body/div[1]/div').text
-    LOGGER.info(f'Account balance is {balance}')
-    return int(balance.replace('$', '').replace(',', '').strip())
+    balance = page_parser.parse_balance(get_page(BANK_PAGE))
+    LOGGER.info(f'Account balance is ${balance:,}')
+    return balance
 
 
 def buy_fuel(quantity):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/fuel.php?mode=do&amount={quantity}')
+    game_action(f'fuel.php?mode=do&amount={quantity}')
+    pages_changed(FUEL_PAGE, BANK_PAGE)
     LOGGER.info(f'bought {quantity} fuel')
 
 
 def buy_co2(quantity):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/co2.php?mode=do&amount={quantity}')
+    game_action(f'co2.php?mode=do&amount={quantity}')
+    pages_changed(CO2_PAGE, BANK_PAGE)
     LOGGER.info(f'bought {quantity} co2 quota')
 
 
+def get_price_advisor():
+    global price_advisor
+    from fuel_analytics import PriceAdvisor, PriceSeries
+
+    loaded_at, advisor = price_advisor
+    now = datetime.now(timezone.utc)
+    if loaded_at is not None and (now - loaded_at).total_seconds() < fuel_advisor_ttl:
+        return advisor
+    advisor = None
+    try:
+        with metrics.timer('gcs_seconds', operation='fuel_log_read'):
+            series = PriceSeries(fuel_log.read(now - timedelta(days=fuel_history_days), now))
+        if series.days_logged('fuel') >= fuel_min_history_days:
+            advisor = PriceAdvisor(series, percentile=fuel_buy_percentile)
+            LOGGER.info(f'price advisor built from {series.count} logged windows')
+        else:
+            LOGGER.info(f'not enough price history for the forecast strategy, using the static thresholds')
+    except Exception:
+        LOGGER.exception('error reading the fuel log, using the static thresholds')
+    price_advisor = (now, advisor)
+    return advisor
+
+
+def is_good_price(kind, price, threshold):
+    # static threshold, unless the forecast strategy has enough history to decide. the threshold stays the
+    # highest price the forecast may buy at
+    if fuel_strategy == 'forecast':
+        advisor = get_price_advisor()
+        now = datetime.now(timezone.utc)
+        decision = None if advisor is None else advisor.should_buy(kind, price, now, max_price=threshold)
+        if decision is not None:
+            LOGGER.info(f'{kind} price ${price}, forecast buy threshold ${advisor.buy_threshold(kind, now):.0f}, '
+                        f'typical ${advisor.typical_price(kind, now):.0f}, max ${threshold}, buying: {decision}')
+            return decision
+    return price < threshold
+
+
 def perform_fuel_ops():
     # fuel checks
-    fuel_price, fuel_capacity, fuel_holding = get_fuel_stats()
-    fuel_price_num = int(fuel_price.replace(
-        '$', '').replace(',', '').replace(' ', ''))
-    fuel_capacity_num = int(fuel_capacity.replace(',', '').replace(' ', ''))
-    fuel_holding_num = int(fuel_holding.replace(',', '').replace(' ', ''))
-    if fuel_price_num < int(fuel_price_threshold):
-        balance = get_balance()
-        if (fuel_capacity_num * fuel_price_num)/1000 < balance:
-            buy_fuel(fuel_capacity_num)
-        else:
-            purchase_qty = (balance * 1000) / fuel_price_num
-            buy_fuel(purchase_qty)
-    elif fuel_holding_num < int(low_fuel_level) and fuel_price_num < int(low_fuel_price_threshold):
-        balance = get_balance()
-        if ((int(low_fuel_level) - fuel_holding_num) * fuel_price_num) / 1000 < balance:
-            buy_fuel(int(low_fuel_level) - fuel_holding_num)
+    with spending():
+        fuel_price_num, fuel_capacity_num, fuel_holding_num = get_fuel_stats()
+        if is_good_price('fuel', fuel_price_num, int(fuel_price_threshold)):
+            balance = get_balance()
+            if (fuel_capacity_num * fuel_price_num)/1000 < balance:
+                buy_fuel(fuel_capacity_num)
+            else:
+                purchase_qty = (balance * 1000) / fuel_price_num
+                buy_fuel(purchase_qty)
+        elif fuel_holding_num < int(low_fuel_level) and fuel_price_num < int(low_fuel_price_threshold):
+            balance = get_balance()
+            if ((int(low_fuel_level) - fuel_holding_num) * fuel_price_num) / 1000 < balance:
+                buy_fuel(int(low_fuel_level) - fuel_holding_num)
+            else:
+                purchase_qty = (balance * 1000) / fuel_price_num
+                buy_fuel(purchase_qty)
         else:
-            purchase_qty = (balance * 1000) / fuel_price_num
-            buy_fuel(purchase_qty)
-    else:
-        LOGGER.info(f'fuel price is too high to buy...')
+            LOGGER.info(f'fuel price is too high to buy...')
 
 
 def perform_co2_ops():
     # co2 checks
-    co2_price, co2_capacity, co2_holding = get_co2_stats()
-    co2_price_num = int(co2_price.replace(
-        '$', '').replace(',', '').replace(' ', ''))
-    co2_capacity_num = int(co2_capacity.replace(',', '').replace(' ', ''))
-    co2_holding_num = int(co2_holding.replace(',', '').replace(' ', ''))
-    if co2_price_num < (111 if co2_price_threshold is None else int(co2_price_threshold)):
-        balance = get_balance()
-        if ((co2_capacity_num if co2_holding_num > 0 else co2_capacity_num - co2_holding_num) * co2_price_num)/1000 < balance:
-            buy_co2(co2_capacity_num if co2_holding_num > 0 else co2_capacity_num - co2_holding_num)
-        else:
-            purchase_qty = (balance * 1000)/co2_price_num
-            buy_co2(purchase_qty)
-    elif co2_holding_num < int(low_co2_level) and co2_price_num < int(low_co2_price_threshold):
-        balance = get_balance()
-        if ((int(low_co2_level) - co2_holding_num) * co2_price_num) / 1000 < balance:
-            buy_co2(int(low_co2_level) - co2_holding_num)
+    with spending():
+        co2_price_num, co2_capacity_num, co2_holding_num = get_co2_stats()
+        if is_good_price('co2', co2_price_num, 111 if co2_price_threshold is None else int(co2_price_threshold)):
+            balance = get_balance()
+            if ((co2_capacity_num if co2_holding_num > 0 else co2_capacity_num - co2_holding_num) * co2_price_num)/1000 < balance:
+                buy_co2(co2_capacity_num if co2_holding_num > 0 else co2_capacity_num - co2_holding_num)
+            else:
+                purchase_qty = (balance * 1000)/co2_price_num
+                buy_co2(purchase_qty)
+        elif co2_holding_num < int(low_co2_level) and co2_price_num < int(low_co2_price_threshold):
+            balance = get_balance()
+            if ((int(low_co2_level) - co2_holding_num) * co2_price_num) / 1000 < balance:
+                buy_co2(int(low_co2_level) - co2_holding_num)
+            else:
+                purchase_qty = (balance * 1000) / co2_price_num
+                buy_co2(purchase_qty)
         else:
-            purchase_qty = (balance * 1000) / co2_price_num
-            buy_co2(purchase_qty)
-    else:
-        LOGGER.info(f'co2 price is too high to buy...')
+            LOGGER.info(f'co2 price is too high to buy...')
 
 
-def get_current_time_window():
+def get_current_window():
     now = datetime.now(timezone.utc)
-    if now.minute < 30:
-        return now.strftime('%Y-%m-%d'), now.replace(minute=0, second=0, microsecond=0).strftime("%H:%M:%S %Z")
-    else:
-        return now.strftime('%Y-%m-%d'), now.replace(minute=30, second=0, microsecond=0).strftime("%H:%M:%S %Z")
+    return now.replace(minute=0 if now.minute < 30 else 30, second=0, microsecond=0)
 
 
 def log_fuel_stats():
-    current_month = datetime.now(timezone.utc).strftime("%b")
-    current_year = datetime.now(timezone.utc).strftime("%Y")
-    fuel_log_file = f'fuel_log/{current_year}/{current_month}_fuel_stats.json'
     fuel_price, _, _ = get_fuel_stats()
     co2_price, _, _ = get_co2_stats()
     LOGGER.debug(f'Fuel Price: {fuel_price}')
     LOGGER.debug(f'CO2 Price: {co2_price}')
-    client = storage.Client()
-    bucket = client.get_bucket(bucket_name)
-    new_blob = bucket.blob(fuel_log_file)
+    # appended locally first, then uploaded as its own object, so there is no read-modify-write of a month
+    fuel_log.append(get_current_window(), fuel_price, co2_price)
+    with metrics.timer('gcs_seconds', operation='fuel_log_flush'):
+        fuel_log.flush()
+
+
+def migrate_fuel_stats(year, month):
+    # copies a legacy fuel_log/<year>/<Mon>_fuel_stats.json into the fuel log series
+    from google.cloud.exceptions import NotFound
+    fuel_log_file = f'fuel_log/{year}/{month}_fuel_stats.json'
     try:
-        fuel_stats = json.loads(new_blob.download_as_text())
-    except NotFound as e:
-        LOGGER.exception('Fuel stats file not found in the bucket', e)
-        fuel_stats = {}
-
-    date_string, time_string = get_current_time_window()
-
-    if date_string not in fuel_stats:
-        fuel_stats[date_string] = {}
-    if time_string in fuel_stats[date_string]:
-        # prices already updated, so no action needed
-        pass
-    else:
-        fuel_stats[date_string][time_string] = {
-            'fuel_price': int(fuel_price.replace('$', '').replace(',', '').replace(' ', '')),
-            'co2_price': int(co2_price.replace('$', '').replace(',', '').replace(' ', ''))
-        }
-        LOGGER.info(f'uploading {fuel_log_file} to the bucket')
-        new_blob.upload_from_string(
-            data=json.dumps(fuel_stats), content_type='application/json')
+        fuel_stats = json.loads(get_bucket().blob(fuel_log_file).download_as_text())
+    except NotFound:
+        LOGGER.warning(f'{fuel_log_file} not found in the bucket')
+        return
+    fuel_log.import_monthly(fuel_stats)
+    LOGGER.info(f'migrated {fuel_log_file} into the fuel log series')
 
 
 def maintain_lounges():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/hubs_lounge_manage.php')
-    LOGGER.info('maintaining lounges')
-    # get the table, loop through each row, and check the percetnage and maintain if the percentage is higher than a threshold.
-    # table class is table
-    table = driver.find_element_by_class_name('table')
-    # get the rows, loop through each row, and check the percetnage and maintain if the percentage is higher than a threshold.
-    rows = table.find_elements_by_tag_name('tr')
-    for row in rows:
-        lounge_id = int(row.get_attribute('id').replace('lList', ''))
-        percentage = int(row.find_element(By.XPATH, 'td[2]/b').text.replace('%', ''))
-        LOGGER.info(f'lounge {lounge_id} has {percentage}%')
-        if percentage > lounge_maintanance_threshold:
-            LOGGER.info(f'maintaining lounge {lounge_id}')
-            driver.get(f'https://www.airlinemanager.com/lounge_action.php?id={lounge_id}&ref=manage')
-            # call the maintaince api
+    # one page load for every lounge, then the maintenance actions a few at a time over http
+    lounges = page_parser.parse_lounges(fetch_html('hubs_lounge_manage.php'))
+    to_maintain = lounges_to_maintain(lounges, lounge_maintanance_threshold)
+    LOGGER.info(f'maintaining {len(to_maintain)} of {len(lounges)} lounges above {lounge_maintanance_threshold}%')
+    if len(to_maintain) == 0:
+        return
+    state = session_state()
+    with spending():
+        failed = run_actions(to_maintain, maintain_lounge, lounge_concurrency if http_actions else 1,
+                             context=lambda: bound_session(state))
+        pages_changed(BANK_PAGE)
+    if len(failed) > 0:
+        LOGGER.warning(f'{len(failed)} lounges could not be maintained')
+
+
+def maintain_lounge(lounge):
+    game_action(f'lounge_action.php?id={lounge.id}&ref=manage')
+    LOGGER.info(f'maintained lounge {lounge.name or lounge.id} at {lounge.percentage}%')
 
 
 def perform_routine_ops():
+    # the browser can only be driven from one thread at a time, so steps run in parallel only over http
+    workers = routine_workers if http_actions else 1
+    if http_actions:
+        # created here, each worker thread copies it into a client of its own
+        get_game_client()
+    before = metrics.snapshot()
+    state = session_state()
+    progress = job_queue.reporter()
+    graph = TaskGraph(workers, context=lambda: routine_step(state, graph),
+                      on_change=lambda task: progress(**{task.name: task.status}))
     # store fuel and CO2 prices
-    log_fuel_stats()
+    graph.add('log_fuel_stats', log_fuel_stats)
     # check and perform marketing
-    marketing()
-    # perform fuel ops
-    perform_fuel_ops()
-    # perform co2 ops
-    perform_co2_ops()
-    # depart planes
-    if depart_planes():
-        # this is to handle departing more than 20 planes in one run
-        depart_planes()
-    # perform fuel ops
-    perform_fuel_ops()
-    # perform co2 ops
-    perform_co2_ops()
-    # perform maintenance, if needed
-    check_aircrafts()
+    graph.add('marketing', marketing, spends=True)
+    # perform fuel and co2 ops
+    graph.add('fuel', perform_fuel_ops, after=['log_fuel_stats'], spends=True)
+    graph.add('co2', perform_co2_ops, after=['log_fuel_stats'], spends=True)
+    # depart planes, once the campaigns are running and the tanks are filled. departing earns money, the fuel
+    # and co2 top ups in between take the budget inside perform_fuel_ops / perform_co2_ops
+    graph.add('depart', depart_all_planes, after=['marketing', 'fuel', 'co2'])
+    # refill after departing
+    graph.add('refuel', perform_fuel_ops, after=['depart'], spends=True)
+    graph.add('refill_co2', perform_co2_ops, after=['depart'], spends=True)
+    # perform maintenance, if needed. cheap fuel is bought first
+    graph.add('check_aircrafts', check_aircrafts, after=['fuel', 'co2'], spends=True)
     # maintain lounges
-    maintain_lounges()
+    graph.add('maintain_lounges', maintain_lounges, after=['fuel', 'co2'], spends=True)
     # route parked planes, if any
-    route_pax_aircrafts()
-    # route parked planes, if any
-    route_cargo_aircrafts()
-    # buy planes if there is enough money
-    # buy pax planes
-    buy_pax_aircrafts()
-    # buy cargo planes
-    buy_cargo_aircrafts()
+    graph.add('route_pax', route_pax_aircrafts)
+    graph.add('route_cargo', route_cargo_aircrafts)
+    # buy planes with the money that is left
+    spent_first = ['refuel', 'refill_co2', 'check_aircrafts', 'maintain_lounges']
+    graph.add('buy_pax', buy_pax_aircrafts, after=['route_pax'] + spent_first, spends=True)
+    graph.add('buy_cargo', buy_cargo_aircrafts, after=['route_cargo'] + spent_first, spends=True)
+    failed = graph.run()
+    LOGGER.info(graph.report())
+    LOGGER.info(f'am4help ticket cache: {ticket_cache.stats()}')
+    LOGGER.info('\n'.join(['calls in this run:'] + metrics.summary(since=before)))
+    if len(failed) > 0:
+        raise failed[0].error
 
 
 def set_ticket_price(route_id, e, b, f):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/set_ticket_prices.php?e={e}&b={b}&f={f}&id={route_id}')
+    game_action(f'set_ticket_prices.php?e={e}&b={b}&f={f}&id={route_id}')
 
 
-def get_routes():
-    route_list = []
-    driver = get_driver()
+def list_routes():
+    # yields the routes of each routes.php page
     start = 0
     while True:
-        driver.get(f'https://www.airlinemanager.com/routes.php?start={start}')
-        routes_container = driver.find_element(By.ID, 'routesContainer')
-        elements = routes_container.find_elements(
-            by=By.CLASS_NAME, value='m-text')
-        if len(elements) == 0:
+        routes = page_parser.parse_routes(fetch_html(f'routes.php?start={start}'))
+        if len(routes) == 0:
             LOGGER.info('no more routes found...')
             break
-        else:
-            LOGGER.debug(f'found routes {len(elements)}')
-            start += len(elements)
-        for element in elements:
-            route_id = element.get_property('id').replace('routeMainList', '')
-            route_desc = element.find_element(
-                By.XPATH, f'//*[@id="routeMainList{route_id}"]/div[1]/div/div[2]/span').text
-            ticket_price = get_route_details(route_desc.split(
-                ' - ')[0], route_desc.split(' - ')[1], 'pax')[1]['realism']
+        LOGGER.debug(f'found routes {len(routes)}')
+        start += len(routes)
+        yield routes
+
+
+def route_pairs():
+    # (departure, arrival) of every route, over all aircraft types
+    for routes in list_routes():
+        for route in routes:
+            airports = route.route_desc.split(' - ')
+            if len(airports) >= 2:
+                yield airports[0], airports[1]
+
+
+def get_route_ticket_price(route):
+    return get_route_details(route['route_desc'].split(
+        ' - ')[0], route['route_desc'].split(' - ')[1], 'pax')[1]['realism']
+
+
+def get_routes():
+    route_list = []
+    for routes in list_routes():
+        for route in routes:
             route_list.append(
-                {'route_id': route_id, 'route_desc': route_desc, 'ticket_price': ticket_price})
+                {'route_id': route['route_id'], 'route_desc': route['route_desc'],
+                 'ticket_price': get_route_ticket_price(route)})
 
     return route_list
 
 
+def update_ticket_prices():
+    # the setter runs on worker threads, so it uses the http client of this thread's session directly
+    client = get_game_client()
+    pipeline = TicketPricePipeline(
+        get_route_ticket_price,
+        lambda route_id, e, b, f: client.get(f'set_ticket_prices.php?e={e}&b={b}&f={f}&id={route_id}'),
+        resolver_concurrency=ticket_resolver_concurrency, setter_concurrency=ticket_setter_concurrency,
+        state_file=ticket_price_state_file)
+    return pipeline.run(list_routes())
+
+
 def get_route_details(departure, arrival, type='pax'):
-    response = requests.get(
-        f'https://am4help.com/route/ticket?type={type}&mode=normal&departure={departure}&arrival={arrival}')
-    if response.status_code == 200:
-        route_details = json.loads(response.text)
-    else:
-        route_details = None
+    if route_store is not None:
+        stored = route_store.route_details(departure, arrival, type)
+        if stored is not None:
+            return stored
+    route_details = ticket_cache.get(type, 'normal', departure, arrival)
+    if route_details is None:
+        response = route_search.get(
+            f'{am4help.AM4HELP_URL}/route/ticket?type={type}&mode=normal&departure={departure}&arrival={arrival}')
+        if response.status_code == 200:
+            route_details = json.loads(response.text)
+            ticket_cache.put(type, 'normal', departure, arrival, route_details)
     return route_details['routes'][0], route_details['ticket']
 
 
 def create_route(plane_id, route_name, destination_airport_id, economy_price, business_price, first_price):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/new_route_info.php?mode=do&id={plane_id}&airportId={destination_airport_id}&reg={route_name}&e={economy_price}&b={business_price}&f={first_price}&stopoverId=0&ferry=0&intro=0')
+    game_action(
+        f'new_route_info.php?mode=do&id={plane_id}&airportId={destination_airport_id}&reg={route_name}&e={economy_price}&b={business_price}&f={first_price}&stopoverId=0&ferry=0&intro=0')
+    fleet_changed(aircraft_id=plane_id)
+    route_added(route_name)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'created pax route {route_name}')
 
 
 def create_cargo_route(plane_id, route_name, destination_airport_id, large_ticket, heavy_ticket):
-    driver = get_driver()
     # curl 'https://www.airlinemanager.com/new_route_info.php?mode=do&id=31068418&airportId=3568&reg=FRA-MLE&e=7.66&b=4.34&f=1&stopoverId=0&ferry=0&intro=0'
-    driver.get(
-        f'https://www.airlinemanager.com/new_route_info.php?mode=do&id={plane_id}&airportId={destination_airport_id}&reg={route_name}&e={large_ticket}&b={heavy_ticket}&f=1&stopoverId=0&ferry=0&intro=0')
+    game_action(
+        f'new_route_info.php?mode=do&id={plane_id}&airportId={destination_airport_id}&reg={route_name}&e={large_ticket}&b={heavy_ticket}&f=1&stopoverId=0&ferry=0&intro=0')
+    fleet_changed(aircraft_id=plane_id)
+    route_added(route_name)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'created cargo route {route_name}')
 
 
 def buy_pax_aircraft(plane_id, hub_id, engine_id, plane_name, economy, business, first):
-    driver = get_driver()
-    driver.get(f'https://www.airlinemanager.com/ac_order_do.php?id={plane_id}&hub={hub_id}&e={economy}&b={business}&'
-               f'f={first}&r={plane_name}&engine={engine_id}&amount=1')
+    game_action(f'ac_order_do.php?id={plane_id}&hub={hub_id}&e={economy}&b={business}&'
+                f'f={first}&r={plane_name}&engine={engine_id}&amount=1')
     LOGGER.info(f'https://www.airlinemanager.com/ac_order_do.php?id={plane_id}&hub={hub_id}&e={economy}&b={business}&'
                f'f={first}&r={plane_name}&engine={engine_id}&amount=1')
+    fleet_changed(aircraft_type_id=plane_id)
+    route_added(plane_name)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'bought pax plane {plane_name}')
 
 
 def buy_cargo_aircraft(plane_id, hub_id, engine_id, plane_name, aft, forward):
-    driver = get_driver()
-    driver.get(f'https://www.airlinemanager.com/ac_order_do_cargo.php?engine={engine_id}&reg={plane_name}&hub={hub_id}&acId={plane_id}&aft={aft}&fwd={forward}')
+    game_action(f'ac_order_do_cargo.php?engine={engine_id}&reg={plane_name}&hub={hub_id}&acId={plane_id}&aft={aft}&fwd={forward}')
+    fleet_changed(aircraft_type_id=plane_id)
+    route_added(plane_name)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'bought cargo plane {plane_name}')
 
 
 def check_aircrafts():
-    aircrafts_to_check = []
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/maint_plan.php')
-    aircraft_list = driver.find_element(By.ID, 'acListView')
-    aircrafts = aircraft_list.find_elements(By.CLASS_NAME, 'maint-list-sort')
-    for aircraft in aircrafts:
-        try:
-            aircraft_id = aircraft.find_element(
-                By.XPATH, './/div[3]') .get_property('id').replace('controls', '')
-            aircraft_location = aircraft.text.split('\n')[4]
-            if 'a330' in aircraft.find_element(By.XPATH, './/div[1]/img') .get_property('src'):
-                # plan is to decommission these plane. no need to maintain them
-                continue
-            if aircraft_location == 'Not at base':
-                continue
-            time_to_check = aircraft.text.split('\n')[6]
-            if int(time_to_check) < 20:
-                aircrafts_to_check.append(aircraft_id)
-        except NoSuchElementException as e:
-            LOGGER.exception(
-                'something went wrong when checking aircraft for maintenance', e)
-    for aircraft_id in aircrafts_to_check:
-        check_aircraft(aircraft_id)
-
+    planner = MaintenancePlanner(get_plane_catalog(), max_hours=a_check_hours, excluded=a_check_excluded)
+    aircrafts = page_parser.parse_maintenance(fetch_html('maint_plan.php'))
+    with spending():
+        budget = get_balance() * a_check_budget_share
+        scheduled, deferred = planner.plan(aircrafts, budget)
+        for candidate, reason in deferred:
+            LOGGER.debug(f'not checking {candidate}: {reason}')
+        LOGGER.info(f'scheduling {len(scheduled)} A-Checks for ${sum(candidate.cost for candidate in scheduled):,} '
+                    f'out of ${budget:,.0f}, {len(deferred)} due planes deferred')
+        # checks are independent GET actions, so over http they are sent a few at a time
+        state = session_state()
+        failed = run_actions(scheduled, lambda candidate: check_aircraft(candidate.aircraft.id),
+                            a_check_concurrency if http_actions else 1, context=lambda: bound_session(state))
+    if len(failed) > 0:
+        LOGGER.warning(f'{len(failed)} A-Checks could not be scheduled')
 
-def get_cargo_plane_details(aircraft_type_id):
-    planes_data = []
-
-    driver = get_driver()
 
-    driver.get(
-        f'https://www.airlinemanager.com/fleet.php?type={aircraft_type_id}')
+def fetch_cargo_fleet(aircraft_type_id):
+    return page_parser.parse_cargo_fleet(fetch_html(f'fleet.php?type={aircraft_type_id}'))
 
-    elements = driver.find_elements(By.XPATH, '/html/body/div[2]/div/div')
 
-    for element in elements:
+def fetch_pax_fleet(aircraft_type_id):
+    return page_parser.parse_pax_fleet(fetch_html(f'fleet.php?type={aircraft_type_id}'))
 
-        plane_id = element.find_element(
-            By.XPATH, f'.//div[1]/span').get_attribute("onclick").split(',')[1]
-        plane_name = element.find_element(
-            By.XPATH, f'.//div[2]/a').text
-        plane_status = element.find_element(
-            By.XPATH, f'.//div[4]/span').text
-        plane_seats = element.find_element(
-            By.XPATH, f'.//div[3]').text
 
-        large = plane_seats.split('\n')[0].split(': ')[1].replace(' Lbs', '').replace(',', '')
-        heavy = plane_seats.split('\n')[1].split(': ')[1].replace(' Lbs', '').replace(',', '')
-
-        planes_data.append({'id': plane_id, 'name': plane_name, 'departure': plane_name.split(
-            '-')[0], 'arrival': plane_name.split('-')[1], 'status': plane_status, 'large': large, 'heavy': heavy})
-
-    return planes_data
+def get_cargo_plane_details(aircraft_type_id):
+    fleet = current_fleet()
+    if fleet is None:
+        return fetch_cargo_fleet(aircraft_type_id)
+    return fleet.cargo(aircraft_type_id)
 
 
 def get_pax_plane_details(aircraft_type_id):
-    planes_data = []
-
-    driver = get_driver()
-
-    driver.get(
-        f'https://www.airlinemanager.com/fleet.php?type={aircraft_type_id}')
+    fleet = current_fleet()
+    if fleet is None:
+        return fetch_pax_fleet(aircraft_type_id)
+    return fleet.pax(aircraft_type_id)
 
-    elements = driver.find_elements(By.XPATH, '/html/body/div[2]/div/div')
 
-    for element in elements:
-        try:
-            plane_id = element.find_element(
-                By.XPATH, f'.//div[1]/span').get_attribute("onclick").split(',')[1]
-            plane_name = element.find_element(
-                By.XPATH, f'.//div[2]/a').text
-            plane_status = element.find_element(
-                By.XPATH, f'.//div[4]/span').text
-            plane_seats = element.find_element(
-                By.XPATH, f'.//div[3]').text
-
-            economy = plane_seats.split('\n')[0].split(': ')[1]
-            business = plane_seats.split('\n')[1].split(': ')[1]
-            first = plane_seats.split('\n')[2].split(': ')[1]
-        except Exception as e:
-            LOGGER.exception(
-                'something went wrong when getting plane details', e)
-            LOGGER.info(element.text)
-            raise e
-
-        planes_data.append({'id': plane_id, 'name': plane_name, 'departure': plane_name.split(
-            '-')[0], 'arrival': plane_name.split('-')[1], 'status': plane_status, 'economy': economy, 'business': business, 'first': first})
-
-    return planes_data
+def planes_with_status(kind, aircraft_type_id, status):
+    # possible values are ['Maintenance', 'Routed', 'Pending', 'Grounded', 'Parked']
+    fleet = current_fleet()
+    if fleet is not None:
+        return fleet.with_status(kind, aircraft_type_id, status)
+    planes = fetch_pax_fleet(aircraft_type_id) if kind == 'pax' else fetch_cargo_fleet(aircraft_type_id)
+    return [plane for plane in planes if plane['status'] == status]
 
 
 def get_seat_configuration(departure, arrival, max_seat_capacity, trips):
@@ -564,9 +980,10 @@ def create_pax_routes(aircraft_type_id):
 
 
 def modify_pax_aircraft(aircraft_id, economy, business, first):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/maint_plan_do.php?mode=do&modType=pax&id={aircraft_id}&type=modify&eSeat={economy}&bSeat={business}&fSeat={first}&mod1=1&mod2=1&mod3=1')
+    game_action(
+        f'maint_plan_do.php?mode=do&modType=pax&id={aircraft_id}&type=modify&eSeat={economy}&bSeat={business}&fSeat={first}&mod1=1&mod2=1&mod3=1')
+    fleet_changed(aircraft_id=aircraft_id)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'Modification scheduled for pax aircraft {aircraft_id}')
 
 
@@ -574,144 +991,103 @@ def modify_cargo_aircraft(aircraft_id, large, heavy):
     LOGGER.info(f'modifying cargo aircraft {aircraft_id} with heavy {heavy} and large {large}')
     if large != 330000:
         large = 330000
-    driver = get_driver()
     # 'https://www.airlinemanager.com/maint_plan_do.php?mode=do&modType=cargo&id=31068059&type=modify&large=0&heavy=303700&mod1=1&mod2=1&mod3=1'
-    driver.get(
-        f'https://www.airlinemanager.com/maint_plan_do.php?mode=do&modType=cargo&id={aircraft_id}&type=modify&large={large}&heavy={heavy}&mod1=1&mod2=1&mod3=1')
+    game_action(
+        f'maint_plan_do.php?mode=do&modType=cargo&id={aircraft_id}&type=modify&large={large}&heavy={heavy}&mod1=1&mod2=1&mod3=1')
     LOGGER.info(f'https://www.airlinemanager.com/maint_plan_do.php?mode=do&modType=cargo&id={aircraft_id}&type=modify&large={large}&heavy={heavy}&mod1=1&mod2=1&mod3=1')
+    fleet_changed(aircraft_id=aircraft_id)
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'Modification scheduled for cargo aircraft {aircraft_id}')
 
 
 def check_aircraft(aircraft_id):
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/maint_plan_do.php?mode=do&type=check&id={aircraft_id}')
+    game_action(
+        f'maint_plan_do.php?mode=do&type=check&id={aircraft_id}')
+    pages_changed(BANK_PAGE)
     LOGGER.info(f'A-Check scheduled for {aircraft_id}')
 
 
+def skip_unreachable(evaluate, planes):
+    # routes none of the planes can fly from the hub (out of range or runway too short) are looked up in the
+    # reach matrix and left out instead of scored. outcomes still line up with the page
+    from reach import get_reach_matrix
+
+    shortnames = [plane.shortname for plane in planes]
+
+    def evaluate_reachable(routes):
+        departures = {route['departure']['iata'] for route in routes}
+        if len(departures) != 1:
+            return evaluate(routes)
+        hub_iata_code = departures.pop()
+        reach_matrix = get_reach_matrix(reach_matrix_file)
+        if not all(reach_matrix.has(hub_iata_code, shortname) for shortname in shortnames):
+            return evaluate(routes)
+        reachable = reach_matrix.feasible_arrivals(hub_iata_code, shortnames,
+                                                   [route['arrival']['iata'] for route in routes])
+        if not reachable.any():
+            return [None] * len(routes)
+        kept = iter(evaluate([route for route, keep in zip(routes, reachable) if keep]))
+        outcomes = []
+        for keep in reachable:
+            outcome = next(kept, None) if keep else None
+            outcomes.append(outcome)
+            if outcome is am4help.STOP:
+                break
+        return outcomes
+    return evaluate_reachable
+
+
+def evaluate_pax_page(plane, routes, destinations):
+    import route_scoring
+
+    return route_scoring.PaxScores(route_scoring.RouteTable(routes, get_airport_catalog()), [plane],
+                                   destinations).outcomes()
+
+
 def find_pax_routes(plane, hub_iata_code, plane_details, limit=1):
-    airports = []
+    destinations = route_inventory(plane_details)
+    return route_finder().search_hub(hub_iata_code, 'firstClass',
+                                     skip_unreachable(lambda routes: evaluate_pax_page(plane, routes, destinations),
+                                                      [plane]),
+                                     am4help.SearchBudget(limit), plane.range, plane.runway)
 
-    with open('airports.json', 'r') as airports_file:
-        airports = json.load(airports_file)
 
-    routes = {}
+def find_pax_routes_for_hubs(plane, hub_iata_codes, plane_details, limit=1):
+    destinations = route_inventory(plane_details)
 
-    destinations = [plane['arrival']
-                    for plane in plane_details if plane['departure'] == hub_iata_code]
-    destinations.extend([plane['departure']
-                    for plane in plane_details if plane['arrival'] == hub_iata_code])
+    def evaluator_for_hub(hub_iata_code):
+        return skip_unreachable(lambda routes: evaluate_pax_page(plane, routes, destinations), [plane])
 
-    for page_number in range(1, 500):
-        try:
-            response = requests.get(
-                f'https://am4help.com/route/search?departure={hub_iata_code}&sort=firstClass&order=desc&page={page_number}&mode=hub')
-            if response.status_code == 404:
-                return routes
-            if response.status_code == 200 and 'routes' in response.json():
-                potential_routes = response.json()['routes']
-                for route in potential_routes:
-                    try:
-                        if route['arrival']['iata'] in destinations:
-                            # this route already exists
-                            continue
-                        if route['distance'] > plane['range']:
-                            # this route is too long for this plane
-                            continue
-                        trips = math.ceil(
-                            23/(route['distance']/(plane['engine']['speed'] * 1.1)))
-                        airport = [
-                            airport for airport in airports if airport['iata'] == route['arrival']['iata']][0]
-                        if airport['runway'] < plane['runway']:
-                            # runway in the destination is too short for this plane
-                            continue
-                        if route['first_class_demand'] + route['business_demand'] + route['economic_demand'] < trips * plane['capacity']:
-                            # if the combined demand is more than n*capacity, the trip is worth it. (n is the number of trips)
-                            continue
-                        if route['first_class_demand'] <= plane['capacity'] * 0.14 * trips * 0.95:
-                            # if the first class demand is less than 18% of the capacity, the trip is not very profitable.
-                            # since the routes are ordered by first class demand, it makes sense to continue checking for this hub anymore.
-                            return routes
-                        if route['first_class_demand'] + route['business_demand'] <= plane['capacity'] * 0.35 * trips * 0.95:
-                            # the combined demand of first and business class is less than 45% of the capacity, the trip is not very profitable.
-                            continue
-                        e, b, f = get_seat_configuration(
-                            route['departure']['iata'], route['arrival']['iata'], plane['capacity'], trips)
-
-                        routes[f"{route['departure']['iata']}-{route['arrival']['iata']}"] = {
-                            'name': f"{route['departure']['iata']}-{route['arrival']['iata']}", 'economy': e, 'business': b, 'first': f, 'distance': route['distance'], 'trips': trips}
-                        if len(routes) == limit:
-                            return routes
-                    except Exception as e:
-                        LOGGER.exception(
-                            'Error processing a route from am4help', e)
-        except Exception as e:
-            LOGGER.exception('Error getting routes from am4help', e)
-    return routes
+    return route_finder().search_hubs(hub_iata_codes, 'firstClass', evaluator_for_hub, limit,
+                                      plane.range, plane.runway)
 
 
-def find_cargo_routes(plane, hub_iata_code, limit=1):
-    airports = []
+def evaluate_cargo_page(plane, routes, destinations):
+    import route_scoring
 
-    with open('airports.json', 'r') as airports_file:
-        airports = json.load(airports_file)
+    return route_scoring.CargoScores(route_scoring.RouteTable(routes, get_airport_catalog()), [plane],
+                                     destinations).outcomes()
 
-    plane_details = get_cargo_plane_details(plane['id'])
 
-    destinations = [plane['arrival']
-                    for plane in plane_details if plane['departure'] == hub_iata_code]
-    destinations.extend([plane['departure']
-                    for plane in plane_details if plane['arrival'] == hub_iata_code])
-    routes = {}
+def find_cargo_routes(plane, hub_iata_code, limit=1, plane_details=None):
+    if plane_details is None:
+        plane_details = get_cargo_plane_details(plane.id)
 
-    for page_number in range(1, 500):
-        try:
-            response = requests.get(
-                f'https://am4help.com/route/search?departure={hub_iata_code}&sort=large&order=desc&page={page_number}&mode=hub')
-            if response.status_code == 404:
-                return routes
-            if response.status_code == 200 and 'routes' in response.json():
-                potential_routes = response.json()['routes']
-                for route in potential_routes:
-                    try:
-                        if route['arrival']['iata'] in destinations:
-                            # this route already exists
-                            continue
-                        if route['distance'] > plane['range']:
-                            # this route is too long for this plane
-                            continue
-                        trips = math.ceil(
-                            24/(route['distance']/(plane['engine']['speed'] * 1.1)))
-                        airport = [
-                            airport for airport in airports if airport['iata'] == route['arrival']['iata']][0]
-                        if airport['runway'] < plane['runway']:
-                            # runway in the destination is too short for this plane
-                            continue
-                        if ((route['large_demand'] * 1.06) / 0.7) + (route['heavy_demand'] * 1.06) < trips * plane['capacity']:
-                            # if the combined demand is more than trip*capacity, the trip is worth it.
-                            continue
-                        if route['large_demand'] * 1.06 < plane['capacity'] * 0.7 * 0.87 * trips:
-                            # if the large demand is less than 75% of the capacity, the trip is not very profitable.
-                            # since the routes are ordered by first class demand, it makes sense to continue checking for this hub anymore.
-                            return routes
-                        if (route['large_demand'] * 1.06) / trips > plane['capacity'] * 0.7:
-                            a, f = 0, 0
-                        else:
-                            continue
-                            large_demand = (route['large_demand'] * 1.06) / trips
-                            heavy_demand_pct = math.floor(((plane['capacity'] - (large_demand / 0.7))/plane['capacity'])*100)
-                            a, f = math.floor(heavy_demand_pct/2), math.ceil(heavy_demand_pct/2)
-
-                        routes[f"{route['departure']['iata']}-{route['arrival']['iata']}"] = {
-                            'name': f"{route['departure']['iata']}-{route['arrival']['iata']}", 'aft': a, 'fwd': f, 'distance': route['distance'], 'trips': trips}
-                        if len(routes) == limit:
-                            return routes
-                    except Exception as e:
-                        LOGGER.exception(
-                            'Error processing a route from am4help', e)
-        except Exception as e:
-            LOGGER.exception('Error getting routes from am4help', e)
-    return routes
+    destinations = route_inventory(plane_details)
+    return route_finder().search_hub(hub_iata_code, 'large',
+                                     skip_unreachable(lambda routes: evaluate_cargo_page(plane, routes, destinations),
+                                                      [plane]),
+                                     am4help.SearchBudget(limit), plane.range, plane.runway)
+
+
+def find_cargo_routes_for_hubs(plane, hub_iata_codes, limit=1):
+    destinations = route_inventory(get_cargo_plane_details(plane.id))
+
+    def evaluator_for_hub(hub_iata_code):
+        return skip_unreachable(lambda routes: evaluate_cargo_page(plane, routes, destinations), [plane])
+
+    return route_finder().search_hubs(hub_iata_codes, 'large', evaluator_for_hub, limit,
+                                      plane.range, plane.runway)
 
 
 def get_hanger_capacity(plane_type='pax'):
@@ -720,212 +1096,285 @@ def get_hanger_capacity(plane_type='pax'):
         LOGGER.exception(e)
         return 0
     try:
-        driver = get_driver()
-        driver.get(f'https://www.airlinemanager.com/hangars.php?type={plane_type}')
-        return int(driver.find_element(By.XPATH, '/html/body/div[3]/div[2]/table/tbody/tr[2]/td[3]/span').text)
+        return page_parser.parse_hangar_capacity(fetch_html(f'hangars.php?type={plane_type}'))
     except Exception as e:
         LOGGER.exception('Error getting hanger capacity')
         LOGGER.exception(e)
         return 0
 
 
-def buy_cargo_aircrafts():
-    hanger_capacity = get_hanger_capacity('cargo')
+def gather_candidates(kind, planes, hub_iata_codes, destinations):
+    # am4help routes any of the planes can fly, up to buy_candidates_per_hub per hub, searched in parallel
+    import route_scoring
+
+    scores_class, sort = (route_scoring.PaxScores, 'firstClass') if kind == 'pax' else (
+        route_scoring.CargoScores, 'large')
+
+    def evaluator_for_hub(hub_iata_code):
+        found = [0]
+
+        def evaluate(routes):
+            outcomes = scores_class(route_scoring.RouteTable(routes, get_airport_catalog()), planes,
+                                    destinations).any_outcomes()
+            for position, outcome in enumerate(outcomes):
+                if found[0] >= buy_candidates_per_hub:
+                    return outcomes[:position] + [am4help.STOP]
+                if outcome is not None and outcome is not am4help.STOP:
+                    found[0] += 1
+            return outcomes
+        return skip_unreachable(evaluate, planes)
+
+    routes_by_hub = route_finder().search_hubs(hub_iata_codes, sort, evaluator_for_hub,
+                                               buy_candidates_per_hub * len(hub_iata_codes),
+                                               max(plane.range for plane in planes),
+                                               min(plane.runway for plane in planes))
+    return [route for routes in routes_by_hub.values() for route in routes.values()]
+
+
+def has_tickets(route, kind):
+    ticket = (route.get('ticket') or {}).get('realism') or {}
+    return ticket.get('ticketY' if kind == 'pax' else 'ticketL') is not None
+
+
+def with_tickets(routes, kind):
+    # the routes with the realism ticket prices am4help reports for them, from the route store, the ticket
+    # cache or am4help, looked up in parallel. am4help search results don't carry prices, route store rows may
+    def priced(route):
+        if has_tickets(route, kind):
+            return route
+        try:
+            _, ticket = get_route_details(route['departure']['iata'], route['arrival']['iata'], kind)
+        except Exception:
+            LOGGER.debug(f'no ticket prices for {route["departure"]["iata"]}-{route["arrival"]["iata"]}',
+                         exc_info=True)
+            return route
+        return dict(route, ticket=ticket)
+
+    with ThreadPoolExecutor(max_workers=am4help_concurrency, thread_name_prefix='tickets') as executor:
+        routes = list(executor.map(priced, routes))
+    missing = sum(1 for route in routes if not has_tickets(route, kind))
+    if missing > 0:
+        LOGGER.warning(f'no ticket prices for {missing} of {len(routes)} {kind} routes, they are not bought')
+    return routes
+
+
+def buy_aircrafts(kind, shortnames, reserve_factor, cost_factor):
+    # buys the set of planes with the best expected daily profit per dollar, over all hubs and models,
+    # rather than the first routes found at randomly ordered hubs
+    import route_scoring
+
+    catalog = get_plane_catalog()
+    unknown = [shortname for shortname in shortnames
+               if catalog.get(shortname) is None or catalog.get(shortname).kind != kind]
+    if unknown:
+        LOGGER.warning(f'unknown {kind} planes to buy: {", ".join(unknown)}')
+    planes = catalog.of_kind(kind, shortnames)
+    if not planes:
+        LOGGER.warning(f'no known {kind} planes to buy')
+        return
+    hanger_capacity = get_hanger_capacity(kind)
     if hanger_capacity == 0:
-        LOGGER.warning('No hanger capacity available. Cannot buy new cargo planes.')
+        LOGGER.warning(f'No hanger capacity available. Cannot buy new {kind} planes.')
         return
-    planes = []
-    hubs = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['cargo']
     with open('hubs.json', 'r') as hubs_json:
         hubs = json.load(hubs_json)
-    plane = [plane for plane in planes if plane['shortname'] == cargo_plane_to_buy][0]
-    random.shuffle(hubs)
-    balance = get_balance()
-    if balance > plane['price'] * 1.2:
-        quantity = math.floor(balance / (plane['price'] * 1.1))
-        if quantity > hanger_capacity:
-            quantity = hanger_capacity
-        LOGGER.info(f'Buying {quantity} {plane["model"]}')
-        for hub in hubs:
-            routes = find_cargo_routes(plane, hub['iata'], quantity)
-            if routes is None or len(routes) == 0:
-                continue
-            if len(routes) <= quantity:
-                quantity -= len(routes)
-            for name, route in routes.items():
-                buy_cargo_aircraft(plane['id'], hub['hub_id'], plane['engine']['id'],
-                             name, route['aft'], route['fwd'])
-            if quantity == 0:
-                break
-        if quantity != 0:
-            LOGGER.info(
-                f'Could not buy {quantity} {plane["model"]} as there are no possible routes left.')
+    # checked again before buying, this only saves the search when there's clearly not enough
+    if get_balance() <= min(plane.price for plane in planes) * reserve_factor:
+        LOGGER.info(f'not enough money to buy {kind} planes')
+        return
+    # every route flown by any aircraft type, plus the fleets of the models to buy
+    destinations = route_inventory()
+    for plane in planes:
+        destinations.add_planes(get_pax_plane_details(plane.id) if kind == 'pax' else get_cargo_plane_details(plane.id))
+    hub_iata_codes = [hub['iata'] for hub in hubs]
+    # ranked by the profit at the prices am4help reports for each candidate
+    candidates = with_tickets(gather_candidates(kind, planes, hub_iata_codes, destinations), kind)
+    fuel_price, _, _ = get_fuel_stats()
+    co2_price, _, _ = get_co2_stats()
+    start = time.monotonic()
+    scores_class = route_scoring.PaxScores if kind == 'pax' else route_scoring.CargoScores
+    scores = scores_class(route_scoring.RouteTable(candidates, get_airport_catalog()), planes,
+                          destinations,
+                          fuel_price=fuel_price, co2_price=co2_price)
+    hub_ids = {hub['iata']: hub['hub_id'] for hub in hubs}
+    # the search ran without the budget, the purchases are chosen from the balance left when it is taken
+    with spending():
+        balance = get_balance()
+        if balance <= min(plane.price for plane in planes) * reserve_factor:
+            LOGGER.info(f'not enough money left to buy {kind} planes')
+            return
+        purchases = route_scoring.select_purchases(scores, balance, hanger_capacity, cost_factor)
+        LOGGER.info(f'chose {len(purchases)} {kind} planes out of {len(candidates)} candidate routes '
+                    f'in {time.monotonic() - start:.3f}s')
+        for purchase in purchases:
+            plane = planes[purchase['model']]
+            LOGGER.info(f'{plane.model} on {purchase["name"]}: {purchase["trips"]} trips, '
+                        f'${purchase["profit"]:,.0f} a day')
+            if kind == 'pax':
+                buy_pax_aircraft(plane.id, hub_ids[purchase['departure']], plane.engine_id, purchase['name'],
+                                 purchase['economy'], purchase['business'], purchase['first'])
+            else:
+                buy_cargo_aircraft(plane.id, hub_ids[purchase['departure']], plane.engine_id, purchase['name'],
+                                   purchase['aft'], purchase['fwd'])
+    if len(purchases) == 0:
+        LOGGER.info(f'Could not buy {kind} planes as there are no possible routes left.')
+
+
+def buy_cargo_aircrafts():
+    buy_aircrafts('cargo', cargo_planes_to_buy, reserve_factor=1.2, cost_factor=1.1)
 
 
 def buy_pax_aircrafts():
-    hanger_capacity = get_hanger_capacity('pax')
-    if hanger_capacity == 0:
-        LOGGER.warning('No hanger capacity available. Cannot buy new pax planes.')
-        return
-    planes = []
-    hubs = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['pax']
-    with open('hubs.json', 'r') as hubs_json:
-        hubs = json.load(hubs_json)
-    plane = [plane for plane in planes if plane['shortname'] == pax_plane_to_buy][0]
-    random.shuffle(hubs)
-    balance = get_balance()
-    if balance > plane['price'] * 1.5:
-        quantity = math.floor(balance / (plane['price'] * 1.5))
-        if quantity > hanger_capacity:
-            quantity = hanger_capacity
-        LOGGER.info(f'Buying {quantity} {plane["model"]}')
-        plane_details = get_pax_plane_details(plane['id'])
-
-        # include a339 routes in check as well...
-        plane_details.extend(get_pax_plane_details(308))
-
-        for hub in hubs:
-            routes = find_pax_routes(plane, hub['iata'], plane_details, quantity)
-            if routes is None or len(routes) == 0:
-                continue
-            if len(routes) <= quantity:
-                quantity -= len(routes)
-            for name, route in routes.items():
-                buy_pax_aircraft(plane['id'], hub['hub_id'], plane['engine']['id'],
-                             name, route['economy'], route['business'], route['first'])
-            if quantity == 0:
-                break
-        if quantity != 0:
-            LOGGER.info(
-                f'Could not buy {quantity} {plane["model"]} as there are no possible routes left.')
+    buy_aircrafts('pax', pax_planes_to_buy, reserve_factor=1.5, cost_factor=1.5)
 
 
 def route_pax_aircrafts():
-    planes = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['pax']
-    plane = [plane for plane in planes if plane['shortname'] == pax_plane_to_buy][0]
-    for plane_data in get_pax_plane_details(plane['id']):
-        # possible vales are ['Maintenance', 'Routed', 'Pending', 'Grounded', 'Parked']
-        if plane_data['status'] in ['Parked']:
-            modify_pax_aircraft(plane_data['id'], plane_data['economy'],
-                            plane_data['business'], plane_data['first'])
-            route_details, ticket_prices = get_route_details(
-                plane_data['departure'], plane_data['arrival'], 'pax')
-            create_route(plane_data['id'],
-                         plane_data['name'], route_details['arrival']['id'], ticket_prices['realism']['ticketY'],
-                         ticket_prices['realism']['ticketJ'], ticket_prices['realism']['ticketF'])
+    plane = get_plane_catalog().get(pax_plane_to_buy)
+    for plane_data in planes_with_status('pax', plane.id, 'Parked'):
+        modify_pax_aircraft(plane_data['id'], plane_data['economy'],
+                        plane_data['business'], plane_data['first'])
+        route_details, ticket_prices = get_route_details(
+            plane_data['departure'], plane_data['arrival'], 'pax')
+        create_route(plane_data['id'],
+                     plane_data['name'], route_details['arrival']['id'], ticket_prices['realism']['ticketY'],
+                     ticket_prices['realism']['ticketJ'], ticket_prices['realism']['ticketF'])
 
 
 def route_cargo_aircrafts():
-    planes = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['cargo']
-    plane = [plane for plane in planes if plane['shortname'] == cargo_plane_to_buy][0]
-    for plane_data in get_cargo_plane_details(plane['id']):
-        # possible vales are ['Maintenance', 'Routed', 'Pending', 'Grounded', 'Parked']
-        if plane_data['status'] in ['Parked']:
-            modify_cargo_aircraft(plane_data['id'], plane_data['large'],
-                            plane_data['heavy'])
-            route_details, ticket_prices = get_route_details(
-                plane_data['departure'], plane_data['arrival'], 'cargo')
-            create_cargo_route(plane_data['id'],
-                         plane_data['name'], route_details['arrival']['id'], ticket_prices['realism']['ticketL'],
-                         ticket_prices['realism']['ticketH'])
+    plane = get_plane_catalog().get(cargo_plane_to_buy)
+    for plane_data in planes_with_status('cargo', plane.id, 'Parked'):
+        modify_cargo_aircraft(plane_data['id'], plane_data['large'],
+                        plane_data['heavy'])
+        route_details, ticket_prices = get_route_details(
+            plane_data['departure'], plane_data['arrival'], 'cargo')
+        create_cargo_route(plane_data['id'],
+                     plane_data['name'], route_details['arrival']['id'], ticket_prices['realism']['ticketL'],
+                     ticket_prices['realism']['ticketH'])
 
 
 def start_marketing_campaign(type, campaign, duration):
     campaign_map = {'type': {1: 'Airline', 2: 'Cargo', 5: 'Eco Friendly'},
                     'campaign': {1: '5-10%', 2: '10-18%', 3: '19-25%', 4: '25-35%'},
                     'duration': {1: '4', 2: '8', 3: '12', 4: '16', 5: '20', 6: '24'}}
-    driver = get_driver()
-    driver.get(
-        f'https://www.airlinemanager.com/marketing_new.php?type={type}&c={campaign}&mode=do&d={duration}')
+    game_action(
+        f'marketing_new.php?type={type}&c={campaign}&mode=do&d={duration}')
+    pages_changed(MARKETING_PAGE, BANK_PAGE)
     LOGGER.info(
         f'{campaign_map["type"][type]} campaign started for {campaign_map["campaign"][campaign]} with duration {campaign_map["duration"][duration]} hours')
 
 
 def get_reputation():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/marketing.php')
-    pax_rep = int(driver.find_element(By.XPATH, '/html/body/div/div[1]/div[1]/div').text)
-    cargo_rep = int(driver.find_element(By.XPATH, '/html/body/div/div[1]/div[2]/div').text)
-    # /html/body/div/div[1]/div[1]/div
-    # /html/body/div/div[1]/div[2]/div
-    return pax_rep, cargo_rep
+    return page_parser.parse_reputation(get_page(MARKETING_PAGE))
 
 
 def marketing():
-    driver = get_driver()
-    driver.get('https://www.airlinemanager.com/marketing.php')
-    campaign_table = driver.find_element(By.ID, 'active-campaigns')
-    campaigns = campaign_table.find_elements(
-        by=By.TAG_NAME, value='td')
+    campaigns = page_parser.parse_active_campaigns(get_page(MARKETING_PAGE))
     if len(campaigns) == 0:
         # start all campaigns
-        start_marketing_campaign(1, 4, 3)
-        start_marketing_campaign(5, 4, 3)
+        with spending():
+            start_marketing_campaign(1, 4, 3)
+            start_marketing_campaign(5, 4, 3)
         # cargo marketing is not worth at this point. 
         # start_marketing_campaign(2, 4, 3)
     else:
-        active_campaign = [campaign.text.strip()
-                           for campaign in campaigns if campaign.text.strip() != '']
-        if 'Airline reputation' not in active_campaign:
-            # start airlines campaign
-            start_marketing_campaign(1, 4, 3)
-        if 'Eco friendly' not in active_campaign:
-            # start aircraft campaign
-            start_marketing_campaign(5, 4, 3)
+        active_campaign = [campaign for campaign in campaigns if campaign != '']
+        with spending():
+            if 'Airline reputation' not in active_campaign:
+                # start airlines campaign
+                start_marketing_campaign(1, 4, 3)
+            if 'Eco friendly' not in active_campaign:
+                # start aircraft campaign
+                start_marketing_campaign(5, 4, 3)
         # cargo marketing is not worth at this point. 
         # if 'Cargo reputation' not in active_campaign:
         #     # start cargo campaign
         #     start_marketing_campaign(2, 4, 3)
 
 
+def routine_job():
+    with browser_session():
+        perform_routine_ops()
+    return 'All Done!'
+
+
+def ticket_price_job():
+    with browser_session():
+        report = update_ticket_prices()
+    LOGGER.info(f'am4help ticket cache: {ticket_cache.stats()}')
+    return {'message': 'ticket prices updated', 'stages': report}
+
+
+def update_fleet_job(aircraft_type_id, max_seat_capacity, trips):
+    with browser_session():
+        update_fleet_seats(aircraft_type_id, max_seat_capacity, trips)
+    return 'fleet updated'
+
+
+# long running endpoints only queue a job, so scheduler retries don't start overlapping runs
+with startup_phase('job_queue'):
+    # workers start with the server (or the first submit), not on import
+    job_queue = JobQueue({'routine': routine_job, 'ticket_price': ticket_price_job,
+                          'update_fleet': update_fleet_job}, file_name=job_queue_file, workers=job_workers)
+
+
+def queue_job(type, **args):
+    job_id, queued = job_queue.submit(type, **args)
+    return {'job_id': job_id, 'queued': queued, 'status_url': f'/jobs/{job_id}'}, 202
+
+
 @app.route('/')
 def run_app():
-    logout()
-    login(username, password)
-    perform_routine_ops()
-    logout()
-    return 'All Done!', 200
+    return queue_job('routine')
 
 
 @app.route('/depart')
 def depart():
-    login(username, password)
-    depart_planes()
-    logout()
-    return 'Planes Departed (Max. 20)!', 200
+    with browser_session():
+        departed = depart_all_planes()
+    if departed is None:
+        return 'Planes Departed (count unknown)!', 200
+    return f'{departed} Planes Departed!', 200
 
 
 @app.route('/maintain')
 def do_maintanance():
-    login(username, password)
-    check_aircrafts()
-    logout()
+    with browser_session():
+        check_aircrafts()
     return 'Maintanance scheduled for planes in base', 200
 
 
 @app.route('/update_ticket_price')
 def update_ticket_price():
-    login(username, password)
-    route_list = get_routes()
-    for route in route_list:
-        set_ticket_price(route['route_id'], route['ticket_price']['ticketY'],
-                         route['ticket_price']['ticketJ'], route['ticket_price']['ticketF'])
-    logout()
-    return 'ticket prices updated', 200
+    return queue_job('ticket_price')
 
 
 @app.route('/update_fleet/<aircraft_type_id>/<max_seat_capacity>/<trips>')
 def update_fleet(aircraft_type_id, max_seat_capacity, trips):
-    login(username, password)
+    return queue_job('update_fleet', aircraft_type_id=aircraft_type_id, max_seat_capacity=max_seat_capacity,
+                     trips=trips)
+
 
+@app.route('/metrics')
+def metrics_endpoint():
+    ticket_stats = ticket_cache.stats()
+    gauges = {('cache_hits', (('cache', 'am4help'),)): ticket_stats['hits'],
+              ('cache_misses', (('cache', 'am4help'),)): ticket_stats['misses'],
+              ('cache_hit_rate', (('cache', 'am4help'),)): ticket_stats['hit_rate'],
+              ('browser_pool_size', ()): browser_pool_size}
+    gauges.update({('startup_seconds', (('phase', phase),)): round(seconds, 4)
+                   for phase, seconds in list(startup_phases.items())})
+    return metrics.render(gauges), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {'message': f'unknown job {job_id}'}, 404
+    return job, 200
+
+
+def update_fleet_seats(aircraft_type_id, max_seat_capacity, trips):
     for plane_data in get_pax_plane_details(aircraft_type_id):
         # possible vales are ['Maintenance', 'Routed', 'Pending', 'Grounded', 'Parked']
         if plane_data['status'] in ['Pending', 'Grounded', 'Maintenance']:
@@ -948,10 +1397,27 @@ def update_fleet(aircraft_type_id, max_seat_capacity, trips):
 
         modify_pax_aircraft(plane_data['id'], e, b, f)
 
-    logout()
 
+def prewarm():
+    # loads what the first requests would otherwise wait for, after the server is listening
+    try:
+        prewarm_catalogs()
+        if prewarm_browser:
+            with startup_phase('browser'):
+                with browser_pool.session():
+                    pass
+    except Exception:
+        LOGGER.exception('error prewarming')
 
-if __name__ == '__main__':
-    from waitress import serve
 
-    serve(app, host='0.0.0.0', port=8080)
+if __name__ == '__main__':
+    from waitress import create_server
+
+    startup_phases['module'] = time.monotonic() - startup_started
+    # the socket listens once the server is created, so cold start requests queue while the rest warms up
+    server = create_server(app, host='0.0.0.0', port=8080)
+    startup_phases['listening'] = time.monotonic() - startup_started
+    LOGGER.info(f'listening after {startup_phases["listening"]:.3f}s ({startup_mode} startup)')
+    job_queue.start()
+    threading.Thread(target=prewarm, name='prewarm', daemon=True).start()
+    server.run()
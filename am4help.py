@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from catalog import get_airport_catalog
+
+LOGGER = logging.getLogger()
+
+AM4HELP_URL = os.environ.get('AM4HELP_URL', 'https://am4help.com')
+
+# returned by a route evaluator when the remaining (lower ranked) routes of a hub aren't worth checking
+STOP = object()
+
+
+class RateLimiter:
+    # spaces out requests to the same host so concurrent searches don't hammer am4help
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if self.interval == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SearchBudget:
+    # number of routes still wanted, shared by every hub of a search
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        return self.remaining <= 0
+
+    def claim(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class RouteSearch:
+
+    def __init__(self, concurrency=8, hub_concurrency=4, requests_per_second=10, prefetch=3, max_pages=499,
+                 timeout=30):
+        self.hub_concurrency = hub_concurrency
+        self.prefetch = prefetch
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=concurrency))
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._pages = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='am4help')
+
+    def get(self, url):
+        self.rate_limiter.wait(urlparse(url).netloc)
+        return self.session.get(url, timeout=self.timeout)
+
+    def fetch_page(self, hub_iata_code, sort, page_number):
+        # returns the routes of the page, or None once there are no more pages
+        try:
+            response = self.get(
+                f'{AM4HELP_URL}/route/search?departure={hub_iata_code}&sort={sort}&order=desc&page={page_number}&mode=hub')
+            if response.status_code == 404:
+                return None
+            if response.status_code == 200:
+                return response.json().get('routes', [])
+        except Exception:
+            LOGGER.exception('Error getting routes from am4help')
+        return []
+
+    @staticmethod
+    def _within(max_distance, min_runway):
+        # am4help can't filter by distance or runway, so routes longer than max_distance or to airports
+        # with runways shorter than min_runway are dropped here, before they are evaluated
+        landable = None if min_runway is None else get_airport_catalog().landable(min_runway)
+
+        def within(route):
+            if max_distance is not None and route['distance'] > max_distance:
+                return False
+            return landable is None or route['arrival']['iata'] in landable
+        return within
+
+    def search_hub(self, hub_iata_code, sort, evaluate, budget, max_distance=None, min_runway=None):
+        # evaluate(routes) scores a whole page at once and returns, per route, (name, route_data) to keep it,
+        # None to skip it, or STOP. pages are prefetched a few at a time, but evaluated in order,
+        # since the early exit relies on the sort order. only the routes within max_distance and min_runway
+        # are passed to evaluate
+        within = self._within(max_distance, min_runway)
+        routes = {}
+        pending = {}
+        next_page = 1
+        try:
+            for page_number in range(1, self.max_pages + 1):
+                while next_page <= self.max_pages and len(pending) < self.prefetch:
+                    pending[next_page] = self._pages.submit(self.fetch_page, hub_iata_code, sort, next_page)
+                    next_page += 1
+                potential_routes = pending.pop(page_number).result()
+                if potential_routes is None:
+                    return routes
+                potential_routes = [route for route in potential_routes if within(route)]
+                if len(potential_routes) == 0:
+                    continue
+                try:
+                    outcomes = evaluate(potential_routes)
+                except Exception:
+                    LOGGER.exception('Error processing routes from am4help')
+                    continue
+                for outcome in outcomes:
+                    if budget.exhausted:
+                        return routes
+                    if outcome is STOP:
+                        return routes
+                    if outcome is None:
+                        continue
+                    if not budget.claim():
+                        return routes
+                    name, route_data = outcome
+                    routes[name] = route_data
+            return routes
+        finally:
+            for future in pending.values():
+                future.cancel()
+
+    def search_hubs(self, hub_iata_codes, sort, evaluator_for_hub, limit, max_distance=None, min_runway=None):
+        # searches several hubs at once, returns {hub_iata_code: {name: route_data}}
+        budget = SearchBudget(limit)
+        routes_by_hub = {}
+        with ThreadPoolExecutor(max_workers=self.hub_concurrency, thread_name_prefix='hub-search') as hubs_pool:
+            futures = {hubs_pool.submit(self.search_hub, hub_iata_code, sort, evaluator_for_hub(hub_iata_code),
+                                        budget, max_distance, min_runway): hub_iata_code
+                       for hub_iata_code in hub_iata_codes}
+            for future in as_completed(futures):
+                hub_iata_code = futures[future]
+                try:
+                    routes = future.result()
+                except Exception:
+                    LOGGER.exception(f'Error searching routes for hub {hub_iata_code}')
+                    continue
+                if len(routes) > 0:
+                    routes_by_hub[hub_iata_code] = routes
+        return routes_by_hub
+
+
+class TicketCache:
+    # on-disk cache of am4help route/ticket responses keyed by (type, mode, departure, arrival).
+    # demand and realism prices hardly change between runs, so known pairs don't need the network.
+    # hits only note when a pair was used, the notes are written in batches with the next put or
+    # every USED_BATCH hits, for the least recently used eviction
+    USED_BATCH = 500
+
+    def __init__(self, file_name='am4help_cache.sqlite3', ttl=6 * 60 * 60, max_entries=20000, bypass=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._used = {}
+        self._db = sqlite3.connect(file_name, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS tickets (type TEXT, mode TEXT, departure TEXT, arrival TEXT, '
+                         'body TEXT, fetched_at REAL, used_at REAL, PRIMARY KEY (type, mode, departure, arrival))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS tickets_used_at ON tickets (used_at)')
+        self._db.commit()
+
+    def get(self, type, mode, departure, arrival):
+        now = time.time()
+        key = (type, mode, departure, arrival)
+        with self._lock:
+            if self.bypass:
+                self.misses += 1
+                return None
+            row = self._db.execute('SELECT body, fetched_at FROM tickets WHERE type=? AND mode=? AND departure=? '
+                                   'AND arrival=?', key).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._used[key] = now
+            if len(self._used) >= self.USED_BATCH:
+                self._write_used()
+                self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def _write_used(self):
+        # called with the lock held, the caller commits
+        self._db.executemany('UPDATE tickets SET used_at=? WHERE type=? AND mode=? AND departure=? AND arrival=?',
+                             [(used_at,) + key for key, used_at in self._used.items()])
+        self._used.clear()
+
+    def put(self, type, mode, departure, arrival, route_details):
+        now = time.time()
+        with self._lock:
+            self._used.pop((type, mode, departure, arrival), None)
+            self._write_used()
+            self._db.execute('INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (type, mode, departure, arrival, json.dumps(route_details), now, now))
+            # evict the least recently used entries once the cache is full
+            self._db.execute('DELETE FROM tickets WHERE rowid IN (SELECT rowid FROM tickets ORDER BY used_at '
+                             'LIMIT max(0, (SELECT count(*) FROM tickets) - ?))', (self.max_entries,))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / lookups, 3) if lookups > 0 else 0}
@@ -0,0 +1,527 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+from catalog import get_plane_catalog
+
+LOGGER = logging.getLogger()
+
+# game endpoints that perform an action, the stand-in server only counts them
+ACTION_SCRIPTS = {'route_depart.php', 'set_ticket_prices.php', 'new_route_info.php', 'ac_order_do.php',
+                  'ac_order_do_cargo.php', 'maint_plan_do.php', 'marketing_new.php', 'lounge_action.php'}
+SEARCH_SORTS = ['firstClass', 'large']
+# the kind of route each search sort finds, whose ticket prices the buys look up
+SEARCH_KINDS = {'firstClass': 'pax', 'large': 'cargo'}
+# planes waiting to depart at the start of each departure, the game departs up to 20 a call
+PLANES_TO_DEPART = 65
+
+
+def fixture_name(script, args):
+    # fleet.php?type=2 -> fleet.php_type-2
+    return script + ''.join(f'_{key}-{value}' for key, value in sorted(args.items()))
+
+
+class Fixtures:
+    # recorded pages on disk: game/<fixture name>.html, am4help/search_<hub>_<sort>_<page>.json
+    # and am4help/ticket_<type>_<departure>_<arrival>.json
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _read(self, *parts):
+        file_name = os.path.join(self.directory, *parts)
+        if not os.path.exists(file_name):
+            return None
+        with open(file_name, 'r') as fixture_file:
+            return fixture_file.read()
+
+    def game_page(self, script, args):
+        page = self._read('game', f'{fixture_name(script, args)}.html')
+        return page if page is not None else self._read('game', f'{script}.html')
+
+    def search_page(self, hub, sort, page):
+        return self._read('am4help', f'search_{hub}_{sort}_{page}.json')
+
+    def ticket(self, type, departure, arrival):
+        return self._read('am4help', f'ticket_{type}_{departure}_{arrival}.json')
+
+    def write(self, content, *parts):
+        file_name = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, 'w') as fixture_file:
+            fixture_file.write(content)
+
+
+class StandInServer:
+    # replays the fixtures for the game under /game and for am4help under /am4help, and counts every call
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.calls = Counter()
+        self.planes_to_depart = PLANES_TO_DEPART
+        self._lock = threading.Lock()
+        self.app = self._create_app()
+        self._server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def count(self, key):
+        with self._lock:
+            self.calls[key] += 1
+
+    def calls_snapshot(self):
+        with self._lock:
+            return Counter(self.calls)
+
+    def depart(self):
+        with self._lock:
+            departed = min(20, self.planes_to_depart)
+            self.planes_to_depart -= departed
+            left = self.planes_to_depart
+            if left == 0:
+                # the next departure starts over
+                self.planes_to_depart = PLANES_TO_DEPART
+        return f'<div>{departed} aircraft departed</div><script>$("#listDepartAmount").html("{left}");</script>'
+
+    def _create_app(self):
+        app = Flask('stand_in')
+
+        @app.route('/game/<path:script>', methods=['GET', 'POST'])
+        def game(script):
+            args = request.args.to_dict()
+            if script in ACTION_SCRIPTS or args.get('mode') == 'do':
+                self.count(f'game/{script} (action)')
+                if script == 'route_depart.php':
+                    return self.depart()
+                return 'ok'
+            self.count(f'game/{script}')
+            page = self.fixtures.game_page(script, args)
+            # pages past the recorded ones (e.g. the next routes.php page) are empty
+            return page if page is not None else ''
+
+        @app.route('/am4help/route/search')
+        def search():
+            self.count('am4help/route/search')
+            page = self.fixtures.search_page(request.args['departure'], request.args['sort'], request.args['page'])
+            if page is None:
+                return {'message': 'no more routes'}, 404
+            return app.response_class(page, mimetype='application/json')
+
+        @app.route('/am4help/route/ticket')
+        def ticket():
+            self.count('am4help/route/ticket')
+            ticket = self.fixtures.ticket(request.args['type'], request.args['departure'], request.args['arrival'])
+            if ticket is None:
+                return {'message': 'unknown route'}, 404
+            return app.response_class(ticket, mimetype='application/json')
+
+        return app
+
+
+def distance_between(departure, arrival):
+    latitude_1, latitude_2 = math.radians(departure['latitude']), math.radians(arrival['latitude'])
+    delta = math.radians(arrival['longitude'] - departure['longitude'])
+    angle = math.acos(min(1, math.sin(latitude_1) * math.sin(latitude_2)
+                          + math.cos(latitude_1) * math.cos(latitude_2) * math.cos(delta)))
+    return round(6371 * angle)
+
+
+def synthesize(directory, seed=0, pages=4, page_size=50, fleet_size=200, route_count=300):
+    # writes made up fixtures with the shape of the recorded ones, so the benchmarks also run without an account
+    rng = random.Random(seed)
+    fixtures = Fixtures(directory)
+    with open('airports.json', 'r') as airports_json:
+        airports = [airport for airport in json.load(airports_json) if airport['runway'] > 0]
+    with open('hubs.json', 'r') as hubs_json:
+        hubs = json.load(hubs_json)
+    plane_catalog = get_plane_catalog()
+    airports_by_iata = {airport['iata']: airport for airport in airports}
+
+    def route(hub, arrival):
+        return {'departure': {'iata': hub['iata']}, 'arrival': {'iata': arrival['iata'], 'id': arrival['id']},
+                'distance': distance_between(hub, arrival),
+                'economic_demand': rng.randint(500, 3500), 'business_demand': rng.randint(150, 1300),
+                'first_class_demand': rng.randint(50, 900), 'large_demand': rng.randint(20000, 900000),
+                'heavy_demand': rng.randint(20000, 900000)}
+
+    def ticket(type, departure, arrival):
+        # a fare per km and a base fare drawn for each route, nothing the route scoring computes
+        details = route(airports_by_iata[departure], airports_by_iata[arrival])
+        distance = details['distance']
+        fare, base = rng.uniform(0.15, 0.6), rng.uniform(50, 400)
+        cargo_fare, cargo_base = rng.uniform(0.0003, 0.0015), rng.uniform(0.05, 0.5)
+        return {'routes': [details],
+                'ticket': {'realism': {'ticketY': round(fare * distance + base),
+                                       'ticketJ': round(rng.uniform(1.8, 2.5) * (fare * distance + base)),
+                                       'ticketF': round(rng.uniform(2.8, 3.5) * (fare * distance + base)),
+                                       'ticketL': round(cargo_fare * distance + cargo_base, 2),
+                                       'ticketH': round(rng.uniform(0.5, 0.8) * (cargo_fare * distance + cargo_base), 2)}}}
+
+    pairs = set()
+    # am4help search pages of every hub
+    for hub in hubs:
+        if hub['iata'] not in airports_by_iata:
+            continue
+        routes = [route(hub, arrival) for arrival in rng.sample(airports, pages * page_size)]
+        for sort, key in [('firstClass', 'first_class_demand'), ('large', 'large_demand')]:
+            routes.sort(key=lambda candidate: -candidate[key])
+            for page in range(pages):
+                fixtures.write(json.dumps({'routes': routes[page * page_size:(page + 1) * page_size]}),
+                               'am4help', f'search_{hub["iata"]}_{sort}_{page + 1}.json')
+            # am4help has no prices for some routes, those are left out of the buys
+            pairs.update((SEARCH_KINDS[sort], hub['iata'], candidate['arrival']['iata']) for candidate in routes
+                         if rng.random() > 0.1)
+
+    def fleet_row(plane_id, kind_id, name, status, seats):
+        # the onclick form of the live fleet pages, the id is the second argument
+        return (f'<div><div><span onclick="showAircraft(this,{plane_id},{kind_id})">i</span></div>'
+                f'<div><a>{name}</a></div><div>{"<br>".join(seats)}</div><div><span>{status}</span></div></div>')
+
+    # fleet pages of the planes the routine routes and buys
+    hub_codes = [hub['iata'] for hub in hubs if hub['iata'] in airports_by_iata]
+    plane_id = 40000000
+    for kind, shortnames in [('pax', ['a388', 'a339']), ('cargo', ['a388f'])]:
+        for plane in plane_catalog.of_kind(kind, shortnames):
+            rows = []
+            for index in range(fleet_size):
+                plane_id += 1
+                departure = rng.choice(hub_codes)
+                arrival = rng.choice(airports)['iata']
+                pairs.add((kind, departure, arrival))
+                status = 'Parked' if index % 25 == 0 else rng.choice(['Routed', 'Routed', 'Routed', 'Maintenance'])
+                seats = ([f'Y: {rng.randint(200, 400)}', f'J: {rng.randint(50, 150)}', f'F: {rng.randint(20, 80)}']
+                         if kind == 'pax' else [f'L: {rng.randint(100000, 300000)}', f'H: {rng.randint(0, 100000)}'])
+                rows.append(fleet_row(plane_id, plane.id, f'{departure}-{arrival}', status, seats))
+            fixtures.write(f'<div>fleet</div><div><div>{"".join(rows)}</div></div>', 'game',
+                           f'{fixture_name("fleet.php", {"type": plane.id})}.html')
+    fixtures.write('<div>fleet</div><div><div></div></div>', 'game', 'fleet.php.html')
+
+    # routes.php, 20 routes a page
+    route_rows = []
+    for index in range(route_count):
+        departure = rng.choice(hub_codes)
+        arrival = rng.choice(airports)['iata']
+        pairs.add(('pax', departure, arrival))
+        route_rows.append(f'<div class="m-text" id="routeMainList{50000000 + index}"><div><div><div>x</div>'
+                          f'<div><span>{departure} - {arrival}</span></div></div></div></div>')
+    for start in range(0, route_count, 20):
+        fixtures.write(f'<div id="routesContainer">{"".join(route_rows[start:start + 20])}</div>', 'game',
+                       f'{fixture_name("routes.php", {"start": start})}.html')
+    fixtures.write('<div id="routesContainer"></div>', 'game', 'routes.php.html')
+
+    for type, departure, arrival in pairs:
+        fixtures.write(json.dumps(ticket(type, departure, arrival)), 'am4help', f'ticket_{type}_{departure}_{arrival}.json')
+
+    # maintenance list, a few planes are due for an a-check
+    maintenance_rows = []
+    for index in range(fleet_size):
+        location = 'Not at base' if index % 3 == 0 else 'At base'
+        maintenance_rows.append(
+            f'<div class="maint-list-sort"><div><img src="/assets/aircrafts/pax/airbus/a380.png"></div>'
+            f'<div><div>REG{index}</div><div>A380-800</div><div>-</div><div>-</div><div>{location}</div>'
+            f'<div>A-Check</div><div>{rng.randint(0, 300)}</div></div><div id="controls{41000000 + index}"></div></div>')
+    fixtures.write(f'<div id="acListView">{"".join(maintenance_rows)}</div>', 'game', 'maint_plan.php.html')
+
+    fixtures.write('<div><div><div><span>Fuel</span><span>Price <b>$ 450</b></span></div></div></div>'
+                   '<span id="remCapacity">25,000,000</span><span id="holding">12,000,000</span>',
+                   'game', 'fuel.php.html')
+    fixtures.write('<div><div><div></div><div><span>CO2</span><span>Price <b>$ 105</b></span></div></div></div>'
+                   '<span id="remCapacity">30,000,000</span><span id="holding">9,000,000</span>'
+                   '<div id="eco-state-1" class="eco"></div>', 'game', 'co2.php.html')
+    fixtures.write('<div><div>$ 2,500,000,000</div></div>', 'game',
+                   f'{fixture_name("banking_account.php", {"id": 0})}.html')
+    fixtures.write('<div><div><div><div>92</div></div><div><div>45</div></div></div></div>'
+                   '<table id="active-campaigns"><tr><td>Airline reputation</td><td>Eco friendly</td></tr></table>',
+                   'game', 'marketing.php.html')
+    lounges = ''.join(f'<tr id="lList{index}"><td>Hub {index} lounge</td><td><b>{rng.randint(0, 40)}%</b></td></tr>'
+                      for index in range(10))
+    fixtures.write(f'<table class="table">{lounges}</table>', 'game', 'hubs_lounge_manage.php.html')
+    for kind in ['pax', 'cargo']:
+        fixtures.write('<div></div><div></div><div><div></div><div><table><tr><td>Hangar</td></tr>'
+                       '<tr><td>x</td><td>y</td><td><span>4</span></td></tr></table></div></div>', 'game',
+                       f'{fixture_name("hangars.php", {"type": kind})}.html')
+    return fixtures
+
+
+def record(directory, hubs=5, pages=4):
+    # records the pages the benchmarks replay from the live game and am4help. needs USERNAME and PASSWORD
+    import am4help
+    from game_client import GameClient
+
+    fixtures = Fixtures(directory)
+    client = GameClient()
+    client.login(os.environ['USERNAME'], os.environ['PASSWORD'])
+    plane_catalog = get_plane_catalog()
+    plane_ids = [plane_catalog.get(shortname).id for shortname in
+                 [os.environ.get('PAX_PLANE_SHORT_NAME_TO_BUY', 'a388'), 'a339',
+                  os.environ.get('CARGO_PLANE_SHORT_NAME_TO_BUY', 'a388f')]]
+    paths = [('fleet.php', {'type': plane_id}) for plane_id in plane_ids] + [
+        ('maint_plan.php', {}), ('fuel.php', {}), ('co2.php', {}), ('marketing.php', {}),
+        ('banking_account.php', {'id': 0}), ('hubs_lounge_manage.php', {}), ('hangars.php', {'type': 'pax'}),
+        ('hangars.php', {'type': 'cargo'})]
+    for script, args in paths:
+        query = '&'.join(f'{key}={value}' for key, value in args.items())
+        fixtures.write(client.get(f'{script}?{query}' if query else script).text, 'game',
+                       f'{fixture_name(script, args)}.html')
+    import page_parser
+    pairs = set()
+    start = 0
+    while True:
+        html = client.get(f'routes.php?start={start}').text
+        routes = page_parser.parse_routes(html)
+        if len(routes) == 0:
+            break
+        fixtures.write(html, 'game', f'{fixture_name("routes.php", {"start": start})}.html')
+        pairs.update(('pax',) + tuple(route.route_desc.split(' - ')[:2]) for route in routes)
+        start += len(routes)
+    for plane_id in plane_ids:
+        kind = plane_catalog.get_by_id(plane_id).kind
+        html = fixtures.game_page('fleet.php', {'type': plane_id})
+        parse = page_parser.parse_pax_fleet if kind == 'pax' else page_parser.parse_cargo_fleet
+        pairs.update((kind, plane.departure, plane.arrival) for plane in parse(html))
+    route_search = am4help.RouteSearch(requests_per_second=2)
+    with open('hubs.json', 'r') as hubs_json:
+        hub_codes = [hub['iata'] for hub in json.load(hubs_json)][:hubs]
+    for hub in hub_codes:
+        for sort in SEARCH_SORTS:
+            for page in range(1, pages + 1):
+                response = route_search.get(f'{am4help.AM4HELP_URL}/route/search?departure={hub}&sort={sort}'
+                                            f'&order=desc&page={page}&mode=hub')
+                if response.status_code != 200:
+                    break
+                fixtures.write(response.text, 'am4help', f'search_{hub}_{sort}_{page}.json')
+                pairs.update((SEARCH_KINDS[sort], hub, route['arrival']['iata'])
+                             for route in response.json()['routes'])
+    for type, departure, arrival in sorted(pairs):
+        response = route_search.get(f'{am4help.AM4HELP_URL}/route/ticket?type={type}&mode=normal'
+                                    f'&departure={departure}&arrival={arrival}')
+        if response.status_code == 200:
+            fixtures.write(response.text, 'am4help', f'ticket_{type}_{departure}_{arrival}.json')
+    LOGGER.info(f'recorded fixtures in {directory}')
+
+
+def configure(server, work_directory):
+    # points airline_manager4 at the stand-in server, with its local state in the work directory
+    os.environ.update({
+        'GAME_BASE_URL': f'{server.url}/game', 'AM4HELP_URL': f'{server.url}/am4help', 'HTTP_ACTIONS': 'true',
+        'AM4HELP_REQUESTS_PER_SECOND': '0', 'AM4HELP_CACHE_BYPASS': 'true',
+        'AM4HELP_CACHE_FILE': os.path.join(work_directory, 'am4help_cache.sqlite3'),
+        'JOB_QUEUE_FILE': os.path.join(work_directory, 'jobs.sqlite3'),
+        'TICKET_PRICE_STATE_FILE': os.path.join(work_directory, 'ticket_prices.json'),
+        'ROUTE_STORE_FILE': os.path.join(work_directory, 'no_routes.sqlite3'),
+        'FUEL_LOG_WAL_FILE': os.path.join(work_directory, 'fuel_log.wal'),
+        # catalogs load while importing, so no benchmark pays for them
+        'REACH_MATRIX_FILE': os.path.join(work_directory, 'reach.bin'), 'STARTUP_MODE': 'eager'})
+    import airline_manager4
+    from fuel_log import FuelLog
+    airline_manager4.fuel_log = FuelLog(lambda: LocalBucket(os.path.join(work_directory, 'bucket')),
+                                        wal_file=os.environ['FUEL_LOG_WAL_FILE'])
+    return airline_manager4
+
+
+class LocalBlob:
+    # the part of the storage blob api the fuel log uses, backed by a directory
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.file_name = os.path.join(bucket.directory, name)
+
+    def exists(self):
+        return os.path.exists(self.file_name)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        from google.api_core.exceptions import PreconditionFailed
+        if if_generation_match == 0 and self.exists():
+            raise PreconditionFailed(f'{self.name} exists')
+        os.makedirs(os.path.dirname(self.file_name), exist_ok=True)
+        with open(self.file_name, 'wb') as blob_file:
+            blob_file.write(data)
+
+    def download_as_bytes(self):
+        with open(self.file_name, 'rb') as blob_file:
+            return blob_file.read()
+
+    def compose(self, sources):
+        self.upload_from_string(b''.join(source.download_as_bytes() for source in sources))
+
+
+class LocalBucket:
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix=''):
+        blobs = []
+        for root, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                name = os.path.relpath(os.path.join(root, file_name), self.directory)
+                if name.startswith(prefix):
+                    blobs.append(LocalBlob(self, name))
+        return blobs
+
+
+def bench_fleet_parsing(am4, fixtures):
+    import page_parser
+    for kind, parse in [('pax', page_parser.parse_pax_fleet), ('cargo', page_parser.parse_cargo_fleet)]:
+        for plane in get_plane_catalog().of_kind(kind):
+            html = fixtures.game_page('fleet.php', {'type': plane.id})
+            if html is None:
+                continue
+            for _ in range(5):
+                planes = parse(html)
+            # the ids go into action urls, so a parser that drifted from the page format fails the benchmark
+            bad_ids = [aircraft.id for aircraft in planes if not aircraft.id.isdigit()]
+            assert len(bad_ids) == 0, f'fleet.php?type={plane.id} parsed to non-numeric ids {bad_ids[:3]}'
+    html = fixtures.game_page('maint_plan.php', {})
+    for _ in range(5):
+        page_parser.parse_maintenance(html)
+
+
+def bench_route_search(am4, fixtures):
+    from game_client import GameClient
+    with open('hubs.json', 'r') as hubs_json:
+        hubs = [hub['iata'] for hub in json.load(hubs_json)]
+    pax_plane = get_plane_catalog().get(am4.pax_plane_to_buy)
+    cargo_plane = get_plane_catalog().get(am4.cargo_plane_to_buy)
+    with am4.http_session(GameClient()):
+        am4.find_pax_routes_for_hubs(pax_plane, hubs, am4.get_pax_plane_details(pax_plane.id), 50)
+        am4.find_cargo_routes_for_hubs(cargo_plane, hubs, 50)
+
+
+def bench_ticket_updates(am4, fixtures):
+    from game_client import GameClient
+    # every run starts without the remembered prices, so all routes are set
+    if os.path.exists(am4.ticket_price_state_file):
+        os.remove(am4.ticket_price_state_file)
+    with am4.http_session(GameClient()):
+        am4.update_ticket_prices()
+
+
+def bench_routine(am4, fixtures):
+    from game_client import GameClient
+    with am4.http_session(GameClient()):
+        am4.perform_routine_ops()
+
+
+BENCHMARKS = {'fleet_parsing': bench_fleet_parsing, 'route_search': bench_route_search,
+              'ticket_updates': bench_ticket_updates, 'routine': bench_routine}
+
+
+def run_benchmark(function, am4, fixtures, server, repeat):
+    walls = []
+    peaks = []
+    calls = Counter()
+    for _ in range(repeat):
+        before = server.calls_snapshot()
+        tracemalloc.start()
+        start = time.perf_counter()
+        function(am4, fixtures)
+        walls.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        calls = server.calls_snapshot() - before
+    return {'wall_seconds': round(statistics.median(walls), 4), 'runs': [round(wall, 4) for wall in walls],
+            'network_calls': sum(calls.values()), 'calls': dict(sorted(calls.items())),
+            'peak_memory_mb': round(max(peaks) / 1024 / 1024, 2)}
+
+
+def compare(results, baseline, max_slowdown):
+    # regressions against a previous results file. prefetching makes the number of calls vary a little,
+    # so calls get the same allowance as time
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['wall_seconds'] > previous['wall_seconds'] * max_slowdown:
+            regressions.append(f'{name}: {result["wall_seconds"]}s, was {previous["wall_seconds"]}s')
+        if result['network_calls'] > previous['network_calls'] * max_slowdown:
+            regressions.append(f'{name}: {result["network_calls"]} network calls, was {previous["network_calls"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='offline benchmarks against recorded game and am4help pages')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record', help='record fixtures from the live game and am4help')
+    record_parser.add_argument('--fixtures', default='benchmark_fixtures')
+    record_parser.add_argument('--hubs', type=int, default=5)
+    record_parser.add_argument('--pages', type=int, default=4)
+    synthesize_parser = subparsers.add_parser('synthesize', help='write made up fixtures')
+    synthesize_parser.add_argument('--fixtures', default='benchmark_fixtures')
+    synthesize_parser.add_argument('--seed', type=int, default=0)
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--fixtures', help='recorded fixtures, made up ones are used when not given')
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--output', help='write the results as json')
+    run_parser.add_argument('--baseline', help='results of a previous run, regressions exit with status 1')
+    run_parser.add_argument('--max-slowdown', type=float, default=1.25)
+    run_parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s : %(message)s')
+    if args.command == 'record':
+        record(args.fixtures, args.hubs, args.pages)
+        return 0
+    if args.command == 'synthesize':
+        synthesize(args.fixtures, args.seed)
+        return 0
+
+    work_directory = tempfile.mkdtemp(prefix='am4_benchmark_')
+    try:
+        fixtures = Fixtures(args.fixtures) if args.fixtures else synthesize(os.path.join(work_directory, 'fixtures'))
+        server = StandInServer(fixtures).start()
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        am4 = configure(server, work_directory)
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        results = {}
+        for name in args.only:
+            results[name] = run_benchmark(BENCHMARKS[name], am4, fixtures, server, args.repeat)
+            print(f'{name:<16} {results[name]["wall_seconds"]:8.3f}s  {results[name]["network_calls"]:6d} calls  '
+                  f'{results[name]["peak_memory_mb"]:8.2f} MB peak')
+        server.stop()
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline:
+            regressions = compare(results, json.load(baseline), args.max_slowdown)
+        for regression in regressions:
+            print(f'regression: {regression}')
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger()
+
+
+class PooledDriver:
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.logged_in = False
+        self.last_checked = 0.0
+
+
+class BrowserPool:
+    # keeps logged-in drivers warm between requests instead of starting chrome and logging in every time
+
+    def __init__(self, create_driver, login, is_logged_in, size=1, max_uses=20, max_memory_mb=512,
+                 check_interval=300):
+        self._create_driver = create_driver
+        self._login = login
+        self._is_logged_in = is_logged_in
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.check_interval = check_interval
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        self._slots.acquire()
+        pooled = None
+        try:
+            with self._lock:
+                if self._idle:
+                    pooled = self._idle.pop()
+            if pooled is None:
+                LOGGER.info('starting a new browser for the pool')
+                pooled = PooledDriver(self._create_driver())
+            self._ensure_logged_in(pooled)
+            pooled.uses += 1
+            return pooled
+        except Exception:
+            if pooled is not None:
+                self._discard(pooled)
+            self._slots.release()
+            raise
+
+    def release(self, pooled, healthy=True):
+        try:
+            if not healthy or self._should_recycle(pooled):
+                self._discard(pooled)
+            else:
+                with self._lock:
+                    self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self):
+        pooled = self.acquire()
+        healthy = True
+        try:
+            yield pooled.driver
+        except Exception:
+            # the page state is unknown after a failure, so don't hand this driver out again
+            healthy = False
+            raise
+        finally:
+            self.release(pooled, healthy)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _ensure_logged_in(self, pooled):
+        now = time.monotonic()
+        if pooled.logged_in and now - pooled.last_checked < self.check_interval:
+            return
+        if pooled.logged_in and self._is_logged_in(pooled.driver):
+            LOGGER.debug('pooled browser session is still valid')
+        else:
+            LOGGER.info('logging in pooled browser')
+            self._login(pooled.driver)
+            pooled.logged_in = True
+        pooled.last_checked = time.monotonic()
+
+    def _should_recycle(self, pooled):
+        if pooled.uses >= self.max_uses:
+            LOGGER.info(f'recycling browser after {pooled.uses} uses')
+            return True
+        memory_mb = self._memory_mb(pooled.driver)
+        if memory_mb > self.max_memory_mb:
+            LOGGER.info(f'recycling browser using {memory_mb:.0f} MB of js heap')
+            return True
+        return False
+
+    @staticmethod
+    def _memory_mb(driver):
+        try:
+            used = driver.execute_script(
+                'return window.performance.memory ? window.performance.memory.usedJSHeapSize : 0')
+            return (used or 0) / (1024 * 1024)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def _discard(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            LOGGER.warning(f'error closing pooled browser: {e}')
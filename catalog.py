@@ -0,0 +1,172 @@
+import bisect
+import json
+import threading
+from urllib.parse import urlparse
+
+
+class AirportCatalog:
+    # in-memory index over airports.json, loaded once per process
+
+    def __init__(self, airports):
+        self.airports = airports
+        self.by_iata = {airport['iata']: airport for airport in airports}
+        self.by_icao = {airport['icao']: airport for airport in airports}
+        self.by_id = {airport['id']: airport for airport in airports}
+        # positions of the airports ordered by runway length, so runway checks become a bisect instead of a scan
+        self.runway_order = sorted(range(len(airports)), key=lambda index: airports[index]['runway'])
+        self.by_runway = [airports[index] for index in self.runway_order]
+        self._runways = [airport['runway'] for airport in self.by_runway]
+        self._landable = {}
+
+    @classmethod
+    def load(cls, file_name='airports.json'):
+        with open(file_name, 'r') as airports_file:
+            return cls(json.load(airports_file))
+
+    def __len__(self):
+        return len(self.airports)
+
+    def get(self, iata):
+        return self.by_iata.get(iata)
+
+    def get_by_icao(self, icao):
+        return self.by_icao.get(icao)
+
+    def get_by_id(self, airport_id):
+        return self.by_id.get(airport_id)
+
+    def runway(self, iata):
+        airport = self.by_iata.get(iata)
+        return 0 if airport is None else airport['runway']
+
+    def runway_range(self, min_runway, max_runway=None):
+        # slice of by_runway (and runway_order) with the runways in [min_runway, max_runway]
+        start = bisect.bisect_left(self._runways, min_runway)
+        end = len(self._runways) if max_runway is None else bisect.bisect_right(self._runways, max_runway)
+        return slice(start, end)
+
+    def with_runway(self, min_runway, max_runway=None):
+        # airports whose runway is in [min_runway, max_runway]
+        return self.by_runway[self.runway_range(min_runway, max_runway)]
+
+    def landable(self, min_runway):
+        # iata codes of the airports a plane needing min_runway can use, built once per runway length
+        landable = self._landable.get(min_runway)
+        if landable is None:
+            landable = frozenset(airport['iata'] for airport in self.with_runway(min_runway))
+            self._landable[min_runway] = landable
+        return landable
+
+    def can_land(self, iata, min_runway):
+        return self.runway(iata) >= min_runway
+
+
+_airport_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_airport_catalog(file_name='airports.json'):
+    global _airport_catalog
+    if _airport_catalog is None:
+        with _catalog_lock:
+            if _airport_catalog is None:
+                _airport_catalog = AirportCatalog.load(file_name)
+    return _airport_catalog
+
+
+class Plane:
+    # one plane model of planes.json, engine fields flattened and converted to numbers
+    __slots__ = ('id', 'model', 'kind', 'manufacturer', 'shortname', 'capacity', 'runway', 'a_check', 'range',
+                 'ceiling', 'maintenance', 'price', 'pilots', 'crew', 'engineers', 'tech', 'thumb', 'engine_id',
+                 'engine', 'speed', 'fuel', 'co2')
+
+    def __init__(self, kind, plane):
+        self.id = plane['id']
+        self.model = plane['model']
+        self.kind = kind
+        self.manufacturer = plane['manufactory']
+        self.shortname = plane['shortname']
+        self.capacity = int(plane['capacity'])
+        self.runway = int(plane['runway'])
+        self.a_check = int(plane['a_check'])
+        self.range = int(plane['range'])
+        self.ceiling = int(plane['ceil'])
+        self.maintenance = int(plane['maintenance'])
+        self.price = int(plane['price'])
+        self.pilots = int(plane['pilots'])
+        self.crew = int(plane['crew'])
+        self.engineers = int(plane['engineers'])
+        self.tech = int(plane['tech'])
+        self.thumb = plane['thumb']
+        self.engine_id = plane['engine']['id']
+        self.engine = plane['engine']['engine']
+        self.speed = int(plane['engine']['speed'])
+        self.fuel = float(plane['engine']['fuel'])
+        self.co2 = float(plane['engine']['co2'])
+
+    def __repr__(self):
+        return f'Plane({self.shortname}, {self.model})'
+
+
+class PlaneCatalog:
+    # in-memory index over planes.json, loaded once per process
+    SORT_FIELDS = ('range', 'capacity', 'speed', 'price')
+
+    def __init__(self, planes):
+        self.planes = planes
+        self.by_id = {plane.id: plane for plane in planes}
+        self.by_shortname = {plane.shortname: plane for plane in planes}
+        self.by_kind = {'pax': [], 'cargo': []}
+        self.by_manufacturer = {}
+        # several models (e.g. engine variants) share a thumbnail
+        self.by_thumb = {}
+        for plane in planes:
+            self.by_kind[plane.kind].append(plane)
+            self.by_manufacturer.setdefault(plane.manufacturer, []).append(plane)
+            self.by_thumb.setdefault(plane.thumb, []).append(plane)
+        # ascending views, so picking the longest range or cheapest model is no scan of the json
+        self.sorted_by = {field: sorted(planes, key=lambda plane: getattr(plane, field)) for field in self.SORT_FIELDS}
+
+    @classmethod
+    def load(cls, file_name='planes.json'):
+        with open(file_name, 'r') as planes_file:
+            planes = json.load(planes_file)
+        return cls([Plane(kind, plane) for kind in ['pax', 'cargo'] for plane in planes[kind]])
+
+    def __len__(self):
+        return len(self.planes)
+
+    def get(self, shortname):
+        return self.by_shortname.get(shortname)
+
+    def get_by_id(self, plane_id):
+        return self.by_id.get(plane_id)
+
+    def of_kind(self, kind, shortnames=None):
+        # models of a kind, in planes.json order, optionally only the given shortnames
+        return [plane for plane in self.by_kind[kind] if shortnames is None or plane.shortname in shortnames]
+
+    def with_image(self, image):
+        # models shown with a game image, e.g. the img src of a maintenance list row
+        return self.by_thumb.get(urlparse(image).path, [])
+
+    def made_by(self, manufacturer):
+        return self.by_manufacturer.get(manufacturer, [])
+
+    def ordered(self, field, kind=None, descending=False):
+        planes = self.sorted_by[field]
+        if kind is not None:
+            planes = [plane for plane in planes if plane.kind == kind]
+        return list(reversed(planes)) if descending else list(planes)
+
+
+_plane_catalog = None
+
+
+def get_plane_catalog(file_name='planes.json'):
+    global _plane_catalog
+    if _plane_catalog is None:
+        with _catalog_lock:
+            if _plane_catalog is None:
+                _plane_catalog = PlaneCatalog.load(file_name)
+    return _plane_catalog
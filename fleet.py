@@ -0,0 +1,120 @@
+import logging
+import threading
+
+LOGGER = logging.getLogger()
+
+
+class FleetType:
+    # the planes of one aircraft type, indexed by status and by the airports they fly from and to
+
+    def __init__(self, planes):
+        self.planes = planes
+        self.by_status = {}
+        self.by_airport = {}
+        for plane in planes:
+            self.by_status.setdefault(plane['status'], []).append(plane)
+            self.by_airport.setdefault(plane['departure'], []).append(plane)
+            if plane['arrival'] != plane['departure']:
+                self.by_airport.setdefault(plane['arrival'], []).append(plane)
+
+
+class RouteInventory:
+    # the airports connected to each airport, both ways and over every aircraft type. our own purchases and
+    # new routes are added as they succeed, so duplicate route checks stay right for the whole run
+
+    def __init__(self, pairs=()):
+        self._connected = {}
+        self._lock = threading.Lock()
+        for departure, arrival in pairs:
+            self.add(departure, arrival)
+
+    def add(self, departure, arrival):
+        if departure == '' or arrival == '':
+            return
+        with self._lock:
+            self._connected.setdefault(departure, set()).add(arrival)
+            self._connected.setdefault(arrival, set()).add(departure)
+
+    def add_planes(self, planes):
+        for plane in planes:
+            self.add(plane['departure'], plane['arrival'])
+
+    def flies(self, departure, arrival):
+        return arrival in self._connected.get(departure, ())
+
+    def get(self, airport, default=()):
+        # the connected airports, so the inventory can be used as a {hub: destinations} mapping
+        return self._connected.get(airport, default)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(airports) for airports in self._connected.values()) // 2
+
+
+class FleetSnapshot:
+    # fleet pages fetched at most once per run. our own buy/modify/route actions invalidate
+    # the affected aircraft type, so the next read fetches it again. the route inventory is built once
+    # and then only added to.
+
+    def __init__(self, fetch_pax, fetch_cargo, fetch_route_pairs=None):
+        self._fetchers = {'pax': fetch_pax, 'cargo': fetch_cargo}
+        self._fetch_route_pairs = fetch_route_pairs or (lambda: [])
+        self._types = {}
+        self._aircraft_types = {}
+        self._routes = None
+        self._lock = threading.Lock()
+        self._routes_lock = threading.Lock()
+        self.fetches = 0
+
+    def _get(self, kind, aircraft_type_id):
+        key = (kind, str(aircraft_type_id))
+        with self._lock:
+            fleet_type = self._types.get(key)
+        if fleet_type is None:
+            fleet_type = FleetType(self._fetchers[kind](aircraft_type_id))
+            with self._lock:
+                self.fetches += 1
+                self._types[key] = fleet_type
+                for plane in fleet_type.planes:
+                    self._aircraft_types[str(plane['id'])] = key
+        return fleet_type
+
+    def pax(self, aircraft_type_id):
+        return self._get('pax', aircraft_type_id).planes
+
+    def cargo(self, aircraft_type_id):
+        return self._get('cargo', aircraft_type_id).planes
+
+    def with_status(self, kind, aircraft_type_id, status):
+        return self._get(kind, aircraft_type_id).by_status.get(status, [])
+
+    def at_airport(self, kind, aircraft_type_id, iata):
+        return self._get(kind, aircraft_type_id).by_airport.get(iata, [])
+
+    def routes(self):
+        with self._routes_lock:
+            if self._routes is None:
+                self._routes = RouteInventory(self._fetch_route_pairs())
+                LOGGER.info(f'route inventory has {len(self._routes)} routes')
+            return self._routes
+
+    def route_added(self, departure, arrival):
+        # a route that isn't loaded yet is in the route list when it is
+        with self._routes_lock:
+            routes = self._routes
+        if routes is not None:
+            routes.add(departure, arrival)
+
+    def invalidate_type(self, aircraft_type_id):
+        with self._lock:
+            for kind in self._fetchers:
+                self._types.pop((kind, str(aircraft_type_id)), None)
+
+    def invalidate_aircraft(self, aircraft_id):
+        with self._lock:
+            key = self._aircraft_types.get(str(aircraft_id))
+            if key is None:
+                # unknown aircraft, so any loaded type might be stale
+                self._types.clear()
+            else:
+                self._types.pop(key, None)
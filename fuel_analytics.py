@@ -0,0 +1,102 @@
+import warnings
+
+import numpy as np
+
+WINDOW_SECONDS = 30 * 60
+SLOTS_PER_DAY = 24 * 60 * 60 // WINDOW_SECONDS
+
+
+def time_slot(when):
+    # index of the half-hour window in the day, 0-47
+    return when.hour * 2 + when.minute // 30
+
+
+def slot_percentiles(grid, percentile):
+    # per time-of-day percentile across the days of a (days, 48) grid, shape (48,)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanpercentile(grid, percentile, axis=0)
+
+
+class PriceSeries:
+    # fuel and co2 prices on a (days, 48) grid of half-hour windows, missing windows are nan
+
+    def __init__(self, records):
+        timestamps = np.array([int(window.timestamp()) for window, _, _ in records], dtype=np.int64)
+        windows = timestamps // WINDOW_SECONDS
+        self.first_window = int(windows.min()) if len(windows) > 0 else 0
+        # align the grid on utc midnight, so columns are times of day
+        self.first_window -= self.first_window % SLOTS_PER_DAY
+        offsets = windows - self.first_window
+        days = int(offsets.max()) // SLOTS_PER_DAY + 1 if len(offsets) > 0 else 0
+        self.prices = {}
+        for column, kind in [(1, 'fuel'), (2, 'co2')]:
+            grid = np.full(days * SLOTS_PER_DAY, np.nan)
+            grid[offsets] = np.array([record[column] for record in records], dtype=np.float64)
+            self.prices[kind] = grid.reshape(days, SLOTS_PER_DAY)
+        self.count = len(records)
+
+    def grid(self, kind):
+        return self.prices[kind]
+
+    def days_logged(self, kind):
+        # days with at least one logged window, gaps in the log don't count
+        return int((~np.isnan(self.prices[kind])).any(axis=1).sum())
+
+    def rolling(self, kind, windows, statistic=np.nanmean):
+        # rolling statistic over the last `windows` half hours, for every window of the series
+        flat = self.prices[kind].reshape(-1)
+        if len(flat) == 0:
+            return flat.copy()
+        padded = np.concatenate([np.full(windows - 1, np.nan), flat])
+        views = np.lib.stride_tricks.sliding_window_view(padded, windows)
+        with warnings.catch_warnings():
+            # all-nan windows are expected where nothing was logged
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return statistic(views, axis=1)
+
+    def ahead(self, kind, windows, statistic=np.nanmin):
+        # statistic over the `windows` half hours following each window, on the (days, 48) grid
+        flat = self.rolling(kind, windows, statistic)
+        shifted = np.concatenate([flat[windows:], np.full(min(windows, len(flat)), np.nan)])
+        return shifted.reshape(self.prices[kind].shape)
+
+    def slot_percentiles(self, kind, percentile):
+        return slot_percentiles(self.prices[kind], percentile)
+
+
+class PriceAdvisor:
+    # buy thresholds learned from the logged price series
+
+    def __init__(self, series, percentile=20, horizon=6, smoothing=2):
+        self.series = series
+        self.horizon = horizon
+        self.thresholds = {kind: series.slot_percentiles(kind, percentile) for kind in ('fuel', 'co2')}
+        # median of the rolling mean over `smoothing` windows, so one odd window doesn't skew a time of day
+        self.typical = {kind: slot_percentiles(series.rolling(kind, smoothing).reshape(series.grid(kind).shape), 50)
+                        for kind in ('fuel', 'co2')}
+        # median over the days of the lowest price in the `horizon` windows after each time of day
+        self.minimums = {kind: slot_percentiles(series.ahead(kind, horizon), 50) for kind in ('fuel', 'co2')}
+
+    def buy_threshold(self, kind, when):
+        # price at or below which buying now is a good deal for this time of day
+        return self.thresholds[kind][time_slot(when)]
+
+    def typical_price(self, kind, when):
+        return self.typical[kind][time_slot(when)]
+
+    def expected_minimum(self, kind, when):
+        # lowest price expected over the next `horizon` windows
+        return self.minimums[kind][time_slot(when)]
+
+    def should_buy(self, kind, price, when, max_price=None):
+        # buy when the price is in the cheap tail for this time of day, or no cheaper price is expected soon.
+        # max_price caps both, the forecast never buys above it
+        if max_price is not None and price >= max_price:
+            return False
+        threshold = self.buy_threshold(kind, when)
+        expected = self.expected_minimum(kind, when)
+        if np.isnan(threshold) and np.isnan(expected):
+            return None
+        return bool((not np.isnan(threshold) and price <= threshold)
+                    or (not np.isnan(expected) and price <= expected))
@@ -0,0 +1,148 @@
+import logging
+import os
+import struct
+import threading
+from datetime import datetime, timedelta, timezone
+
+LOGGER = logging.getLogger()
+
+# window start (unix seconds), fuel price, co2 price
+RECORD = struct.Struct('<Iii')
+# gcs compose accepts at most 32 source objects per call
+MAX_COMPOSE_SOURCES = 32
+
+
+def pack(window, fuel_price, co2_price):
+    return RECORD.pack(int(window.timestamp()), fuel_price, co2_price)
+
+
+def unpack(data):
+    return [(datetime.fromtimestamp(timestamp, timezone.utc), fuel_price, co2_price)
+            for timestamp, fuel_price, co2_price in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size])]
+
+
+class FuelLog:
+    # append-only fuel/co2 price series in the bucket. every half-hour window is its own tiny object
+    # (written once, never overwritten), and finished days are composed into one object per day.
+    # records are written to a local write-ahead file first and uploaded in batches by flush().
+    # windows logged after their day was composed are appended to the day object.
+
+    def __init__(self, get_bucket, prefix='fuel_log/series', wal_file='fuel_log.wal'):
+        self._get_bucket = get_bucket
+        self.prefix = prefix
+        self.wal_file = wal_file
+        self._lock = threading.Lock()
+        # the last day composed by this process, so flushes compose yesterday once
+        self._compacted_day = None
+
+    def window_name(self, window):
+        return f'{self.prefix}/{window.strftime("%Y-%m-%d")}/{window.strftime("%H%M")}.bin'
+
+    def day_name(self, day):
+        return f'{self.prefix}/{day.strftime("%Y-%m-%d")}.bin'
+
+    def append(self, window, fuel_price, co2_price):
+        with self._lock:
+            with open(self.wal_file, 'ab') as wal:
+                wal.write(pack(window, fuel_price, co2_price))
+                wal.flush()
+                os.fsync(wal.fileno())
+
+    def pending(self):
+        if not os.path.exists(self.wal_file):
+            return []
+        with open(self.wal_file, 'rb') as wal:
+            return unpack(wal.read())
+
+    def flush(self):
+        # uploads buffered records, keeping the ones that failed for the next flush
+        with self._lock:
+            records = self.pending()
+            if len(records) == 0:
+                return 0
+            from google.api_core.exceptions import PreconditionFailed
+            bucket = self._get_bucket()
+            failed = []
+            uploaded = 0
+            today = datetime.now(timezone.utc).date()
+            # windows of finished days uploaded by this flush
+            late_windows = {}
+            for window, fuel_price, co2_price in records:
+                try:
+                    # if_generation_match=0 only creates the object, so concurrent runs can't overwrite each other
+                    bucket.blob(self.window_name(window)).upload_from_string(
+                        pack(window, fuel_price, co2_price), content_type='application/octet-stream',
+                        if_generation_match=0)
+                    uploaded += 1
+                    if window.date() < today:
+                        late_windows.setdefault(window.date(), []).append(self.window_name(window))
+                except PreconditionFailed:
+                    LOGGER.debug(f'prices for {window} are already logged')
+                except Exception:
+                    LOGGER.exception(f'error uploading prices for {window}')
+                    failed.append((window, fuel_price, co2_price))
+            with open(self.wal_file, 'wb') as wal:
+                wal.write(b''.join(pack(*record) for record in failed))
+        LOGGER.info(f'uploaded {uploaded} fuel log records, {len(failed)} left in {self.wal_file}')
+        yesterday = today - timedelta(days=1)
+        for day in sorted(late_windows):
+            self.compact(day, late_windows[day])
+        if self._compacted_day != yesterday:
+            if yesterday not in late_windows:
+                self.compact(yesterday)
+            self._compacted_day = yesterday
+        return uploaded
+
+    def compact(self, day, late_windows=()):
+        # composes the window objects of a finished day into a single object, done server side.
+        # when the day is already composed, the named late windows are appended to it
+        bucket = self._get_bucket()
+        day_blob = bucket.blob(self.day_name(day))
+        if day_blob.exists():
+            late_windows = list(late_windows)
+            for start in range(0, len(late_windows), MAX_COMPOSE_SOURCES - 1):
+                day_blob.compose([day_blob] + [bucket.blob(name)
+                                               for name in late_windows[start:start + MAX_COMPOSE_SOURCES - 1]])
+            if late_windows:
+                LOGGER.info(f'appended {len(late_windows)} late fuel log windows to {day_blob.name}')
+            return
+        windows = sorted(bucket.list_blobs(prefix=f'{self.prefix}/{day.strftime("%Y-%m-%d")}/'),
+                         key=lambda blob: blob.name)
+        if len(windows) == 0:
+            return
+        sources = windows[:MAX_COMPOSE_SOURCES]
+        day_blob.compose(sources)
+        for start in range(MAX_COMPOSE_SOURCES, len(windows), MAX_COMPOSE_SOURCES - 1):
+            day_blob.compose([day_blob] + windows[start:start + MAX_COMPOSE_SOURCES - 1])
+        LOGGER.info(f'compacted {len(windows)} fuel log windows into {day_blob.name}')
+
+    def read(self, start, end):
+        # price series [(window, fuel_price, co2_price)] for start <= window < end, one small download per day
+        bucket = self._get_bucket()
+        records = []
+        day = start.date()
+        while day <= end.date():
+            day_blob = bucket.blob(self.day_name(day))
+            if day_blob.exists():
+                records.extend(unpack(day_blob.download_as_bytes()))
+            else:
+                for blob in bucket.list_blobs(prefix=f'{self.prefix}/{day.strftime("%Y-%m-%d")}/'):
+                    records.extend(unpack(blob.download_as_bytes()))
+            day += timedelta(days=1)
+        # a late window composed by two runs at once shows up twice
+        records = {record[0]: record for record in records}
+        return sorted(record for window, record in records.items() if start <= window < end)
+
+    def import_monthly(self, fuel_stats):
+        # converts a legacy fuel_log/<year>/<Mon>_fuel_stats.json document into one object per day
+        bucket = self._get_bucket()
+        for date_string, windows in fuel_stats.items():
+            records = []
+            for time_string, prices in windows.items():
+                window = datetime.strptime(f'{date_string} {time_string[:8]}', '%Y-%m-%d %H:%M:%S').replace(
+                    tzinfo=timezone.utc)
+                records.append((window, prices['fuel_price'], prices['co2_price']))
+            day_blob = bucket.blob(self.day_name(datetime.strptime(date_string, '%Y-%m-%d')))
+            if not day_blob.exists():
+                day_blob.upload_from_string(b''.join(pack(*record) for record in sorted(records)),
+                                            content_type='application/octet-stream')
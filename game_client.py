@@ -0,0 +1,52 @@
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LOGGER = logging.getLogger()
+
+BASE_URL = os.environ.get('GAME_BASE_URL', 'https://www.airlinemanager.com')
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/104.0.0.0 Safari/537.36'
+
+
+class GameClient:
+    # plain http client for game endpoints that don't need a rendered page.
+    # shares the browser's session cookies, and keeps connections alive between calls.
+
+    def __init__(self, pool_size=10, timeout=30):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+    def load_cookies(self, driver):
+        self.session.cookies.clear()
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
+    def fork(self):
+        # a client with its own connections and a copy of the cookies, for another thread
+        client = GameClient(self.pool_size, self.timeout)
+        client.session.cookies.update(self.session.cookies)
+        return client
+
+    def login(self, u_name, p_word):
+        response = self.session.post(f'{BASE_URL}/weblogin/login.php',
+                                     data={'lEmail': u_name, 'lPass': p_word, 'fbSig': 'false', 'remember': 'true'},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        if 'bankDetailAction' not in self.get('banking_account.php?id=0').text:
+            raise Exception('login failed. Automation will exit.')
+        LOGGER.info('login successful')
+
+    def get(self, path):
+        response = self.session.get(f'{BASE_URL}/{path}', timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,136 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+LOGGER = logging.getLogger()
+
+# the job the current worker thread is running
+job_local = threading.local()
+
+
+class JobQueue:
+    # long running endpoints are queued here and run by a few worker threads, so requests return at once.
+    # the queue is kept in sqlite, so queued jobs survive a restart. a job that is already queued or
+    # running with the same type and arguments is not queued again, its id is returned instead.
+    # no worker runs until start() or the first submit(), so importing the app doesn't run jobs.
+
+    def __init__(self, handlers, file_name='jobs.sqlite3', workers=1, retention=7 * 24 * 60 * 60):
+        self.handlers = handlers
+        self.workers = workers
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._threads = []
+        self._db = sqlite3.connect(file_name, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, type TEXT, key TEXT, args TEXT, status TEXT,
+                created REAL, started REAL, finished REAL, progress TEXT, result TEXT, error TEXT);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+            CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status);
+        ''')
+
+    def start(self):
+        with self._lock:
+            if len(self._threads) == 0:
+                # jobs that were running when the last process stopped may have spent money already, so they
+                # are not run again
+                interrupted = self._db.execute(
+                    "UPDATE jobs SET status='interrupted', finished=?, error='interrupted by a restart' "
+                    "WHERE status='running'", (time.time(),)).rowcount
+                self._db.commit()
+                if interrupted > 0:
+                    LOGGER.warning(f'{interrupted} jobs were interrupted by a restart and will not be run again')
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def submit(self, type, **args):
+        if type not in self.handlers:
+            raise ValueError(f'unknown job type {type}')
+        self.start()
+        key = f'{type}:{json.dumps(args, sort_keys=True)}'
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT id FROM jobs WHERE key=? AND status IN ('queued', 'running')",
+                                   (key,)).fetchone()
+            if row is not None:
+                LOGGER.info(f'{type} job {row["id"]} is already queued or running')
+                return row['id'], False
+            job_id = uuid.uuid4().hex
+            self._db.execute("INSERT INTO jobs (id, type, key, args, status, created, progress) "
+                             "VALUES (?, ?, ?, ?, 'queued', ?, '{}')", (job_id, type, key, json.dumps(args), now))
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'interrupted') AND finished < ?",
+                             (now - self.retention,))
+            self._db.commit()
+            self._queued.notify()
+        LOGGER.info(f'queued {type} job {job_id}')
+        return job_id, True
+
+    def _claim(self):
+        with self._lock:
+            while True:
+                row = self._db.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET status='running', started=? WHERE id=?",
+                                     (time.time(), row['id']))
+                    self._db.commit()
+                    return row
+                self._queued.wait(timeout=60)
+
+    def _work(self):
+        while True:
+            row = self._claim()
+            job_local.job_id = row['id']
+            LOGGER.info(f'running {row["type"]} job {row["id"]}')
+            try:
+                result = self.handlers[row['type']](**json.loads(row['args']))
+                self._finish(row['id'], 'done', result=result)
+            except Exception as e:
+                LOGGER.exception(f'{row["type"]} job {row["id"]} failed')
+                self._finish(row['id'], 'failed', error=repr(e))
+            finally:
+                job_local.job_id = None
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._db.execute('UPDATE jobs SET status=?, finished=?, result=?, error=? WHERE id=?',
+                             (status, time.time(), json.dumps(result, default=str), error, job_id))
+            self._db.commit()
+
+    def progress(self, job_id, **fields):
+        with self._lock:
+            row = self._db.execute('SELECT progress FROM jobs WHERE id=?', (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row['progress'])
+            progress.update(fields)
+            self._db.execute('UPDATE jobs SET progress=? WHERE id=?', (json.dumps(progress, default=str), job_id))
+            self._db.commit()
+
+    def reporter(self):
+        # progress callback for the job running on this thread, usable from other threads
+        job_id = getattr(job_local, 'job_id', None)
+        if job_id is None:
+            return lambda **fields: None
+        return lambda **fields: self.progress(job_id, **fields)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id=?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        started = row['started']
+        finished = row['finished']
+        return {'id': row['id'], 'type': row['type'], 'args': json.loads(row['args']), 'status': row['status'],
+                'created': row['created'], 'started': started, 'finished': finished,
+                'queued_seconds': round((started or now) - row['created'], 3),
+                'run_seconds': None if started is None else round((finished or now) - started, 3),
+                'progress': json.loads(row['progress']),
+                'result': None if row['result'] is None else json.loads(row['result']), 'error': row['error']}
@@ -0,0 +1,89 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+LOGGER = logging.getLogger()
+
+
+class CheckCandidate:
+    __slots__ = ('aircraft', 'plane', 'cost')
+
+    def __init__(self, aircraft, plane, cost):
+        self.aircraft = aircraft
+        # None when the image matches no model of planes.json
+        self.plane = plane
+        self.cost = cost
+
+    @property
+    def at_base(self):
+        return self.aircraft.location != 'Not at base'
+
+    def __repr__(self):
+        model = '?' if self.plane is None else self.plane.shortname
+        return f'CheckCandidate({self.aircraft.id}, {model}, {self.aircraft.hours_to_check}h, ${self.cost:,})'
+
+
+class MaintenancePlanner:
+    # picks the A-checks to schedule from the maintenance list: due planes at base, fewest hours to check
+    # first and the cheaper check first among equally due planes, as long as they fit the budget
+
+    def __init__(self, plane_catalog, max_hours=20, excluded=()):
+        self.plane_catalog = plane_catalog
+        self.max_hours = max_hours
+        # plane shortnames or image path fragments of models that are not maintained, e.g. being retired
+        self.excluded = [pattern for pattern in excluded if pattern != '']
+
+    def candidate(self, aircraft):
+        planes = self.plane_catalog.with_image(aircraft.image)
+        # models sharing an image are costed as the dearest of them
+        plane = max(planes, key=lambda plane: plane.a_check) if len(planes) > 0 else None
+        return CheckCandidate(aircraft, plane, 0 if plane is None else plane.a_check)
+
+    def is_excluded(self, candidate):
+        return any(pattern in candidate.aircraft.image or (candidate.plane is not None and
+                                                           pattern == candidate.plane.shortname)
+                   for pattern in self.excluded)
+
+    def rank(self, aircrafts):
+        # due, not excluded planes; at base first, then by hours to check and check cost
+        candidates = [self.candidate(aircraft) for aircraft in aircrafts if aircraft.hours_to_check < self.max_hours]
+        candidates = [candidate for candidate in candidates if not self.is_excluded(candidate)]
+        return sorted(candidates, key=lambda candidate: (not candidate.at_base, candidate.aircraft.hours_to_check,
+                                                         candidate.cost))
+
+    def plan(self, aircrafts, budget):
+        # returns the candidates to check and the (candidate, reason) pairs left for a later run
+        scheduled = []
+        deferred = []
+        for candidate in self.rank(aircrafts):
+            if not candidate.at_base:
+                deferred.append((candidate, 'not at base'))
+            elif candidate.cost > budget:
+                deferred.append((candidate, 'over budget'))
+            else:
+                budget -= candidate.cost
+                scheduled.append(candidate)
+        return scheduled, deferred
+
+
+def lounges_to_maintain(lounges, threshold):
+    # lounges whose percentage is above the threshold, highest first
+    return sorted((lounge for lounge in lounges if lounge.percentage > threshold),
+                  key=lambda lounge: -lounge.percentage)
+
+
+def run_actions(items, action, concurrency=1, context=None):
+    # calls action(item) for every item on worker threads, at most concurrency at a time, each one inside
+    # context() (e.g. to bind the request's session). returns the items that failed
+    def attempt(item):
+        try:
+            with (context or nullcontext)():
+                action(item)
+            return None
+        except Exception:
+            LOGGER.exception(f'error maintaining {item}')
+            return item
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='maintenance') as executor:
+        results = list(executor.map(attempt, items))
+    return [item for item in results if item is not None]
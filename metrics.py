@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlparse
+
+# latency buckets in seconds
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def url_template(url):
+    # host, path and query parameter names, so every page of a search counts as one url
+    parsed = urlparse(url)
+    keys = sorted({key for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+    return f'{parsed.netloc}{parsed.path}' + (f'?{"&".join(keys)}' if len(keys) > 0 else '')
+
+
+def format_labels(labels):
+    if len(labels) == 0:
+        return ''
+    values = ','.join(f'{name}="{str(value)}"'.replace('\n', ' ') for name, value in labels)
+    return '{' + values + '}'
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    # in-process counters and latency histograms, rendered in the prometheus text format
+
+    def __init__(self, prefix='am4'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    def timed(self, name, **labels):
+        # decorator version of timer
+        def decorator(function):
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_session(self, session, target):
+        # records latency, bytes and status of every response of a requests session. the session is marked,
+        # so instrumenting it again (e.g. each time a client is bound) doesn't count its requests twice
+        with self._lock:
+            if getattr(session, 'instrumented_by', None) is self:
+                return session
+            session.instrumented_by = self
+
+        def record(response, *args, **kwargs):
+            labels = {'target': target, 'url': url_template(response.url)}
+            self.observe('http_request_seconds', response.elapsed.total_seconds(), **labels)
+            self.inc('http_requests_total', status=response.status_code, **labels)
+            self.inc('http_response_bytes_total', len(response.content), **labels)
+            return response
+        session.hooks['response'].append(record)
+        return session
+
+    def snapshot(self):
+        # {(name, labels): (count, total)} of every histogram and counter, for diffing runs
+        with self._lock:
+            values = {key: (histogram.count, histogram.sum) for key, histogram in self._histograms.items()}
+            values.update({key: (value, None) for key, value in self._counters.items()})
+        return values
+
+    def summary(self, since=None):
+        # one line per metric that changed since the snapshot, slowest histograms first
+        before = since or {}
+        timings = []
+        counts = []
+        for (name, labels), (count, total) in self.snapshot().items():
+            previous_count, previous_total = before.get((name, labels), (0, 0))
+            if count == previous_count:
+                continue
+            if total is None:
+                counts.append(f'{name}{format_labels(labels)}: {count - previous_count}')
+            else:
+                seconds = total - (previous_total or 0)
+                timings.append((seconds, f'{name}{format_labels(labels)}: {count - previous_count} calls, '
+                                         f'{seconds:.2f}s'))
+        return [line for _, line in sorted(timings, key=lambda timing: -timing[0])] + sorted(counts)
+
+    def render(self, gauges=None):
+        # prometheus text exposition format. gauges are extra {(name, labels): value} read at scrape time
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        described = set()
+
+        def header(name, type):
+            if name not in described:
+                described.add(name)
+                lines.append(f'# TYPE {self.prefix}_{name} {type}')
+
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            for bound, count in zip(BUCKETS, histogram.counts):
+                lines.append(f'{self.prefix}_{name}_bucket{format_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{self.prefix}_{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+            lines.append(f'{self.prefix}_{name}_sum{format_labels(labels)} {histogram.sum}')
+            lines.append(f'{self.prefix}_{name}_count{format_labels(labels)} {histogram.count}')
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{self.prefix}_{name}{format_labels(labels)} {value}')
+        for (name, labels), value in sorted((gauges or {}).items()):
+            header(name, 'gauge')
+            lines.append(f'{self.prefix}_{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
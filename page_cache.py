@@ -0,0 +1,41 @@
+import logging
+import threading
+
+LOGGER = logging.getLogger()
+
+FUEL_PAGE = 'fuel.php'
+CO2_PAGE = 'co2.php'
+BANK_PAGE = 'banking_account.php?id=0'
+MARKETING_PAGE = 'marketing.php'
+
+
+class PageCache:
+    # game pages fetched at most once per run. our own purchases invalidate the pages
+    # they change, so the next read fetches them again.
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.hits = 0
+
+    def get(self, path):
+        with self._lock:
+            html = self._pages.get(path)
+            if html is not None:
+                self.hits += 1
+                return html
+        html = self._fetch(path)
+        with self._lock:
+            self.fetches += 1
+            self._pages[path] = html
+        return html
+
+    def invalidate(self, *paths):
+        with self._lock:
+            for path in paths:
+                self._pages.pop(path, None)
+
+    def stats(self):
+        return {'fetches': self.fetches, 'hits': self.hits}
@@ -0,0 +1,379 @@
+import re
+from html.parser import HTMLParser
+
+# elements that never have a closing tag
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+             'track', 'wbr'}
+# elements whose text starts on a new line when rendered
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset', 'footer',
+              'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+              'section', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul'}
+IGNORED_TAGS = {'script', 'style', 'template'}
+
+
+class Node:
+    __slots__ = ('tag', 'attrs', 'children', 'parent')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+    @property
+    def id(self):
+        return self.attrs.get('id') or ''
+
+    @property
+    def classes(self):
+        return (self.attrs.get('class') or '').split()
+
+    def elements(self, tag=None):
+        return [child for child in self.children if isinstance(child, Node) and (tag is None or child.tag == tag)]
+
+    def iter(self):
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.iter()
+
+    def find_all(self, tag=None, id=None, class_name=None, id_prefix=None):
+        return [node for node in self.iter()
+                if (tag is None or node.tag == tag) and (id is None or node.id == id)
+                and (class_name is None or class_name in node.classes)
+                and (id_prefix is None or node.id.startswith(id_prefix))]
+
+    def find(self, tag=None, id=None, class_name=None, id_prefix=None):
+        for node in self.find_all(tag, id, class_name, id_prefix):
+            return node
+        return None
+
+    def select(self, path):
+        # a small subset of xpath: 'div[2]/div/span', relative to this node, 1-based indexes like selenium
+        nodes = [self]
+        for step in path.strip('/').split('/'):
+            match = re.fullmatch(r'(\w+|\*)(?:\[(\d+)\])?', step)
+            tag, index = match.group(1), match.group(2)
+            selected = []
+            for node in nodes:
+                children = node.elements(None if tag == '*' else tag)
+                if index is None:
+                    selected.extend(children)
+                elif int(index) <= len(children):
+                    selected.append(children[int(index) - 1])
+            nodes = selected
+        return nodes
+
+    def select_one(self, path):
+        nodes = self.select(path)
+        return nodes[0] if len(nodes) > 0 else None
+
+    def text(self):
+        return '\n'.join(self.lines())
+
+    def lines(self):
+        # approximates selenium's element.text: one line per block element, whitespace collapsed
+        parts = []
+        self._collect_text(parts)
+        return [line for line in (re.sub(r'[ \t\r\f\v\xa0]+', ' ', line).strip()
+                                  for line in ''.join(parts).split('\n')) if line != '']
+
+    def _collect_text(self, parts):
+        for child in self.children:
+            if isinstance(child, Node):
+                block = child.tag in BLOCK_TAGS
+                if block:
+                    parts.append('\n')
+                child._collect_text(parts)
+                if block:
+                    parts.append('\n')
+            else:
+                parts.append(child.replace('\n', ' '))
+
+
+class TreeBuilder(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#document', {}, None)
+        self._current = self.root
+        self._ignored_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._ignored_depth > 0 or tag in IGNORED_TAGS:
+            if tag in IGNORED_TAGS:
+                self._ignored_depth += 1
+            return
+        node = Node(tag, dict(attrs), self._current)
+        self._current.children.append(node)
+        if tag not in VOID_TAGS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        if self._ignored_depth == 0:
+            self._current.children.append(Node(tag, dict(attrs), self._current))
+
+    def handle_endtag(self, tag):
+        if tag in IGNORED_TAGS:
+            self._ignored_depth = max(0, self._ignored_depth - 1)
+            return
+        if self._ignored_depth > 0 or tag in VOID_TAGS:
+            return
+        # close up to the matching open element, stray end tags are ignored
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        if self._ignored_depth == 0:
+            self._current.children.append(data)
+
+
+def parse_html(html):
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def to_int(value):
+    digits = re.sub(r'[^\d-]', '', value or '')
+    return int(digits) if digits not in ('', '-') else 0
+
+
+def label_value(line):
+    # 'Y: 120' -> '120'
+    return line.split(': ', 1)[1] if ': ' in line else line
+
+
+class Record:
+    __slots__ = ()
+
+    # records can be read like the dicts they replaced
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.as_dict()})'
+
+
+class FleetAircraft(Record):
+    __slots__ = ('id', 'name', 'departure', 'arrival', 'status', 'economy', 'business', 'first', 'large', 'heavy')
+
+    def __init__(self, id, name, status, economy=0, business=0, first=0, large=0, heavy=0):
+        self.id = id
+        self.name = name
+        self.departure, _, self.arrival = name.partition('-')
+        self.status = status
+        self.economy = economy
+        self.business = business
+        self.first = first
+        self.large = large
+        self.heavy = heavy
+
+
+class MaintenanceAircraft(Record):
+    __slots__ = ('id', 'image', 'location', 'hours_to_check')
+
+    def __init__(self, id, image, location, hours_to_check):
+        self.id = id
+        self.image = image
+        self.location = location
+        self.hours_to_check = hours_to_check
+
+
+class RouteRow(Record):
+    __slots__ = ('route_id', 'route_desc')
+
+    def __init__(self, route_id, route_desc):
+        self.route_id = route_id
+        self.route_desc = route_desc
+
+
+class MarketStats(Record):
+    __slots__ = ('price', 'capacity', 'holding')
+
+    def __init__(self, price, capacity, holding):
+        self.price = price
+        self.capacity = capacity
+        self.holding = holding
+
+
+class Departure(Record):
+    __slots__ = ('departed', 'remaining', 'out_of_fuel', 'out_of_co2')
+
+    def __init__(self, departed, remaining, out_of_fuel, out_of_co2):
+        # None when the response doesn't say
+        self.departed = departed
+        self.remaining = remaining
+        self.out_of_fuel = out_of_fuel
+        self.out_of_co2 = out_of_co2
+
+
+class Lounge(Record):
+    __slots__ = ('id', 'name', 'percentage')
+
+    def __init__(self, id, name, percentage):
+        self.id = id
+        self.name = name
+        self.percentage = percentage
+
+
+def page_body(root):
+    # pages fetched over http are fragments without the html/body wrapper the browser adds
+    return root.find('body') or root
+
+
+def fleet_rows(root):
+    return page_body(root).select('div[2]/div/div')
+
+
+# the aircraft id is the second argument of the details onclick, quoted or not: 'x(this,12345,1)'
+FLEET_ROW_ID = re.compile(r'^[^,]*,\s*[\'"]?(\d+)')
+
+
+def fleet_row_values(row):
+    onclick = row.select_one('div[1]/span').get('onclick') or ''
+    match = FLEET_ROW_ID.search(onclick)
+    if match is None:
+        # the id goes into action urls, so a layout change must not produce a wrong one
+        raise ValueError(f'no aircraft id in fleet row onclick {onclick!r}')
+    plane_id = match.group(1)
+    plane_name = row.select_one('div[2]/a').text()
+    plane_status = row.select_one('div[4]/span').text()
+    plane_seats = row.select_one('div[3]').lines()
+    return plane_id, plane_name, plane_status, plane_seats
+
+
+def parse_pax_fleet(html):
+    planes = []
+    for row in fleet_rows(parse_html(html)):
+        plane_id, plane_name, plane_status, plane_seats = fleet_row_values(row)
+        planes.append(FleetAircraft(plane_id, plane_name, plane_status,
+                                    economy=to_int(label_value(plane_seats[0])),
+                                    business=to_int(label_value(plane_seats[1])),
+                                    first=to_int(label_value(plane_seats[2]))))
+    return planes
+
+
+def parse_cargo_fleet(html):
+    planes = []
+    for row in fleet_rows(parse_html(html)):
+        plane_id, plane_name, plane_status, plane_seats = fleet_row_values(row)
+        planes.append(FleetAircraft(plane_id, plane_name, plane_status,
+                                    large=to_int(label_value(plane_seats[0])),
+                                    heavy=to_int(label_value(plane_seats[1]))))
+    return planes
+
+
+def parse_maintenance(html):
+    aircrafts = []
+    aircraft_list = parse_html(html).find(id='acListView')
+    if aircraft_list is None:
+        return aircrafts
+    for row in aircraft_list.find_all(class_name='maint-list-sort'):
+        controls = row.select_one('div[3]')
+        image = row.select_one('div[1]/img')
+        lines = row.lines()
+        if controls is None or len(lines) < 7:
+            continue
+        aircrafts.append(MaintenanceAircraft(controls.id.replace('controls', ''),
+                                             '' if image is None else image.get('src', ''),
+                                             lines[4], to_int(lines[6])))
+    return aircrafts
+
+
+def parse_routes(html):
+    routes = []
+    container = parse_html(html).find(id='routesContainer')
+    if container is None:
+        return routes
+    for element in container.find_all(class_name='m-text'):
+        desc = element.select_one('div[1]/div/div[2]/span')
+        routes.append(RouteRow(element.id.replace('routeMainList', ''), '' if desc is None else desc.text()))
+    return routes
+
+
+def parse_lounges(html):
+    lounges = []
+    table = parse_html(html).find(class_name='table')
+    if table is None:
+        return lounges
+    for row in table.find_all('tr', id_prefix='lList'):
+        name = row.select_one('td[1]')
+        percentage = row.select_one('td[2]/b')
+        lounges.append(Lounge(to_int(row.id.replace('lList', '')), '' if name is None else name.text(),
+                              0 if percentage is None else to_int(percentage.text())))
+    return lounges
+
+
+def parse_market(html, price_path):
+    root = parse_html(html)
+    price = page_body(root).select_one(price_path)
+    capacity = root.find(id='remCapacity')
+    holding = root.find(id='holding')
+    return MarketStats(0 if price is None else to_int(price.text()),
+                       0 if capacity is None else to_int(capacity.text()),
+                       0 if holding is None else to_int(holding.text()))
+
+
+def parse_fuel(html):
+    return parse_market(html, 'div/div/div[1]/span[2]/b')
+
+
+def parse_co2(html):
+    return parse_market(html, 'div/div/div[2]/span[2]/b')
+
+
+def parse_eco_friendly(html):
+    eco_state = parse_html(html).find(id='eco-state-1')
+    return eco_state is not None and 'hidden' not in eco_state.classes
+
+
+def parse_balance(html):
+    balance = page_body(parse_html(html)).select_one('div[1]/div')
+    return 0 if balance is None else to_int(balance.text())
+
+
+def parse_reputation(html):
+    # (pax, cargo) reputation
+    marketing = page_body(parse_html(html))
+    pax_rep = marketing.select_one('div/div[1]/div[1]/div')
+    cargo_rep = marketing.select_one('div/div[1]/div[2]/div')
+    return 0 if pax_rep is None else to_int(pax_rep.text()), 0 if cargo_rep is None else to_int(cargo_rep.text())
+
+
+def parse_departure(html):
+    # the route_depart.php response is a fragment of html and script, so it is matched rather than parsed
+    text = html or ''
+    departed = re.search(r'(\d[\d,]*)\s+(?:aircraft|planes?)\s+(?:have\s+been\s+|were\s+)?departed|'
+                         r'departed\s+(\d[\d,]*)', text, re.IGNORECASE)
+    # the depart button counter, set by script (.html('12')) or rendered (<span id="listDepartAmount">12)
+    remaining = re.search(r'listDepartAmount[\'"]?\)?(?:\.(?:html|text)\(\s*[\'"]?|[^>]*>\s*)(\d+)', text)
+    return Departure(None if departed is None else to_int(departed.group(1) or departed.group(2)),
+                     None if remaining is None else int(remaining.group(1)),
+                     re.search(r'(?:not enough|insufficient|out of)\s+fuel', text, re.IGNORECASE) is not None,
+                     re.search(r'(?:not enough|insufficient|out of)\s+(?:co2|quota)', text, re.IGNORECASE) is not None)
+
+
+def parse_active_campaigns(html):
+    campaign_table = parse_html(html).find(id='active-campaigns')
+    if campaign_table is None:
+        return []
+    return [campaign.text().strip() for campaign in campaign_table.find_all('td')]
+
+
+def parse_hangar_capacity(html):
+    # free hangar slots, second row of the hangar table
+    table = page_body(parse_html(html)).select_one('div[3]/div[2]/table')
+    rows = [] if table is None else table.find_all('tr')
+    capacity = None if len(rows) < 2 else rows[1].select_one('td[3]/span')
+    return 0 if capacity is None else to_int(capacity.text())
@@ -0,0 +1,191 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from catalog import get_airport_catalog, get_plane_catalog
+
+LOGGER = logging.getLogger()
+
+MAGIC = b'AM4REACH'
+ALIGNMENT = 64
+EARTH_RADIUS_KM = 6371.0
+SOURCE_FILES = ['hubs.json', 'airports.json', 'planes.json']
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    # great-circle distances in km from (latitude, longitude) columns to every (latitudes, longitudes) point
+    latitude, longitude, latitudes, longitudes = map(np.radians, (latitude, longitude, latitudes, longitudes))
+    a = (np.sin((latitudes - latitude) / 2) ** 2
+         + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def source_digest(file_names=SOURCE_FILES):
+    digest = hashlib.sha256()
+    for file_name in file_names:
+        with open(file_name, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+class ReachMatrix:
+    # hub to airport distances (float32), airport runways (uint16) and, per plane model, a bitset per hub of
+    # the airports the model can fly to from it (within range, long enough runway). saved as one file that is
+    # memory mapped when loaded, so it costs nothing until pages are touched.
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.hubs = header['hubs']
+        self.airports = header['airports']
+        self.models = header['models']
+        self.hub_index = {iata: index for index, iata in enumerate(self.hubs)}
+        self.airport_index = {iata: index for index, iata in enumerate(self.airports)}
+        self.model_index = {shortname: index for index, shortname in enumerate(self.models)}
+        self.distance = arrays['distance']
+        self.runway = arrays['runway']
+        self.bitsets = arrays['bitsets']
+
+    @classmethod
+    def build(cls, hubs, airport_catalog, planes, digest=''):
+        airports = airport_catalog.airports
+        hub_airports = {airport['iata']: airport for airport in airports}
+        hubs = [hub for hub in hubs if hub['iata'] in hub_airports]
+        latitudes = np.array([airport['latitude'] for airport in airports], dtype=np.float64)
+        longitudes = np.array([airport['longitude'] for airport in airports], dtype=np.float64)
+        distance = haversine(np.array([[hub['latitude']] for hub in hubs], dtype=np.float64),
+                             np.array([[hub['longitude']] for hub in hubs], dtype=np.float64),
+                             latitudes, longitudes).astype(np.float32)
+        runway = np.array([airport['runway'] for airport in airports], dtype=np.uint16)
+        models = {}
+        for plane in planes:
+            models.setdefault(plane.shortname, plane)
+        plane_range = np.array([[[plane.range]] for plane in models.values()], dtype=np.float32)
+        # the airports each model can land at, a range of the catalog's runway ordered view
+        runway_order = np.array(airport_catalog.runway_order, dtype=np.int64)
+        landable = np.zeros((len(models), len(airports)), dtype=bool)
+        for index, plane in enumerate(models.values()):
+            landable[index, runway_order[airport_catalog.runway_range(plane.runway)]] = True
+        # (models, hubs, airports) booleans, packed 8 airports a byte
+        feasible = (distance[np.newaxis] <= plane_range) & landable[:, np.newaxis, :]
+        bitsets = np.packbits(feasible, axis=2)
+        header = {'digest': digest, 'hubs': [hub['iata'] for hub in hubs],
+                  'airports': [airport['iata'] for airport in airports], 'models': list(models)}
+        return cls(header, {'distance': distance, 'runway': runway, 'bitsets': bitsets})
+
+    @classmethod
+    def build_from_files(cls):
+        with open('hubs.json', 'r') as hubs_json:
+            hubs = json.load(hubs_json)
+        return cls.build(hubs, get_airport_catalog(), get_plane_catalog().planes, source_digest())
+
+    def save(self, file_name):
+        arrays = {'distance': self.distance, 'runway': self.runway, 'bitsets': self.bitsets}
+        header = dict(self.header, arrays={})
+        # offsets depend on the header length, so lay the arrays out after a generously sized header
+        header_size = len(json.dumps(header)) + 200 * len(arrays) + ALIGNMENT
+        offset = -(-(len(MAGIC) + 4 + header_size) // ALIGNMENT) * ALIGNMENT
+        for name, array in arrays.items():
+            header['arrays'][name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        encoded = json.dumps(header).encode()
+        assert len(MAGIC) + 4 + len(encoded) <= header['arrays']['distance']['offset'], 'reach header overflow'
+        temporary_file = f'{file_name}.tmp'
+        with open(temporary_file, 'wb') as reach_file:
+            reach_file.write(MAGIC + len(encoded).to_bytes(4, 'little') + encoded)
+            for name, array in arrays.items():
+                reach_file.seek(header['arrays'][name]['offset'])
+                reach_file.write(np.ascontiguousarray(array).tobytes())
+        os.replace(temporary_file, file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name, 'rb') as reach_file:
+            if reach_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{file_name} is not a reach matrix')
+            header = json.loads(reach_file.read(int.from_bytes(reach_file.read(4), 'little')))
+        arrays = {name: np.memmap(file_name, dtype=np.dtype(layout['dtype']), mode='r', offset=layout['offset'],
+                                  shape=tuple(layout['shape']))
+                  for name, layout in header['arrays'].items()}
+        return cls(header, arrays)
+
+    def has(self, hub_iata_code, shortname):
+        return hub_iata_code in self.hub_index and shortname in self.model_index
+
+    def distances(self, hub_iata_code):
+        # km to every airport, in self.airports order
+        return self.distance[self.hub_index[hub_iata_code]]
+
+    def bitset(self, hub_iata_code, shortnames, combine=np.bitwise_or):
+        # packed airports reachable by any (or with np.bitwise_and, every) of the models from the hub
+        rows = self.bitsets[[self.model_index[shortname] for shortname in shortnames], self.hub_index[hub_iata_code]]
+        return combine.reduce(rows, axis=0)
+
+    def feasible(self, hub_iata_code, shortnames, combine=np.bitwise_or):
+        return np.unpackbits(self.bitset(hub_iata_code, shortnames, combine), count=len(self.airports)).astype(bool)
+
+    def reachable(self, hub_iata_code, shortnames, combine=np.bitwise_or):
+        feasible = self.feasible(hub_iata_code, shortnames, combine)
+        return [self.airports[index] for index in np.flatnonzero(feasible)]
+
+    def feasible_arrivals(self, hub_iata_code, shortnames, arrival_iata_codes):
+        # per arrival, whether any of the models can fly it from the hub. unknown airports are kept
+        feasible = self.feasible(hub_iata_code, shortnames)
+        indexes = np.array([self.airport_index.get(iata, -1) for iata in arrival_iata_codes], dtype=np.int64)
+        return np.where(indexes >= 0, feasible[indexes], True)
+
+
+_reach_matrix = None
+_reach_lock = threading.Lock()
+
+
+def get_reach_matrix(file_name='reach.bin'):
+    # loads the matrix, rebuilding it when hubs, airports or planes changed since it was saved
+    global _reach_matrix
+    if _reach_matrix is None:
+        with _reach_lock:
+            if _reach_matrix is None:
+                digest = source_digest()
+                matrix = None
+                if os.path.exists(file_name):
+                    try:
+                        matrix = ReachMatrix.load(file_name)
+                    except Exception:
+                        LOGGER.exception(f'error loading {file_name}')
+                if matrix is None or matrix.header['digest'] != digest:
+                    matrix = ReachMatrix.build_from_files()
+                    try:
+                        matrix.save(file_name)
+                        matrix = ReachMatrix.load(file_name)
+                    except OSError:
+                        LOGGER.exception(f'error saving {file_name}, keeping the matrix in memory')
+                    LOGGER.info(f'built reach matrix for {len(matrix.hubs)} hubs, {len(matrix.airports)} airports '
+                                f'and {len(matrix.models)} plane models')
+                _reach_matrix = matrix
+    return _reach_matrix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='hub to airport distances and per plane reachability')
+    parser.add_argument('--file', default='reach.bin')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='(re)build the matrix file')
+    query_parser = subparsers.add_parser('query', help='airports a plane can fly to from a hub')
+    query_parser.add_argument('hub')
+    query_parser.add_argument('planes', nargs='+', help='plane shortnames, reachable by any of them')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        reach_matrix = ReachMatrix.build_from_files()
+        reach_matrix.save(args.file)
+        print(f'{args.file}: {len(reach_matrix.hubs)} hubs, {len(reach_matrix.airports)} airports, '
+              f'{len(reach_matrix.models)} plane models, {os.path.getsize(args.file)} bytes')
+    else:
+        reach_matrix = get_reach_matrix(args.file)
+        distances = reach_matrix.distances(args.hub)
+        for iata in reach_matrix.reachable(args.hub, args.planes):
+            print(f'{iata} {distances[reach_matrix.airport_index[iata]]:.0f} km')
@@ -0,0 +1,247 @@
+import numpy as np
+
+import am4help
+
+# hours a plane flies per day, used by the trips formula
+PAX_HOURS = 23
+CARGO_HOURS = 24
+# fuel and co2 quota are priced per 1000 lbs
+PRICE_UNIT_LBS = 1000
+# co2 rates of pax planes are lbs per passenger and km, of cargo planes lbs per 1000 lbs of cargo and km
+CARGO_CO2_UNIT_LBS = 1000
+
+
+class RouteTable:
+    # am4help routes (one search page, or many pages of many hubs) as columns
+
+    def __init__(self, routes, airport_catalog):
+        self.routes = routes
+        self.departure = np.array([route['departure']['iata'] for route in routes], dtype=object)
+        self.arrival = np.array([route['arrival']['iata'] for route in routes], dtype=object)
+        self.distance = self._column(routes, 'distance')
+        self.economy = self._column(routes, 'economic_demand')
+        self.business = self._column(routes, 'business_demand')
+        self.first = self._column(routes, 'first_class_demand')
+        self.large = self._column(routes, 'large_demand')
+        self.heavy = self._column(routes, 'heavy_demand')
+        self.runway = np.array([airport_catalog.runway(iata) for iata in self.arrival], dtype=np.float64)
+        # realism ticket prices am4help reports for the route, nan where the route doesn't carry them
+        # (am4help search results don't, route store rows and ticket lookups do)
+        tickets = [(route.get('ticket') or {}).get('realism') or {} for route in routes]
+        self.ticket_y = self._prices(tickets, 'ticketY')
+        self.ticket_j = self._prices(tickets, 'ticketJ')
+        self.ticket_f = self._prices(tickets, 'ticketF')
+        self.ticket_l = self._prices(tickets, 'ticketL')
+        self.ticket_h = self._prices(tickets, 'ticketH')
+
+    def __len__(self):
+        return len(self.routes)
+
+    @staticmethod
+    def _column(routes, key):
+        return np.array([route.get(key, 0) or 0 for route in routes], dtype=np.float64)
+
+    @staticmethod
+    def _prices(tickets, key):
+        return np.array([np.nan if ticket.get(key) is None else ticket[key] for ticket in tickets], dtype=np.float64)
+
+    def priced(self, kind):
+        # routes with the realism prices the profit of the kind needs
+        if kind == 'pax':
+            return ~(np.isnan(self.ticket_y) | np.isnan(self.ticket_j) | np.isnan(self.ticket_f))
+        return ~np.isnan(self.ticket_l)
+
+    def names(self):
+        return [f'{departure}-{arrival}' for departure, arrival in zip(self.departure, self.arrival)]
+
+    def existing(self, destinations_by_hub):
+        # routes already flown from the same hub
+        return np.array([arrival in destinations_by_hub.get(departure, ())
+                         for departure, arrival in zip(self.departure, self.arrival)], dtype=bool)
+
+
+def plane_columns(planes):
+    # plane attributes as (models, 1) columns, so they broadcast against (routes,) rows
+    def column(values):
+        return np.array(values, dtype=np.float64).reshape(-1, 1)
+    return (column([plane.capacity for plane in planes]),
+            column([plane.range for plane in planes]),
+            column([plane.runway for plane in planes]),
+            column([plane.speed for plane in planes]),
+            column([plane.fuel for plane in planes]),
+            column([plane.co2 for plane in planes]))
+
+
+def trips_per_day(distance, speed, hours):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trips = np.ceil(hours / (distance / (speed * 1.1)))
+    return np.where(np.isfinite(trips), trips, 0)
+
+
+def seat_configuration(first_demand, business_demand, trips, capacity):
+    # vectorised get_seat_configuration: first and business sized to demand, the rest economy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = np.ceil(np.where(trips > 0, first_demand / trips * 1.1, 0))
+        b = np.ceil(np.where(trips > 0, business_demand / trips * 1.1, 0))
+    capacity = np.broadcast_to(capacity, f.shape)
+    first = np.where(f >= capacity, capacity, f)
+    business = np.where(f >= capacity, 0, np.where(f + b >= capacity, capacity - f, b))
+    economy = np.where(f + b >= capacity, 0, capacity - (b + f))
+    return economy.astype(np.int64), business.astype(np.int64), first.astype(np.int64)
+
+
+def fuel_cost(fuel_rate, distance, fuel_price):
+    # lbs of fuel burned on a trip, at the price per 1000 lbs
+    return fuel_rate * distance * fuel_price / PRICE_UNIT_LBS
+
+
+def co2_cost(co2_rate, distance, load, co2_price):
+    # lbs of co2 quota used on a trip for its load (passengers, or units of 1000 lbs of cargo),
+    # at the price per 1000 lbs
+    return co2_rate * distance * load * co2_price / PRICE_UNIT_LBS
+
+
+class Scores:
+    # skipped, stop, feasible, trips and profit are (models, routes) arrays. profit is -inf where the route
+    # isn't feasible or has no realism ticket prices, so such routes are never ranked or bought
+
+    def outcomes(self, model=0):
+        # per route results for one plane model, in the shape RouteSearch evaluators return
+        names = self.table.names()
+        outcomes = []
+        for index, name in enumerate(names):
+            if self.skipped[model, index]:
+                outcomes.append(None)
+            elif self.stop[model, index]:
+                outcomes.append(am4help.STOP)
+            elif not self.feasible[model, index]:
+                outcomes.append(None)
+            else:
+                outcomes.append((name, self.candidate(model, index, name)))
+        return outcomes
+
+    def any_outcomes(self):
+        # per route results over all plane models: kept (with the am4help route) if any model can fly it,
+        # and stop once every model that doesn't skip the route would stop
+        names = self.table.names()
+        feasible = self.feasible.any(axis=0)
+        stop = (self.stop | self.skipped).all(axis=0) & self.stop.any(axis=0)
+        outcomes = []
+        for index, name in enumerate(names):
+            if stop[index]:
+                outcomes.append(am4help.STOP)
+            elif feasible[index]:
+                outcomes.append((name, self.table.routes[index]))
+            else:
+                outcomes.append(None)
+        return outcomes
+
+    def describe(self, model, index, names):
+        candidate = self.candidate(model, index, names[index])
+        candidate['model'] = int(model)
+        candidate['plane'] = self.planes[model].shortname
+        candidate['departure'] = self.table.departure[index]
+        candidate['arrival'] = self.table.arrival[index]
+        return candidate
+
+    def ranked(self, limit=None):
+        # every feasible, priced (plane model, route) pair, most profitable first
+        models, indexes = np.nonzero(np.isfinite(self.profit))
+        order = np.argsort(-self.profit[models, indexes], kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        names = self.table.names()
+        return [self.describe(models[position], indexes[position], names) for position in order]
+
+
+class PaxScores(Scores):
+
+    def __init__(self, table, planes, destinations_by_hub=None, fuel_price=500, co2_price=120):
+        capacity, plane_range, plane_runway, speed, fuel_rate, co2_rate = plane_columns(planes)
+        existing = np.zeros(len(table), dtype=bool) if destinations_by_hub is None else table.existing(
+            destinations_by_hub)
+        self.table = table
+        self.planes = planes
+        self.trips = trips_per_day(table.distance, speed, PAX_HOURS)
+        # checks in the same order as find_pax_routes: failing any of these skips the route
+        self.skipped = (existing | (table.distance > plane_range) | (self.trips <= 0)
+                        | (table.runway < plane_runway)
+                        | (table.first + table.business + table.economy < self.trips * capacity))
+        # routes are sorted by first class demand, so the first route failing this ends the search for a hub
+        self.stop = ~self.skipped & (table.first <= capacity * 0.14 * self.trips * 0.95)
+        self.feasible = ~self.skipped & ~self.stop & (
+            table.first + table.business > capacity * 0.35 * self.trips * 0.95)
+        self.economy, self.business, self.first = seat_configuration(table.first, table.business, self.trips,
+                                                                     capacity)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trips = np.where(self.trips > 0, self.trips, 1)
+            sold_y = np.minimum(self.economy, table.economy / trips)
+            sold_j = np.minimum(self.business, table.business / trips)
+            sold_f = np.minimum(self.first, table.first / trips)
+        revenue = sold_y * table.ticket_y + sold_j * table.ticket_j + sold_f * table.ticket_f
+        cost = (fuel_cost(fuel_rate, table.distance, fuel_price)
+                + co2_cost(co2_rate, table.distance, sold_y + sold_j + sold_f, co2_price))
+        self.profit = np.where(self.feasible & table.priced('pax'), self.trips * (revenue - cost), -np.inf)
+
+    def candidate(self, model, index, name):
+        return {'name': name, 'economy': int(self.economy[model, index]),
+                'business': int(self.business[model, index]), 'first': int(self.first[model, index]),
+                'distance': self.table.routes[index]['distance'], 'trips': int(self.trips[model, index]),
+                'profit': float(self.profit[model, index])}
+
+
+class CargoScores(Scores):
+
+    def __init__(self, table, planes, destinations_by_hub=None, fuel_price=500, co2_price=120):
+        capacity, plane_range, plane_runway, speed, fuel_rate, co2_rate = plane_columns(planes)
+        existing = np.zeros(len(table), dtype=bool) if destinations_by_hub is None else table.existing(
+            destinations_by_hub)
+        self.table = table
+        self.planes = planes
+        self.trips = trips_per_day(table.distance, speed, CARGO_HOURS)
+        large = table.large * 1.06
+        heavy = table.heavy * 1.06
+        self.skipped = (existing | (table.distance > plane_range) | (self.trips <= 0)
+                        | (table.runway < plane_runway)
+                        | ((large / 0.7) + heavy < self.trips * capacity))
+        # routes are sorted by large demand, so the first route failing this ends the search for a hub
+        self.stop = ~self.skipped & (large < capacity * 0.7 * 0.87 * self.trips)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.feasible = ~self.skipped & ~self.stop & (
+                large / np.where(self.trips > 0, self.trips, 1) > capacity * 0.7)
+        # planes are configured all large (aft and fwd 0), so a trip carries 70% of the capacity in lbs
+        load = capacity * 0.7
+        revenue = load * table.ticket_l
+        cost = (fuel_cost(fuel_rate, table.distance, fuel_price)
+                + co2_cost(co2_rate, table.distance, load / CARGO_CO2_UNIT_LBS, co2_price))
+        self.profit = np.where(self.feasible & table.priced('cargo'), self.trips * (revenue - cost), -np.inf)
+
+    def candidate(self, model, index, name):
+        return {'name': name, 'aft': 0, 'fwd': 0, 'distance': self.table.routes[index]['distance'],
+                'trips': int(self.trips[model, index]), 'profit': float(self.profit[model, index])}
+
+
+def select_purchases(scores, balance, slots, cost_factor=1.0):
+    # planes to buy across all hubs and models: (model, route) pairs by daily profit per dollar of plane price,
+    # one plane per airport pair, while the balance (each plane costing price * cost_factor) and hangar slots last
+    prices = np.array([plane.price for plane in scores.planes], dtype=np.float64)
+    models, indexes = np.nonzero(scores.feasible & (scores.profit > 0))
+    order = np.argsort(-(scores.profit[models, indexes] / prices[models]), kind='stable')
+    names = scores.table.names()
+    remaining = balance
+    pairs = set()
+    purchases = []
+    for position in order:
+        if len(purchases) >= slots or remaining < prices.min() * cost_factor:
+            break
+        model, index = models[position], indexes[position]
+        pair = frozenset((scores.table.departure[index], scores.table.arrival[index]))
+        cost = prices[model] * cost_factor
+        if pair in pairs or cost > remaining:
+            continue
+        pairs.add(pair)
+        remaining -= cost
+        candidate = scores.describe(model, index, names)
+        candidate['profit_per_dollar'] = float(scores.profit[model, index] / prices[model])
+        purchases.append(candidate)
+    return purchases
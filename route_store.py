@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import threading
+
+import am4help
+
+LOGGER = logging.getLogger()
+
+ROUTE_COLUMNS = ['departure', 'arrival', 'distance', 'economic_demand', 'business_demand', 'first_class_demand',
+                 'large_demand', 'heavy_demand', 'ticket_y', 'ticket_j', 'ticket_f', 'ticket_l', 'ticket_h']
+# am4help sort names and the columns they map to
+SORT_COLUMNS = {'firstClass': 'first_class_demand', 'large': 'large_demand'}
+
+
+class RouteStore:
+    # local route-demand table, so route searches don't need to page through am4help.
+    # exposes the same search_hub/search_hubs interface as am4help.RouteSearch.
+
+    def __init__(self, file_name='routes.sqlite3', page_size=500):
+        self.file_name = file_name
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(file_name, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS airports (iata TEXT PRIMARY KEY, id INTEGER, runway INTEGER);
+            CREATE TABLE IF NOT EXISTS routes (departure TEXT, arrival TEXT, distance INTEGER,
+                economic_demand INTEGER, business_demand INTEGER, first_class_demand INTEGER,
+                large_demand INTEGER, heavy_demand INTEGER, ticket_y REAL, ticket_j REAL, ticket_f REAL,
+                ticket_l REAL, ticket_h REAL, PRIMARY KEY (departure, arrival));
+            CREATE INDEX IF NOT EXISTS routes_first_class ON routes (departure, first_class_demand DESC);
+            CREATE INDEX IF NOT EXISTS routes_large ON routes (departure, large_demand DESC);
+        ''')
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT count(*) FROM routes').fetchone()[0]
+
+    def load_airports(self, airports):
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO airports VALUES (?, ?, ?)',
+                                 [(airport['iata'], airport['id'], airport['runway']) for airport in airports])
+            self._db.commit()
+
+    def import_rows(self, rows):
+        # rows are dicts with (a subset of) ROUTE_COLUMNS, missing values are stored as NULL
+        values = [tuple(row.get(column) if row.get(column) != '' else None for column in ROUTE_COLUMNS)
+                  for row in rows]
+        with self._lock:
+            self._db.executemany(f'INSERT OR REPLACE INTO routes VALUES ({", ".join("?" * len(ROUTE_COLUMNS))})',
+                                 values)
+            self._db.commit()
+        return len(values)
+
+    def import_am4help_routes(self, routes):
+        # routes in the shape am4help returns them, optionally with the realism 'ticket' of /route/ticket
+        rows = []
+        for route in routes:
+            ticket = (route.get('ticket') or {}).get('realism', {})
+            rows.append({'departure': route['departure']['iata'], 'arrival': route['arrival']['iata'],
+                         'distance': route['distance'],
+                         'economic_demand': route.get('economic_demand'),
+                         'business_demand': route.get('business_demand'),
+                         'first_class_demand': route.get('first_class_demand'),
+                         'large_demand': route.get('large_demand'), 'heavy_demand': route.get('heavy_demand'),
+                         'ticket_y': ticket.get('ticketY'), 'ticket_j': ticket.get('ticketJ'),
+                         'ticket_f': ticket.get('ticketF'), 'ticket_l': ticket.get('ticketL'),
+                         'ticket_h': ticket.get('ticketH')})
+        return self.import_rows(rows)
+
+    def query(self, departure, sort='firstClass', max_distance=None, min_runway=None, limit=None, offset=0):
+        conditions = ['r.departure = ?']
+        parameters = [departure]
+        if max_distance is not None:
+            conditions.append('r.distance <= ?')
+            parameters.append(max_distance)
+        if min_runway is not None:
+            conditions.append('a.runway >= ?')
+            parameters.append(min_runway)
+        parameters.extend([-1 if limit is None else limit, offset])
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT r.*, a.id AS arrival_id FROM routes r LEFT JOIN airports a ON a.iata = r.arrival '
+                f'WHERE {" AND ".join(conditions)} ORDER BY r.{SORT_COLUMNS.get(sort, sort)} DESC LIMIT ? OFFSET ?',
+                parameters).fetchall()
+        return [self._route(row) for row in rows]
+
+    @staticmethod
+    def _route(row):
+        # same shape as an am4help route
+        return {'departure': {'iata': row['departure']}, 'arrival': {'iata': row['arrival'], 'id': row['arrival_id']},
+                'distance': row['distance'], 'economic_demand': row['economic_demand'] or 0,
+                'business_demand': row['business_demand'] or 0,
+                'first_class_demand': row['first_class_demand'] or 0,
+                'large_demand': row['large_demand'] or 0, 'heavy_demand': row['heavy_demand'] or 0,
+                'ticket': {'realism': {'ticketY': row['ticket_y'], 'ticketJ': row['ticket_j'],
+                                       'ticketF': row['ticket_f'], 'ticketL': row['ticket_l'],
+                                       'ticketH': row['ticket_h']}}}
+
+    def route_details(self, departure, arrival, type='pax'):
+        # (route, ticket) like get_route_details, or None when the pair or its prices aren't stored
+        with self._lock:
+            row = self._db.execute(
+                'SELECT r.*, a.id AS arrival_id FROM routes r LEFT JOIN airports a ON a.iata = r.arrival '
+                'WHERE r.departure = ? AND r.arrival = ?', (departure, arrival)).fetchone()
+        if row is None or row['arrival_id'] is None or row['ticket_y' if type == 'pax' else 'ticket_l'] is None:
+            return None
+        route = self._route(row)
+        return route, route.pop('ticket')
+
+    def search_hub(self, hub_iata_code, sort, evaluate, budget, max_distance=None, min_runway=None):
+        routes = {}
+        offset = 0
+        while not budget.exhausted:
+            potential_routes = self.query(hub_iata_code, sort, max_distance, min_runway, self.page_size, offset)
+            if len(potential_routes) == 0:
+                return routes
+            offset += len(potential_routes)
+            for outcome in evaluate(potential_routes):
+                if outcome is am4help.STOP:
+                    return routes
+                if outcome is None:
+                    continue
+                if not budget.claim():
+                    return routes
+                name, route_data = outcome
+                routes[name] = route_data
+        return routes
+
+    def search_hubs(self, hub_iata_codes, sort, evaluator_for_hub, limit, max_distance=None, min_runway=None):
+        budget = am4help.SearchBudget(limit)
+        routes_by_hub = {}
+        for hub_iata_code in hub_iata_codes:
+            routes = self.search_hub(hub_iata_code, sort, evaluator_for_hub(hub_iata_code), budget, max_distance,
+                                     min_runway)
+            if len(routes) > 0:
+                routes_by_hub[hub_iata_code] = routes
+        return routes_by_hub
+
+
+def read_rows(file_name):
+    if file_name.endswith('.csv'):
+        with open(file_name, 'r', newline='') as csv_file:
+            return 'rows', list(csv.DictReader(csv_file))
+    with open(file_name, 'r') as json_file:
+        if file_name.endswith('.jsonl'):
+            routes = [json.loads(line) for line in json_file if line.strip() != '']
+        else:
+            routes = json.load(json_file)
+    # am4help responses have nested departure/arrival objects, flat rows don't
+    return ('am4help', routes) if len(routes) > 0 and isinstance(routes[0].get('departure'), dict) else ('rows', routes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='build the local route-demand store')
+    parser.add_argument('files', nargs='+', help='csv files with ROUTE_COLUMNS headers, or json/jsonl am4help routes')
+    parser.add_argument('--db', default='routes.sqlite3')
+    parser.add_argument('--airports', default='airports.json')
+    args = parser.parse_args()
+
+    store = RouteStore(args.db)
+    with open(args.airports, 'r') as airports_file:
+        store.load_airports(json.load(airports_file))
+    for file_name in args.files:
+        kind, data = read_rows(file_name)
+        count = store.import_am4help_routes(data) if kind == 'am4help' else store.import_rows(data)
+        print(f'imported {count} routes from {file_name}')
+    print(f'{args.db} has {len(store)} routes')
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+
+LOGGER = logging.getLogger()
+
+
+class Task:
+
+    def __init__(self, name, function, after, spends):
+        self.name = name
+        self.function = function
+        self.after = after
+        self.spends = spends
+        self.status = 'pending'
+        # when the tasks it comes after were done, when a worker picked it up and when it ended
+        self.queued = None
+        self.started = None
+        self.finished = None
+        # (requested, acquired, released, task that released the budget before) per budget section
+        self.budget_sections = []
+        self.error = None
+
+    @property
+    def duration(self):
+        return 0 if self.started is None or self.finished is None else self.finished - self.started
+
+    @property
+    def queue_wait(self):
+        return 0 if self.queued is None or self.started is None else self.started - self.queued
+
+    @property
+    def budget_wait(self):
+        return sum(acquired - requested for requested, acquired, _, _ in self.budget_sections)
+
+
+class TaskGraph:
+    # runs steps as soon as the steps they come after are done, independent steps in parallel.
+    # the parts of steps that read the balance and spend it run one at a time inside spending(),
+    # so each one sees what the previous left.
+
+    def __init__(self, workers=4, context=None, on_change=None):
+        self.workers = workers
+        # entered around every task in its worker thread, e.g. to bind the request's session
+        self.context = context or nullcontext
+        # called with each task whose status changed
+        self.on_change = on_change or (lambda task: None)
+        self.tasks = {}
+        self.budget = threading.Lock()
+        self._released_by = None
+        self._local = threading.local()
+        self.started = None
+        self.finished = None
+
+    def add(self, name, function, after=(), spends=False):
+        # spends marks the steps that have spending() sections, for the report
+        for dependency in after:
+            if dependency not in self.tasks:
+                raise ValueError(f'{name} comes after unknown task {dependency}')
+        self.tasks[name] = Task(name, function, tuple(after), spends)
+        return name
+
+    @contextmanager
+    def spending(self):
+        # held from reading the balance until the purchases made with it are done. sections entered
+        # inside a section (e.g. a fuel top up while departing) are part of the outer one
+        if getattr(self._local, 'depth', 0) > 0:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+        task = getattr(self._local, 'task', None)
+        requested = time.monotonic()
+        if self.budget.acquire(blocking=False):
+            released_by = None
+        else:
+            # waits for another task's section, which is then what this task waited on
+            self.budget.acquire()
+            released_by = self._released_by
+        acquired = time.monotonic()
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            if task is not None:
+                task.budget_sections.append((requested, acquired, time.monotonic(), released_by))
+            self._released_by = task
+            self.budget.release()
+
+    def _execute(self, task):
+        self._local.task = task
+        try:
+            with self.context():
+                task.started = time.monotonic()
+                try:
+                    task.function()
+                finally:
+                    task.finished = time.monotonic()
+        finally:
+            self._local.task = None
+
+    def run(self):
+        # returns the tasks that failed, dependents of a failed task are skipped
+        self.started = time.monotonic()
+        pending = dict(self.tasks)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='routine') as executor:
+            while len(pending) > 0 or len(running) > 0:
+                for task in list(pending.values()):
+                    states = [self.tasks[dependency].status for dependency in task.after]
+                    if any(state in ('failed', 'skipped') for state in states):
+                        task.status = 'skipped'
+                        del pending[task.name]
+                        LOGGER.warning(f'skipping {task.name}, a task it comes after did not complete')
+                        self.on_change(task)
+                    elif all(state == 'done' for state in states):
+                        task.status = 'running'
+                        task.queued = time.monotonic()
+                        del pending[task.name]
+                        running[executor.submit(self._execute, task)] = task
+                        self.on_change(task)
+                if len(running) == 0:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    task.error = future.exception()
+                    task.status = 'done' if task.error is None else 'failed'
+                    if task.error is not None:
+                        LOGGER.error(f'{task.name} failed', exc_info=task.error)
+                    self.on_change(task)
+        self.finished = time.monotonic()
+        return [task for task in self.tasks.values() if task.status == 'failed']
+
+    def _blockers(self, task, until):
+        # (time, task, edge) of what task waited on before until: the tasks it comes after, and the task
+        # that released the budget to each of its sections
+        blockers = [(self.tasks[name].finished, self.tasks[name], 'after') for name in task.after
+                    if self.tasks[name].finished is not None]
+        blockers += [(acquired, released_by, 'budget') for _, acquired, _, released_by in task.budget_sections
+                     if released_by is not None]
+        return [blocker for blocker in blockers if blocker[0] < until]
+
+    def critical_path(self):
+        # the chain that ended last, walked back through whatever each task waited on last: a task it comes
+        # after, or the task holding the budget. returns (task, entered, left, edge into the next task)
+        finished = [task for task in self.tasks.values() if task.finished is not None]
+        if len(finished) == 0:
+            return []
+        task = max(finished, key=lambda task: task.finished)
+        left, edge = task.finished, None
+        path = []
+        while True:
+            blockers = self._blockers(task, left)
+            if len(blockers) == 0:
+                path.append((task, task.queued, left, edge))
+                return list(reversed(path))
+            entered, blocker, blocker_edge = max(blockers, key=lambda blocker: blocker[0])
+            path.append((task, entered, left, edge))
+            task, left, edge = blocker, entered, blocker_edge
+
+    def _path_times(self, path):
+        # seconds of the path spent queued for a worker, waiting for the budget and running
+        queued = budget = 0
+        for task, entered, left, _ in path:
+            if task.queued is not None and task.started is not None:
+                queued += max(0, min(task.started, left) - max(task.queued, entered))
+            for requested, acquired, _, _ in task.budget_sections:
+                budget += max(0, min(acquired, left) - max(requested, entered))
+        total = path[-1][2] - path[0][1] if len(path) > 0 else 0
+        return total, queued, budget, total - queued - budget
+
+    def report(self):
+        lines = [f'routine ops took {self.finished - self.started:.1f}s with {self.workers} workers']
+        for task in sorted(self.tasks.values(), key=lambda task: task.started or float('inf')):
+            if task.started is None:
+                lines.append(f'  {task.name:<20} {task.status}')
+            else:
+                lines.append(f'  {task.name:<20} {task.status:<8} start {task.started - self.started:6.1f}s  '
+                             f'took {task.duration:6.1f}s  queued {task.queue_wait:5.1f}s'
+                             + (f'  budget wait {task.budget_wait:5.1f}s in {len(task.budget_sections)} sections'
+                                if task.spends or task.budget_sections else ''))
+        path = self.critical_path()
+        total, queued, budget, running = self._path_times(path)
+        steps = ''.join(task.name + ('' if edge is None else ' -> ' if edge == 'after' else ' =budget=> ')
+                        for task, _, _, edge in path)
+        lines.append(f'  critical path {total:.1f}s ({running:.1f}s running, {budget:.1f}s waiting for the budget, '
+                     f'{queued:.1f}s queued): {steps}')
+        return '\n'.join(lines)
@@ -136,15 +136,12 @@ def do_marketing():
 def get_all_routes():
     p_routes = []
     am4.login(am4.username, am4.password)
-    planes = []
     hubs = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['pax']
     with open('hubs.json', 'r') as hubs_json:
         hubs = json.load(hubs_json)
-    plane = [plane for plane in planes if plane['shortname'] == 'a388'][0]
+    plane = am4.get_plane_catalog().get('a388')
     balance = am4.get_balance()
-    # if balance > plane['price'] * 1.3:
+    # if balance > plane.price * 1.3:
     for hub in hubs:
         print(f'processing hub {hub["iata"]}')
         routes = am4.find_pax_routes(plane, hub['iata'], 100)
@@ -152,8 +149,8 @@ def get_all_routes():
             continue
         for name, route in routes.items():
             print(f'can buy {name}')
-            print(f"{plane['id']}, {hub['hub_id']}, {plane['engine']['id']}, {name}, {route['economy']}, {route['business']}, {route['first']}")
-            p_routes.append(f"{plane['id']}, {hub['hub_id']}, {plane['engine']['id']}, {name}, {route['economy']}, {route['business']}, {route['first']}, {route['distance']}, {route['trips']} \n")
+            print(f"{plane.id}, {hub['hub_id']}, {plane.engine_id}, {name}, {route['economy']}, {route['business']}, {route['first']}")
+            p_routes.append(f"{plane.id}, {hub['hub_id']}, {plane.engine_id}, {name}, {route['economy']}, {route['business']}, {route['first']}, {route['distance']}, {route['trips']} \n")
     am4.logout()
     with open('routes_to_buy.txt', 'w+') as routes_file:
         routes_file.writelines(p_routes)
@@ -162,15 +159,12 @@ def get_all_routes():
 def get_all_cargo_routes():
     p_routes = []
     am4.login(am4.username, am4.password)
-    planes = []
     hubs = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['cargo']
     with open('hubs.json', 'r') as hubs_json:
         hubs = json.load(hubs_json)
-    plane = [plane for plane in planes if plane['shortname'] == 'a388f'][0]
+    plane = am4.get_plane_catalog().get('a388f')
     balance = am4.get_balance()
-    # if balance > plane['price'] * 1.3:
+    # if balance > plane.price * 1.3:
     for hub in hubs:
         print(f'processing hub {hub["iata"]}')
         routes = am4.find_cargo_routes(plane, hub['iata'], 100)
@@ -178,21 +172,18 @@ def get_all_cargo_routes():
             continue
         for name, route in routes.items():
             print(f'can buy {name}')
-            print(f"{plane['id']}, {hub['hub_id']}, {plane['engine']['id']}, {name}, {route['aft']}, {route['fwd']}")
-            p_routes.append(f"{plane['id']}, {hub['hub_id']}, {plane['engine']['id']}, {name}, {route['aft']}, {route['fwd']}, {route['distance']}, {route['trips']} \n")
+            print(f"{plane.id}, {hub['hub_id']}, {plane.engine_id}, {name}, {route['aft']}, {route['fwd']}")
+            p_routes.append(f"{plane.id}, {hub['hub_id']}, {plane.engine_id}, {name}, {route['aft']}, {route['fwd']}, {route['distance']}, {route['trips']} \n")
     am4.logout()
     with open('routes_to_buy.txt', 'w+') as routes_file:
         routes_file.writelines(p_routes)
 
 
 def check_available_380_routes():
-    planes = []
     hubs = []
-    with open('planes.json', 'r') as planes_json:
-        planes = json.load(planes_json)['pax']
     with open('hubs.json', 'r') as hubs_json:
         hubs = json.load(hubs_json)
-    plane = [plane for plane in planes if plane['shortname'] == 'a388'][0]
+    plane = am4.get_plane_catalog().get('a388')
     plane_details = am4.get_pax_plane_details(2)
 
     # include a339 routes in check as well...
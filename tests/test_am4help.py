@@ -0,0 +1,97 @@
+import threading
+
+from am4help import RouteSearch, SearchBudget, TicketCache
+
+ROUTE = ('pax', 'realism', 'FRA', 'JFK')
+
+
+def make_cache(tmp_path, **kwargs):
+    return TicketCache(file_name=str(tmp_path / 'am4help_cache.sqlite3'), **kwargs)
+
+
+def test_hits_and_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get(*ROUTE) is None
+    cache.put(*ROUTE, {'demand': 1200})
+    assert cache.get(*ROUTE) == {'demand': 1200}
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = make_cache(tmp_path, ttl=-1)
+    cache.put(*ROUTE, {'demand': 1200})
+    assert cache.get(*ROUTE) is None
+
+
+def test_hits_dont_write(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(*ROUTE, {'demand': 1200})
+    changes = cache._db.total_changes
+    for _ in range(10):
+        cache.get(*ROUTE)
+    assert cache._db.total_changes == changes
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put('pax', 'realism', 'FRA', 'JFK', {'demand': 1})
+    cache.put('pax', 'realism', 'FRA', 'LHR', {'demand': 2})
+    # the first route was used after the second was stored, so the second is evicted
+    assert cache.get('pax', 'realism', 'FRA', 'JFK') is not None
+    cache.put('pax', 'realism', 'FRA', 'CDG', {'demand': 3})
+    assert cache.get('pax', 'realism', 'FRA', 'JFK') is not None
+    assert cache.get('pax', 'realism', 'FRA', 'LHR') is None
+
+
+def test_bypass_counts_every_miss(tmp_path):
+    cache = make_cache(tmp_path, bypass=True)
+    cache.put(*ROUTE, {'demand': 1200})
+
+    def lookup():
+        for _ in range(1000):
+            assert cache.get(*ROUTE) is None
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats() == {'hits': 0, 'misses': 8000, 'hit_rate': 0.0}
+
+
+def search_pages(pages):
+    # a route search that reads its pages from pages instead of am4help
+    search = RouteSearch(requests_per_second=0)
+    search.fetch_page = lambda hub_iata_code, sort, page_number: (
+        pages[page_number - 1] if page_number <= len(pages) else None)
+    return search
+
+
+def search_route(arrival, distance):
+    return {'departure': {'iata': 'FRA'}, 'arrival': {'iata': arrival}, 'distance': distance}
+
+
+def test_search_drops_routes_out_of_distance_and_runway():
+    # LCY (4948 ft) and SBH (2133 ft) are too short for 5000 ft, SIN is too far
+    pages = [[search_route('JFK', 6200), search_route('LCY', 640), search_route('SIN', 10300)],
+             [search_route('SBH', 7000), search_route('LHR', 650)]]
+    evaluated = []
+
+    def evaluate(routes):
+        evaluated.append([route['arrival']['iata'] for route in routes])
+        return [(route['arrival']['iata'], route) for route in routes]
+
+    search = search_pages(pages)
+    routes = search.search_hub('FRA', 'firstClass', evaluate, SearchBudget(10), max_distance=8000, min_runway=5000)
+    assert sorted(routes) == ['JFK', 'LHR']
+    assert evaluated == [['JFK'], ['LHR']]
+
+
+def test_search_hubs_forwards_the_limits():
+    pages = [[search_route('JFK', 6200), search_route('SBH', 640), search_route('SIN', 10300)]]
+    search = search_pages(pages)
+    routes = search.search_hubs(['FRA'], 'firstClass',
+                                lambda hub_iata_code: lambda routes: [(route['arrival']['iata'], route)
+                                                                      for route in routes],
+                                10, max_distance=8000, min_runway=5000)
+    assert sorted(routes['FRA']) == ['JFK']
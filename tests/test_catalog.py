@@ -0,0 +1,69 @@
+import pytest
+
+from catalog import AirportCatalog, Plane, PlaneCatalog
+
+AIRPORTS = [
+    {'id': 1, 'iata': 'FRA', 'icao': 'EDDF', 'runway': 13123},
+    {'id': 2, 'iata': 'LCY', 'icao': 'EGLC', 'runway': 4948},
+    {'id': 3, 'iata': 'JFK', 'icao': 'KJFK', 'runway': 14511},
+    {'id': 4, 'iata': 'SBH', 'icao': 'TFFJ', 'runway': 2130},
+]
+
+
+def test_airport_lookups():
+    airports = AirportCatalog(AIRPORTS)
+    assert airports.get('FRA')['icao'] == 'EDDF'
+    assert airports.get_by_icao('EGLC')['iata'] == 'LCY'
+    assert airports.get_by_id(3)['iata'] == 'JFK'
+    assert airports.get('XXX') is None and airports.runway('XXX') == 0
+
+
+def test_airports_by_runway():
+    airports = AirportCatalog(AIRPORTS)
+    assert [airport['iata'] for airport in airports.by_runway] == ['SBH', 'LCY', 'FRA', 'JFK']
+    assert [airport['iata'] for airport in airports.with_runway(4948)] == ['LCY', 'FRA', 'JFK']
+    assert [airport['iata'] for airport in airports.with_runway(3000, 13123)] == ['LCY', 'FRA']
+    assert [AIRPORTS[index]['iata'] for index in airports.runway_order[airports.runway_range(14000)]] == ['JFK']
+    assert airports.landable(9680) == {'FRA', 'JFK'}
+    assert airports.can_land('LCY', 4948) and not airports.can_land('LCY', 4949)
+
+
+def plane(id, shortname, manufacturer, capacity, range, speed, price, kind='pax'):
+    return Plane(kind, {'id': id, 'model': shortname.upper(), 'manufactory': manufacturer, 'shortname': shortname,
+                        'capacity': capacity, 'runway': 8000, 'a_check': 1000, 'range': range, 'ceil': 40000,
+                        'maintenance': 450, 'price': price, 'pilots': 2, 'crew': 10, 'engineers': 4, 'tech': 10,
+                        'thumb': f'/assets/aircrafts/{kind}/{shortname}.png',
+                        'engine': {'id': id, 'engine': 'E', 'speed': speed, 'fuel': '20.5', 'co2': '0.16'}})
+
+
+PLANES = [plane(1, 'a388', 'Airbus', 600, 14500, 1049, 215000000),
+          plane(2, 'b748', 'Boeing', 467, 14320, 1055, 185000000),
+          plane(3, 'a339', 'Airbus', 440, 13300, 1036, 120000000),
+          plane(4, 'b74f', 'Boeing', 300000, 8230, 1000, 160000000, kind='cargo')]
+
+
+def test_planes_by_id_shortname_and_kind():
+    planes = PlaneCatalog(PLANES)
+    assert planes.get_by_id(2).shortname == 'b748'
+    assert planes.get('a339').id == 3
+    assert [plane.shortname for plane in planes.of_kind('pax', ['a339', 'a388'])] == ['a388', 'a339']
+    assert [plane.shortname for plane in planes.of_kind('cargo')] == ['b74f']
+    assert planes.get('a388').fuel == 20.5
+
+
+def test_planes_by_manufacturer():
+    planes = PlaneCatalog(PLANES)
+    assert [plane.shortname for plane in planes.made_by('Airbus')] == ['a388', 'a339']
+    assert [plane.shortname for plane in planes.made_by('Boeing')] == ['b748', 'b74f']
+    assert planes.made_by('Tupolev') == []
+
+
+@pytest.mark.parametrize('field, kind, descending, expected', [
+    ('range', None, True, ['a388', 'b748', 'a339', 'b74f']),
+    ('capacity', 'pax', False, ['a339', 'b748', 'a388']),
+    ('speed', None, False, ['b74f', 'a339', 'a388', 'b748']),
+    ('price', 'pax', False, ['a339', 'b748', 'a388']),
+])
+def test_sorted_views(field, kind, descending, expected):
+    planes = PlaneCatalog(PLANES)
+    assert [plane.shortname for plane in planes.ordered(field, kind, descending)] == expected
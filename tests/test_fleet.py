@@ -0,0 +1,39 @@
+from fleet import FleetSnapshot
+
+
+def plane(id, departure, arrival, status):
+    return {'id': id, 'departure': departure, 'arrival': arrival, 'status': status}
+
+
+PAX = [plane(1, 'FRA', 'JFK', 'Routed'), plane(2, 'FRA', 'LHR', 'Parked'), plane(3, 'JFK', 'LHR', 'Routed'),
+       plane(4, 'CDG', 'CDG', 'Parked')]
+
+
+def snapshot():
+    fetched = []
+
+    def fetch_pax(aircraft_type_id):
+        fetched.append(aircraft_type_id)
+        return PAX
+
+    return FleetSnapshot(fetch_pax, lambda aircraft_type_id: []), fetched
+
+
+def test_planes_at_airport_both_ways():
+    fleet, fetched = snapshot()
+    assert [plane['id'] for plane in fleet.at_airport('pax', 308, 'FRA')] == [1, 2]
+    assert [plane['id'] for plane in fleet.at_airport('pax', 308, 'LHR')] == [2, 3]
+    assert [plane['id'] for plane in fleet.at_airport('pax', 308, 'JFK')] == [1, 3]
+    # a plane flying from and to the same airport is listed once
+    assert [plane['id'] for plane in fleet.at_airport('pax', 308, 'CDG')] == [4]
+    assert fleet.at_airport('pax', 308, 'SIN') == []
+    assert fetched == [308]
+
+
+def test_planes_with_status():
+    fleet, fetched = snapshot()
+    assert [plane['id'] for plane in fleet.with_status('pax', 308, 'Parked')] == [2, 4]
+    assert fleet.with_status('pax', 308, 'Grounded') == []
+    fleet.invalidate_aircraft(2)
+    assert [plane['id'] for plane in fleet.with_status('pax', 308, 'Routed')] == [1, 3]
+    assert fetched == [308, 308]
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from fuel_analytics import SLOTS_PER_DAY, PriceAdvisor, PriceSeries
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_days_logged_skips_gaps():
+    # two logged days nine days apart span a ten day grid
+    series = PriceSeries([(START, 500.0, 120.0), (START + timedelta(days=9), 480.0, 110.0),
+                          (START + timedelta(days=9, hours=1), 470.0, 115.0)])
+    assert len(series.grid('fuel')) == 10
+    assert series.days_logged('fuel') == 2
+
+
+def test_days_logged_empty():
+    assert PriceSeries([]).days_logged('fuel') == 0
+
+
+def day_of_prices(day, prices):
+    # one record per half hour of the day, prices[slot] for fuel and co2
+    start = START + timedelta(days=day)
+    return [(start + timedelta(minutes=30 * slot), price, price) for slot, price in enumerate(prices)]
+
+
+def test_rolling_and_ahead():
+    series = PriceSeries(day_of_prices(0, [float(slot) for slot in range(SLOTS_PER_DAY)]))
+    rolling = series.rolling('fuel', 2)
+    assert rolling[0] == 0
+    assert rolling[1] == 0.5 and rolling[47] == 46.5
+    ahead = series.ahead('fuel', 3)
+    assert ahead.shape == (1, SLOTS_PER_DAY)
+    assert ahead[0, 0] == 1 and ahead[0, 44] == 45
+    assert np.isnan(ahead[0, 47])
+
+
+def test_expected_minimum_per_time_of_day():
+    # the price drops to 300 at 06:00 every day
+    prices = [500.0] * SLOTS_PER_DAY
+    prices[12] = 300.0
+    series = PriceSeries([record for day in range(7) for record in day_of_prices(day, prices)])
+    advisor = PriceAdvisor(series, horizon=6)
+    assert advisor.expected_minimum('fuel', START.replace(hour=4)) == 300
+    assert advisor.expected_minimum('fuel', START.replace(hour=8)) == 500
+    # 520 is above the usual price of either time, 300 at 04:00 is no worse than waiting for the drop
+    assert advisor.should_buy('fuel', 520, START.replace(hour=4)) is False
+    assert advisor.should_buy('fuel', 300, START.replace(hour=4)) is True
+
+
+def test_max_price_caps_the_forecast():
+    # prices are always high, so the forecast alone would buy at 2000
+    series = PriceSeries([record for day in range(7) for record in day_of_prices(day, [2500.0] * SLOTS_PER_DAY)])
+    advisor = PriceAdvisor(series)
+    now = START.replace(hour=10)
+    assert advisor.should_buy('fuel', 2000, now) is True
+    assert advisor.should_buy('fuel', 2000, now, max_price=500) is False
+    assert advisor.should_buy('fuel', 400, now, max_price=500) is True
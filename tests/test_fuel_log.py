@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+from google.api_core.exceptions import PreconditionFailed
+
+from fuel_log import FuelLog
+
+
+class MemoryBlob:
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if if_generation_match == 0 and self.exists():
+            raise PreconditionFailed(f'{self.name} exists')
+        self.bucket.objects[self.name] = data
+
+    def download_as_bytes(self):
+        return self.bucket.objects[self.name]
+
+    def compose(self, sources):
+        self.bucket.composed += 1
+        self.upload_from_string(b''.join(source.download_as_bytes() for source in sources))
+
+
+class MemoryBucket:
+
+    def __init__(self):
+        self.objects = {}
+        self.composed = 0
+
+    def blob(self, name):
+        return MemoryBlob(self, name)
+
+    def list_blobs(self, prefix=''):
+        return [MemoryBlob(self, name) for name in sorted(self.objects) if name.startswith(prefix)]
+
+
+def yesterday_at(hour, minute=0):
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    return yesterday.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def make_log(tmp_path):
+    bucket = MemoryBucket()
+    return bucket, FuelLog(lambda: bucket, wal_file=str(tmp_path / 'fuel_log.wal'))
+
+
+def test_late_window_is_read_after_compaction(tmp_path):
+    bucket, log = make_log(tmp_path)
+    log.append(yesterday_at(10), 500, 120)
+    log.flush()
+    assert bucket.blob(log.day_name(yesterday_at(0))).exists()
+    # a window of yesterday logged after the day object was composed
+    log.append(yesterday_at(23, 30), 450, 110)
+    log.flush()
+    start = yesterday_at(0)
+    records = log.read(start, start + timedelta(days=1))
+    assert [(window.hour, fuel) for window, fuel, _ in records] == [(10, 500), (23, 450)]
+
+
+def test_yesterday_is_composed_once(tmp_path):
+    bucket, log = make_log(tmp_path)
+    log.append(yesterday_at(10), 500, 120)
+    log.flush()
+    composed = bucket.composed
+    now = datetime.now(timezone.utc)
+    for minute in (0, 30):
+        log.append(now.replace(minute=minute, second=0, microsecond=0), 600, 130)
+        log.flush()
+    assert bucket.composed == composed
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def wait_for(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} is {queue.get(job_id)["status"]}, not {status}')
+
+
+def test_submit_deduplicates_queued_and_running_jobs(tmp_path):
+    release = threading.Event()
+    queue = JobQueue({'routine': lambda: release.wait(5)}, file_name=str(tmp_path / 'jobs.sqlite3'))
+    job_id, queued = queue.submit('routine')
+    assert queued
+    wait_for(queue, job_id, 'running')
+    assert queue.submit('routine') == (job_id, False)
+    release.set()
+    wait_for(queue, job_id, 'done')
+    other_id, queued = queue.submit('routine')
+    assert queued and other_id != job_id
+
+
+def test_dedup_is_per_arguments(tmp_path):
+    queue = JobQueue({'update_fleet': lambda **args: None}, file_name=str(tmp_path / 'jobs.sqlite3'))
+    first, _ = queue.submit('update_fleet', aircraft_type_id=1)
+    second, queued = queue.submit('update_fleet', aircraft_type_id=2)
+    assert queued and first != second
+
+
+def test_no_worker_runs_before_start(tmp_path):
+    file_name = str(tmp_path / 'jobs.sqlite3')
+    queue = JobQueue({'routine': lambda: None}, file_name=file_name)
+    queue._db.execute("INSERT INTO jobs (id, type, key, args, status, created, progress) "
+                      "VALUES ('left', 'routine', 'routine:{}', '{}', 'queued', 1, '{}')")
+    queue._db.commit()
+    ran = []
+    # a second queue on the same file, e.g. a scratch import of the app, leaves the jobs alone
+    JobQueue({'routine': lambda: ran.append(1)}, file_name=file_name)
+    time.sleep(0.2)
+    assert ran == []
+    assert queue.get('left')['status'] == 'queued'
+
+
+def test_interrupted_jobs_are_not_run_again(tmp_path):
+    file_name = str(tmp_path / 'jobs.sqlite3')
+    queue = JobQueue({'routine': lambda: None}, file_name=file_name)
+    queue._db.execute("INSERT INTO jobs (id, type, key, args, status, created, started, progress) "
+                      "VALUES ('crashed', 'routine', 'routine:{}', '{}', 'running', 1, 2, '{}')")
+    queue._db.commit()
+    ran = []
+    restarted = JobQueue({'routine': lambda: ran.append(1)}, file_name=file_name).start()
+    job = restarted.get('crashed')
+    assert job['status'] == 'interrupted'
+    assert job['error'] == 'interrupted by a restart'
+    time.sleep(0.2)
+    assert ran == []
+
+
+def test_failed_job_records_the_error(tmp_path):
+    def fail():
+        raise RuntimeError('boom')
+    queue = JobQueue({'routine': fail}, file_name=str(tmp_path / 'jobs.sqlite3'))
+    job_id, _ = queue.submit('routine')
+    job = wait_for(queue, job_id, 'failed')
+    assert 'boom' in job['error']
@@ -0,0 +1,32 @@
+import datetime
+
+import requests
+
+from metrics import Metrics
+
+
+def response(url):
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.elapsed = datetime.timedelta(seconds=0.2)
+    response._content = b'{}'
+    return response
+
+
+def test_instrumenting_twice_counts_once():
+    metrics = Metrics()
+    session = requests.Session()
+    metrics.instrument_session(session, 'game')
+    metrics.instrument_session(session, 'game')
+    assert len(session.hooks['response']) == 1
+    requests.hooks.dispatch_hook('response', session.hooks, response('https://example.com/fleet.php?type=1'))
+    assert metrics.snapshot()[('http_requests_total', (('status', '200'), ('target', 'game'),
+                                                       ('url', 'example.com/fleet.php?type')))] == (1, None)
+
+
+def test_each_metrics_instruments_the_session():
+    session = requests.Session()
+    Metrics().instrument_session(session, 'game')
+    Metrics().instrument_session(session, 'game')
+    assert len(session.hooks['response']) == 2
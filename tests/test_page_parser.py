@@ -0,0 +1,68 @@
+import pytest
+
+import page_parser
+
+
+def fleet_page(*rows):
+    # layout of fleet.php?type=<id>: rows under the second top level div
+    return f'<div>fleet</div><div><div>{"".join(rows)}</div></div>'
+
+
+def fleet_row(onclick, name, seats, status):
+    return (f'<div><div><span onclick="{onclick}">i</span></div><div><a>{name}</a></div>'
+            f'<div>{"<br>".join(seats)}</div><div><span>{status}</span></div></div>')
+
+
+@pytest.mark.parametrize('onclick', ["showAircraft(this,40000001,2)", "showAircraft(this, 40000001, 'pax')",
+                                     "showAircraft(this, '40000001')", 'showAircraft(this, &quot;40000001&quot;)'])
+def test_fleet_row_id_is_only_the_digits(onclick):
+    planes = page_parser.parse_pax_fleet(fleet_page(fleet_row(onclick, 'FRA-JFK', ['Y: 300', 'J: 80', 'F: 20'],
+                                                              'Routed')))
+    assert [plane.id for plane in planes] == ['40000001']
+
+
+def test_pax_fleet_row_values():
+    planes = page_parser.parse_pax_fleet(fleet_page(
+        fleet_row('showAircraft(this,1,2)', 'FRA-JFK', ['Y: 1,300', 'J: 80', 'F: 20'], 'Routed'),
+        fleet_row('showAircraft(this,2,2)', 'LHR-SIN', ['Y: 0', 'J: 0', 'F: 0'], 'Parked')))
+    assert [(plane.id, plane.departure, plane.arrival, plane.status) for plane in planes] == [
+        ('1', 'FRA', 'JFK', 'Routed'), ('2', 'LHR', 'SIN', 'Parked')]
+    assert (planes[0].economy, planes[0].business, planes[0].first) == (1300, 80, 20)
+
+
+def test_cargo_fleet_row_values():
+    planes = page_parser.parse_cargo_fleet(fleet_page(
+        fleet_row('showAircraft(this,7,3)', 'FRA-MLE', ['L: 330,000', 'H: 12'], 'Routed')))
+    assert (planes[0].id, planes[0].large, planes[0].heavy) == ('7', 330000, 12)
+
+
+def test_fleet_row_without_id_fails_loudly():
+    with pytest.raises(ValueError):
+        page_parser.parse_pax_fleet(fleet_page(fleet_row('showAircraft(this)', 'FRA-JFK', ['Y: 1', 'J: 1', 'F: 1'],
+                                                         'Routed')))
+
+
+@pytest.mark.parametrize('html, departed, remaining', [
+    # counter updated by the response script
+    ('<script>$("#listDepartAmount").html("12");</script><div>20 aircraft departed</div>', 20, 12),
+    ("<script>$('#listDepartAmount').text(0)</script>", None, 0),
+    # counter rendered on the main page
+    ('<div class="btn"><span id="listDepartAmount" class="badge">7</span>Depart</div>', None, 7),
+    ('<p>Departed 1,203 planes</p>', 1203, None),
+    ('<p>3 planes have been departed</p>', 3, None),
+    ('', None, None),
+])
+def test_departure_counts(html, departed, remaining):
+    departure = page_parser.parse_departure(html)
+    assert (departure.departed, departure.remaining) == (departed, remaining)
+    assert not departure.out_of_fuel and not departure.out_of_co2
+
+
+@pytest.mark.parametrize('html, out_of_fuel, out_of_co2', [
+    ('<div class="alert">Not enough fuel!</div>', True, False),
+    ('<div class="alert">You have insufficient CO2 quota</div>', False, True),
+    ('<div>Out of fuel</div><div>not enough quota</div>', True, True),
+])
+def test_departure_shortages(html, out_of_fuel, out_of_co2):
+    departure = page_parser.parse_departure(html)
+    assert (departure.out_of_fuel, departure.out_of_co2) == (out_of_fuel, out_of_co2)
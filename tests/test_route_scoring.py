@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import route_scoring
+from catalog import AirportCatalog, PlaneCatalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AIRPORTS = AirportCatalog([{'id': 1, 'iata': 'FRA', 'icao': 'EDDF', 'runway': 13123},
+                           {'id': 2, 'iata': 'JFK', 'icao': 'KJFK', 'runway': 14511},
+                           {'id': 3, 'iata': 'ORD', 'icao': 'KORD', 'runway': 13000}])
+
+
+@pytest.fixture(scope='module')
+def planes():
+    return PlaneCatalog.load(os.path.join(ROOT, 'planes.json'))
+
+
+def pax_route(arrival, ticket=None):
+    route = {'departure': {'iata': 'FRA'}, 'arrival': {'iata': arrival, 'id': 2}, 'distance': 5000,
+             'economic_demand': 3000, 'business_demand': 1000, 'first_class_demand': 800}
+    if ticket is not None:
+        route['ticket'] = {'realism': dict(zip(['ticketY', 'ticketJ', 'ticketF'], ticket))}
+    return route
+
+
+def test_fuel_and_co2_costs():
+    # 22.26 lbs/km over 5000 km at $500 per 1000 lbs
+    assert route_scoring.fuel_cost(22.26, 5000, 500) == pytest.approx(55650)
+    # 500 passengers at 0.16 lbs per passenger and km, at $120 per 1000 lbs
+    assert route_scoring.co2_cost(0.16, 5000, 500, 120) == pytest.approx(48000)
+    # 231,000 lbs of cargo at 0.2 lbs per 1000 lbs and km
+    assert route_scoring.co2_cost(0.2, 5000, 231, 120) == pytest.approx(27720)
+
+
+def test_pax_profit_uses_the_route_tickets(planes):
+    a388 = planes.get('a388')
+    scores = route_scoring.PaxScores(route_scoring.RouteTable([pax_route('JFK', (700, 2100, 5200))], AIRPORTS),
+                                     [a388], fuel_price=500, co2_price=120)
+    trips = 6
+    assert scores.trips[0, 0] == trips
+    assert (scores.economy[0, 0], scores.business[0, 0], scores.first[0, 0]) == (269, 184, 147)
+    # seats sold per trip are capped by the demand shared over the day's trips
+    sold = (269, 1000 / trips, 800 / trips)
+    revenue = sold[0] * 700 + sold[1] * 2100 + sold[2] * 5200
+    cost = 22.26 * 5000 * 500 / 1000 + 0.16 * 5000 * sum(sold) * 120 / 1000
+    assert scores.profit[0, 0] == pytest.approx(trips * (revenue - cost))
+
+
+def test_cargo_profit_uses_the_route_tickets(planes):
+    a388f = planes.get('a388f')
+    route = {'departure': {'iata': 'FRA'}, 'arrival': {'iata': 'JFK', 'id': 2}, 'distance': 5000,
+             'large_demand': 2000000, 'heavy_demand': 500000,
+             'ticket': {'realism': {'ticketL': 4.1, 'ticketH': 2.3}}}
+    scores = route_scoring.CargoScores(route_scoring.RouteTable([route], AIRPORTS), [a388f],
+                                       fuel_price=500, co2_price=120)
+    trips = scores.trips[0, 0]
+    load = a388f.capacity * 0.7
+    cost = a388f.fuel * 5000 * 500 / 1000 + a388f.co2 * 5000 * load / 1000 * 120 / 1000
+    assert scores.profit[0, 0] == pytest.approx(trips * (load * 4.1 - cost))
+
+
+def test_purchases_follow_the_real_prices(planes):
+    a388 = planes.get('a388')
+    # same demand and distance, so only the ticket prices tell the routes apart
+    routes = [pax_route('JFK', (300, 900, 2000)), pax_route('ORD', (700, 2100, 5200)), pax_route('JFK')]
+    routes[1]['arrival']['id'] = 3
+    scores = route_scoring.PaxScores(route_scoring.RouteTable(routes, AIRPORTS), [a388])
+    assert scores.feasible[0].all()
+    purchases = route_scoring.select_purchases(scores, balance=10 * a388.price, slots=10)
+    # the unpriced route is never bought, and FRA-JFK is bought once
+    assert [purchase['name'] for purchase in purchases] == ['FRA-ORD', 'FRA-JFK']
+    assert [candidate['name'] for candidate in scores.ranked()] == ['FRA-ORD', 'FRA-JFK']
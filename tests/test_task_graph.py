@@ -0,0 +1,77 @@
+import threading
+import time
+
+from task_graph import TaskGraph
+
+
+def test_only_spending_sections_take_turns():
+    graph = TaskGraph(workers=2)
+    inside = []
+    overlaps = []
+
+    def buy():
+        # a long search outside the budget, then a short purchase inside it
+        time.sleep(0.2)
+        with graph.spending():
+            inside.append(threading.current_thread().name)
+            overlaps.append(len(inside))
+            time.sleep(0.05)
+            inside.pop()
+
+    graph.add('buy_pax', buy, spends=True)
+    graph.add('buy_cargo', buy, spends=True)
+    started = time.monotonic()
+    assert graph.run() == []
+    # the searches overlapped, the purchases did not
+    assert time.monotonic() - started < 0.4
+    assert overlaps == [1, 1]
+
+
+def test_nested_sections_are_part_of_the_outer_one():
+    graph = TaskGraph(workers=1)
+
+    def depart():
+        with graph.spending():
+            with graph.spending():
+                pass
+
+    graph.add('depart', depart, spends=True)
+    assert graph.run() == []
+    assert len(graph.tasks['depart'].budget_sections) == 1
+
+
+def test_critical_path_follows_budget_waits():
+    graph = TaskGraph(workers=3)
+    holding = threading.Event()
+
+    def fuel():
+        with graph.spending():
+            holding.set()
+            time.sleep(0.3)
+
+    def buy():
+        # no declared dependency on fuel, only the budget orders them
+        holding.wait(1)
+        with graph.spending():
+            time.sleep(0.05)
+
+    graph.add('log_fuel_stats', lambda: time.sleep(0.01))
+    graph.add('fuel', fuel, spends=True)
+    graph.add('buy_pax', buy, after=['log_fuel_stats'], spends=True)
+    assert graph.run() == []
+    buy_pax = graph.tasks['buy_pax']
+    assert buy_pax.budget_wait > 0.2
+    path = graph.critical_path()
+    assert [(task.name, edge) for task, _, _, edge in path] == [('fuel', 'budget'), ('buy_pax', None)]
+    report = graph.report()
+    assert 'fuel =budget=> buy_pax' in report
+    total, queued, budget, running = graph._path_times(path)
+    assert total > 0.3 and budget < 0.05
+
+
+def test_queued_time_is_recorded():
+    graph = TaskGraph(workers=1)
+    graph.add('first', lambda: time.sleep(0.1))
+    graph.add('second', lambda: None)
+    graph.run()
+    assert graph.tasks['second'].queue_wait >= 0.09
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+LOGGER = logging.getLogger()
+
+
+class StageStats:
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, started, ok=True):
+        with self._lock:
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = time.monotonic()
+            if ok:
+                self.count += 1
+            else:
+                self.errors += 1
+
+    def summary(self):
+        elapsed = 0 if self.started is None else self.finished - self.started
+        rate = self.count / elapsed if elapsed > 0 else 0
+        return {'stage': self.name, 'count': self.count, 'errors': self.errors,
+                'seconds': round(elapsed, 2), 'per_second': round(rate, 2)}
+
+
+class TicketPricePipeline:
+    # lists routes, resolves their realism prices and sets them, with the three stages overlapping.
+    # prices set by earlier runs are remembered, so unchanged routes are skipped.
+
+    def __init__(self, resolve_price, set_price, resolver_concurrency=8, setter_concurrency=4,
+                 state_file='ticket_prices.json'):
+        self.resolve_price = resolve_price
+        self.set_price = set_price
+        self.resolver_concurrency = resolver_concurrency
+        self.setter_concurrency = setter_concurrency
+        self.state_file = state_file
+        self.stats = {name: StageStats(name) for name in ['list', 'resolve', 'set', 'unchanged']}
+        self._state_lock = threading.Lock()
+        self._last_prices = self._load_state()
+
+    def run(self, route_pages):
+        # route_pages yields lists of {'route_id', 'route_desc'}; it is consumed in the calling thread,
+        # since the lister usually drives the browser bound to it
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.resolver_concurrency, thread_name_prefix='ticket-resolve') as resolvers, \
+                ThreadPoolExecutor(max_workers=self.setter_concurrency, thread_name_prefix='ticket-set') as setters:
+            started = time.monotonic()
+            for routes in route_pages:
+                for route in routes:
+                    self.stats['list'].record(started)
+                    futures.append(resolvers.submit(self._resolve, route, setters, futures))
+                started = time.monotonic()
+            # setter futures are appended while resolvers finish, so wait until the list stops growing
+            waited = 0
+            while waited < len(futures):
+                pending = futures[waited:]
+                waited = len(futures)
+                wait(pending)
+        self._save_state()
+        report = [stats.summary() for stats in self.stats.values()]
+        for summary in report:
+            LOGGER.info(f'ticket price pipeline: {summary}')
+        return report
+
+    def _resolve(self, route, setters, futures):
+        started = time.monotonic()
+        try:
+            price = self.resolve_price(route)
+        except Exception:
+            LOGGER.exception(f'could not resolve ticket price for {route["route_desc"]}')
+            self.stats['resolve'].record(started, ok=False)
+            return
+        self.stats['resolve'].record(started)
+        prices = [price['ticketY'], price['ticketJ'], price['ticketF']]
+        with self._state_lock:
+            unchanged = self._last_prices.get(route['route_id']) == prices
+        if unchanged:
+            self.stats['unchanged'].record(started)
+            return
+        futures.append(setters.submit(self._set, route, prices))
+
+    def _set(self, route, prices):
+        started = time.monotonic()
+        try:
+            self.set_price(route['route_id'], *prices)
+        except Exception:
+            LOGGER.exception(f'could not set ticket price for {route["route_desc"]}')
+            self.stats['set'].record(started, ok=False)
+            return
+        self.stats['set'].record(started)
+        with self._state_lock:
+            self._last_prices[route['route_id']] = prices
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r') as state_file:
+                return json.load(state_file)
+        except Exception:
+            LOGGER.exception(f'could not read {self.state_file}, all ticket prices will be set')
+            return {}
+
+    def _save_state(self):
+        with self._state_lock:
+            with open(self.state_file, 'w+') as state_file:
+                state_file.write(json.dumps(self._last_prices))